@@ -0,0 +1,309 @@
+"""
+Module: admission.py
+Description: Per-client rate limiting and overload shedding in front of the review endpoints.
+
+Two checks run before a review request does any work:
+  - Rate limit: a token bucket per client key (RATE_LIMIT_KEYS: "user", "token" or
+    both, comma separated; empty disables it). Each review takes one token, so a
+    batch costs as many tokens as it holds reviews, charged to each of its users;
+    buckets refill at RATE_LIMIT_PER_SECOND up to RATE_LIMIT_BURST. A request whose
+    tokens are not available is rejected with 429 and a Retry-After of the time
+    until they are.
+  - Concurrency limit: at most ADMISSION_MAX_CONCURRENCY requests run at once (0
+    disables it); the others wait for a slot, higher priorities first. A request is
+    shed with 503 as soon as its expected wait (from the recent service time of
+    each priority, so long batches do not inflate the estimate for single reviews) exceeds
+    its share of ADMISSION_QUEUE_TARGET, or when it has waited that long. Lower
+    priorities get a smaller share, so they are shed first and interactive requests
+    keep their latency during overload.
+"""
+
+import asyncio
+import hashlib
+import math
+import os
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Dict, Iterable, Mapping, Optional
+
+from dotenv import load_dotenv
+
+import monitoring
+from logger import MyLogger
+
+load_dotenv()
+
+# Get a logger for this module
+logger = MyLogger.get_logger(__name__)
+
+HIGH = "high"
+NORMAL = "normal"
+LOW = "low"
+
+# Share of the queue-wait target each priority may wait before it is shed.
+PRIORITY_WAIT_SHARE = {HIGH: 1.0, NORMAL: 0.5, LOW: 0.25}
+
+RATE_LIMIT_KEY_TYPES = ("user", "token")
+
+
+class RateLimited(Exception):
+    """
+    Raised when a client key has no tokens left. retry_after is in seconds.
+    """
+
+    def __init__(self, key_type: str, retry_after: int):
+        super().__init__(f"Rate limit exceeded for {key_type}, retry after {retry_after}s")
+        self.key_type = key_type
+        self.retry_after = retry_after
+
+
+class Overloaded(Exception):
+    """
+    Raised when a request is shed by the concurrency limit. retry_after is in seconds.
+    """
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Service overloaded ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, burst: float, now: float):
+        self.tokens = burst
+        self.updated = now
+
+
+class RateLimiter:
+    """
+    Token buckets keyed by client. Only the max_keys most recently used keys are
+    kept; a forgotten key starts again with a full bucket.
+    """
+
+    def __init__(self, rate: float, burst: float, max_keys: int):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def _bucket(self, key: str) -> TokenBucket:
+        # Returns the bucket of key, refilled up to now.
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = TokenBucket(self.burst, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket.tokens = min(self.burst, bucket.tokens + (now - bucket.updated) * self.rate)
+            bucket.updated = now
+        return bucket
+
+    def wait_time(self, key: str, cost: float = 1) -> float:
+        """
+        Returns 0 if key can take cost tokens now, else the seconds until it can.
+        Takes nothing. A cost above the burst only needs a full bucket; the bucket
+        then goes into debt, which delays the client's next requests accordingly.
+        """
+        bucket = self._bucket(key)
+        needed = min(cost, self.burst)
+        if bucket.tokens >= needed:
+            return 0.0
+        return (needed - bucket.tokens) / self.rate
+
+    def take(self, key: str, cost: float = 1):
+        """
+        Takes cost tokens from key (see wait_time).
+        """
+        self._bucket(key).tokens -= cost
+
+
+class ConcurrencyLimiter:
+    """
+    Limits concurrent requests, queueing the rest by priority and shedding those
+    that would wait longer than their share of queue_target.
+    """
+
+    def __init__(self, max_concurrency: int, queue_target: float, max_waiting: int):
+        self.max_concurrency = max_concurrency
+        self.queue_target = queue_target
+        self.max_waiting = max_waiting
+        self.in_flight = 0
+        self._waiters: Dict[str, deque] = {priority: deque() for priority in PRIORITY_WAIT_SHARE}
+        # Moving average of the service time per priority, seconds.
+        self._service_time: Dict[str, Optional[float]] = {priority: None for priority in PRIORITY_WAIT_SHARE}
+
+    def waiting(self) -> int:
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+    def _queued_work(self, priority: str, fallback: float) -> float:
+        # Seconds of service queued ahead of a new request of this priority.
+        # Levels without a measured service time yet count as fallback.
+        work = 0.0
+        for level, waiters in self._waiters.items():
+            work += len(waiters) * (self._service_time[level] or fallback)
+            if level == priority:
+                break
+        return work
+
+    def _retry_after(self, priority: str) -> int:
+        service_time = self._service_time[priority] or self.queue_target
+        work = self._queued_work(LOW, service_time) + service_time  # the whole queue, then itself
+        return max(1, math.ceil(work / self.max_concurrency))
+
+    async def acquire(self, priority: str):
+        """
+        Takes a concurrency slot, waiting for one if all are taken.
+
+        Raises:
+            Overloaded: If the request is shed instead.
+        """
+        if self.in_flight < self.max_concurrency and self.waiting() == 0:
+            self.in_flight += 1
+            return
+        budget = self.queue_target * PRIORITY_WAIT_SHARE[priority]
+        if self.waiting() >= self.max_waiting:
+            raise Overloaded("queue_full", self._retry_after(priority))
+        service_time = self._service_time[priority]
+        if service_time is not None:
+            expected = (self._queued_work(priority, service_time) + service_time) / self.max_concurrency
+            if expected > budget:
+                raise Overloaded("expected_wait", self._retry_after(priority))
+
+        future = asyncio.get_running_loop().create_future()
+        waiters = self._waiters[priority]
+        waiters.append(future)
+        try:
+            done, _ = await asyncio.wait({future}, timeout=budget)
+        except asyncio.CancelledError:
+            if future.done():
+                # The slot was handed over just before the caller went away.
+                self._release()
+            else:
+                waiters.remove(future)
+            raise
+        if not done:
+            waiters.remove(future)
+            raise Overloaded("wait_timeout", self._retry_after(priority))
+
+    def release(self, priority: str, service_time: float):
+        """
+        Returns a slot taken by acquire; service_time is how long it was held.
+        """
+        average = self._service_time[priority]
+        self._service_time[priority] = service_time if average is None else 0.8 * average + 0.2 * service_time
+        self._release()
+
+    def _release(self):
+        # Hand the slot straight to the oldest waiter of the highest priority, if any.
+        for waiters in self._waiters.values():
+            if waiters:
+                waiters.popleft().set_result(None)
+                return
+        self.in_flight -= 1
+
+
+class AdmissionController:
+    """
+    Applies the rate limit and the concurrency limit and counts the outcomes.
+
+    Args:
+        rate_limit_keys (Iterable[str]): Key types the rate limit applies to ("user", "token").
+        rate (float): Tokens added per second to each bucket.
+        burst (float): Bucket capacity.
+        max_keys (int): Maximum number of buckets kept per key type.
+        max_concurrency (int): Concurrent requests allowed; 0 disables the limit.
+        queue_target (float): Longest queue wait (seconds) for high-priority requests.
+        max_waiting (int): Maximum number of queued requests.
+    """
+
+    def __init__(self, rate_limit_keys: Iterable[str], rate: float, burst: float, max_keys: int,
+                 max_concurrency: int, queue_target: float, max_waiting: int):
+        self.limiters = {}
+        for key_type in rate_limit_keys:
+            if key_type not in RATE_LIMIT_KEY_TYPES:
+                raise ValueError(f"Unknown rate limit key: {key_type}")
+            self.limiters[key_type] = RateLimiter(rate, burst, max_keys)
+        self.concurrency = (
+            ConcurrencyLimiter(max_concurrency, queue_target, max_waiting) if max_concurrency > 0 else None
+        )
+
+    def check_rate(self, user_id: Optional[str] = None, token: Optional[str] = None,
+                   user_costs: Optional[Mapping[str, int]] = None):
+        """
+        Takes the request's tokens from each configured bucket of the client: one
+        from user_id, or user_costs[user] from each user of a batch, and their sum
+        from the token. Nothing is taken unless every bucket has enough.
+
+        Raises:
+            RateLimited: If any of the buckets is short.
+        """
+        if user_costs is None:
+            user_costs = {user_id: 1} if user_id is not None else {}
+        charges = []
+        for key_type, limiter in self.limiters.items():
+            if key_type == "user":
+                charges.extend((key_type, limiter, user, cost) for user, cost in user_costs.items())
+            elif token:
+                charges.append((key_type, limiter, _token_key(token), max(1, sum(user_costs.values()))))
+        for key_type, limiter, key, cost in charges:
+            wait = limiter.wait_time(key, cost)
+            if wait > 0:
+                monitoring.RATE_LIMITED_TOTAL.inc(key_type=key_type)
+                raise RateLimited(key_type, max(1, math.ceil(wait)))
+        for _key_type, limiter, key, cost in charges:
+            limiter.take(key, cost)
+
+    @asynccontextmanager
+    async def admit(self, priority: str, user_id: Optional[str] = None, token: Optional[str] = None,
+                    user_costs: Optional[Mapping[str, int]] = None):
+        """
+        Checks the rate limit (see check_rate), then holds a concurrency slot for the block.
+
+        Raises:
+            RateLimited: If the client is over its rate.
+            Overloaded: If the request is shed.
+        """
+        self.check_rate(user_id, token, user_costs)
+        if self.concurrency is None:
+            monitoring.ADMITTED_TOTAL.inc(priority=priority)
+            yield
+            return
+        try:
+            await self.concurrency.acquire(priority)
+        except Overloaded as e:
+            monitoring.SHED_TOTAL.inc(priority=priority, reason=e.reason)
+            raise
+        monitoring.ADMITTED_TOTAL.inc(priority=priority)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.concurrency.release(priority, time.perf_counter() - start)
+
+    def in_flight(self) -> int:
+        return self.concurrency.in_flight if self.concurrency is not None else 0
+
+    def waiting(self) -> int:
+        return self.concurrency.waiting() if self.concurrency is not None else 0
+
+
+def _token_key(token: str) -> str:
+    # Buckets are keyed on a hash so tokens are not kept in memory as is.
+    return hashlib.blake2b(token.encode("utf-8"), digest_size=16).hexdigest()
+
+
+# Shared admission controller used by the API.
+admission = AdmissionController(
+    rate_limit_keys=[key.strip() for key in os.getenv("RATE_LIMIT_KEYS", "").split(",") if key.strip()],
+    rate=float(os.getenv("RATE_LIMIT_PER_SECOND", "20")),
+    burst=float(os.getenv("RATE_LIMIT_BURST", "40")),
+    max_keys=int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000")),
+    max_concurrency=int(os.getenv("ADMISSION_MAX_CONCURRENCY", "64")),
+    queue_target=float(os.getenv("ADMISSION_QUEUE_TARGET", "0.25")),
+    max_waiting=int(os.getenv("ADMISSION_MAX_WAITING", "1000"))
+)
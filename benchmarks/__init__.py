@@ -0,0 +1,5 @@
+"""
+Package: benchmarks
+Description: Synthetic review corpora, microbenchmarks and load generation for the API.
+Run the modules from the repository root, e.g. `python -m benchmarks.microbench run`.
+"""
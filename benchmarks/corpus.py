@@ -0,0 +1,131 @@
+"""
+Module: benchmarks/corpus.py
+Description: Generates deterministic synthetic review corpora for benchmarks and load tests.
+
+Kinds of review:
+  - "short": a few words, like most real reviews.
+  - "long": several paragraphs (roughly 150-400 words).
+  - "emoji": short reviews with emoji and ASCII emoticons.
+  - "multilingual": reviews mixing English with Spanish, French, German, Hindi and Japanese.
+  - "mixed": all of the above, weighted towards short reviews.
+
+Usage:
+    python -m benchmarks.corpus --count 100000 --kind mixed --output corpus.jsonl
+"""
+
+import argparse
+import json
+import random
+import sys
+import uuid
+from typing import Iterator, List
+
+KINDS = ("short", "long", "emoji", "multilingual", "mixed")
+
+# Relative frequency of each kind in a "mixed" corpus.
+MIXED_WEIGHTS = {"short": 0.6, "long": 0.1, "emoji": 0.15, "multilingual": 0.15}
+
+POSITIVE = ["great", "excellent", "amazing", "good", "wonderful", "perfect", "nice", "fantastic", "reliable", "lovely"]
+NEGATIVE = ["terrible", "awful", "bad", "poor", "horrible", "disappointing", "broken", "useless", "cheap", "slow"]
+NEUTRAL = ["okay", "average", "fine", "ordinary", "standard", "decent"]
+INTENSIFIERS = ["very", "really", "extremely", "quite", "so", "not", "barely", ""]
+NOUNS = ["product", "phone", "battery", "screen", "delivery", "price", "quality", "packaging", "service", "design"]
+OPENERS = ["I think the", "Honestly the", "The", "Overall the", "My", "This", "Their"]
+EMOJI = ["😍", "😀", "👍", "🔥", "❤️", "😡", "👎", "😢", "🤔", "🙄", ":)", ":(", ":D", ";)", ":-/", "<3"]
+FOREIGN = [
+    "muy bueno", "producto excelente", "no me gusta", "c'est magnifique", "très déçu", "pas mal du tout",
+    "sehr gut", "schlechte Qualität", "bahut accha hai", "बहुत बढ़िया", "खराब उत्पाद", "とても良い",
+    "最悪です", "素晴らしい製品", "buen precio", "livraison rapide",
+]
+
+
+def _phrase(rng: random.Random) -> str:
+    adjective = rng.choice(rng.choice((POSITIVE, NEGATIVE, NEUTRAL)))
+    intensifier = rng.choice(INTENSIFIERS)
+    words = [rng.choice(OPENERS), rng.choice(NOUNS), "is", intensifier, adjective]
+    return " ".join(word for word in words if word)
+
+
+def _short(rng: random.Random) -> str:
+    text = _phrase(rng)
+    return text + rng.choice(("", ".", "!", "!!", "?"))
+
+
+def _long(rng: random.Random) -> str:
+    paragraphs = []
+    for _ in range(rng.randint(2, 5)):
+        sentences = [_phrase(rng) + rng.choice((".", "!", ", but", ", and")) for _ in range(rng.randint(6, 14))]
+        paragraphs.append(" ".join(sentences))
+    return "\n\n".join(paragraphs)
+
+
+def _emoji(rng: random.Random) -> str:
+    parts = [_phrase(rng)]
+    for _ in range(rng.randint(1, 4)):
+        parts.append(rng.choice(EMOJI))
+    return " ".join(parts)
+
+
+def _multilingual(rng: random.Random) -> str:
+    parts = [rng.choice(FOREIGN) for _ in range(rng.randint(1, 3))]
+    if rng.random() < 0.6:
+        parts.insert(rng.randint(0, len(parts)), _phrase(rng))
+    return ", ".join(parts)
+
+
+_GENERATORS = {"short": _short, "long": _long, "emoji": _emoji, "multilingual": _multilingual}
+
+
+def iter_reviews(count: int, kind: str = "mixed", seed: int = 0) -> Iterator[str]:
+    """
+    Yields count review texts of the given kind. The same seed always yields the same corpus.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown corpus kind: {kind}")
+    rng = random.Random(seed)
+    kinds, weights = list(MIXED_WEIGHTS), list(MIXED_WEIGHTS.values())
+    for _ in range(count):
+        chosen = rng.choices(kinds, weights)[0] if kind == "mixed" else kind
+        yield _GENERATORS[chosen](rng)
+
+
+def generate(count: int, kind: str = "mixed", seed: int = 0) -> List[str]:
+    """
+    Returns a list of count review texts of the given kind.
+    """
+    return list(iter_reviews(count, kind, seed))
+
+
+def review_request(text: str, rng: random.Random, users: int = 1000) -> dict:
+    """
+    Wraps a review text in a /reviews request body with a random request_id and user_id.
+    """
+    return {
+        "request_id": str(uuid.UUID(int=rng.getrandbits(128))),
+        "user_id": f"user{rng.randrange(users)}",
+        "data": {"review_text": text},
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Write a synthetic review corpus as /reviews request bodies (JSONL).")
+    parser.add_argument("--count", type=int, default=10000)
+    parser.add_argument("--kind", choices=KINDS, default="mixed")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--users", type=int, default=1000, help="Number of distinct user ids.")
+    parser.add_argument("--output", help="Output file (default: stdout).")
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for text in iter_reviews(args.count, args.kind, args.seed):
+            out.write(json.dumps(review_request(text, rng, args.users), ensure_ascii=False) + "\n")
+    finally:
+        if args.output:
+            out.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
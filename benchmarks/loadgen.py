@@ -0,0 +1,336 @@
+"""
+Module: benchmarks/loadgen.py
+Description: Async load generator for /reviews, /data_db and /data_all_db.
+
+Drives a running API (--url) or launches a local one with uvicorn (the default) in a
+scratch directory with its own database, so the real sentiment_analysis.db, logs/ and
+metrics/ are never touched. Requests go through one connection-pooled httpx.AsyncClient.
+
+Load models:
+  - Closed loop (default): --concurrency clients each send their next request as soon
+    as the previous one completes. Measures the maximum sustainable throughput.
+  - Open loop (--rate N): requests arrive as a Poisson process at N per second no matter
+    how fast the server answers. Latency is measured from the scheduled arrival time, so
+    queueing delay is included. At most --concurrency requests are outstanding; arrivals
+    beyond that are counted as "shed" by the client.
+
+Payloads follow the synthetic corpus (mostly short reviews, some long, emoji and
+multilingual ones) and user ids are Zipf-distributed, so a few users are very active.
+Reads ask for the first page of history (--page-size rows).
+
+Usage (from the repository root):
+    python -m benchmarks.loadgen --duration 30 --concurrency 64
+    python -m benchmarks.loadgen --rate 500 --mix reviews=70,data_db=25,data_all_db=5
+    python -m benchmarks.loadgen --url http://127.0.0.1:8080 --token 1234 --output load.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from itertools import accumulate
+from typing import Dict, List, Optional
+
+import httpx
+
+from benchmarks.corpus import generate
+
+ENDPOINTS = ("reviews", "data_db", "data_all_db")
+DEFAULT_MIX = "reviews=80,data_db=15,data_all_db=5"
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """
+    Parses "reviews=80,data_db=15,..." into normalized endpoint weights.
+    """
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint in mix: {name}")
+        weights[name] = float(weight)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError("The mix must have a positive weight")
+    return {name: weight / total for name, weight in weights.items()}
+
+
+class Workload:
+    """
+    Produces request (path, body) pairs following the endpoint mix and payload distributions.
+    """
+
+    def __init__(self, mix: Dict[str, float], users: int, page_size: int, seed: int):
+        self.rng = random.Random(seed)
+        self.endpoints = list(mix)
+        self.weights = list(mix.values())
+        self.texts = generate(5000, "mixed", seed)
+        # Zipf-like activity: user k is chosen with weight 1 / (k + 1).
+        self.users = range(users)
+        self.user_weights = list(accumulate(1 / (k + 1) for k in self.users))
+        self.page_size = page_size
+        self.sequence = 0
+
+    def _user(self) -> str:
+        return f"user{self.rng.choices(self.users, cum_weights=self.user_weights)[0]}"
+
+    def next(self):
+        endpoint = self.rng.choices(self.endpoints, self.weights)[0]
+        if endpoint == "reviews":
+            self.sequence += 1
+            body = {
+                "request_id": f"load-{os.getpid()}-{self.sequence}",
+                "user_id": self._user(),
+                "data": {"review_text": self.rng.choice(self.texts)},
+            }
+        elif endpoint == "data_db":
+            body = {"id": self._user(), "limit": self.page_size}
+        else:
+            body = {"limit": self.page_size}
+        return endpoint, body
+
+
+class Recorder:
+    """
+    Collects per-endpoint latencies and outcomes.
+    """
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.shed = 0
+        self.recording = False
+
+    def record(self, endpoint: str, latency: float, status: str, ok: bool):
+        if not self.recording:
+            return
+        self.latencies[endpoint].append(latency)
+        self.statuses[endpoint][status] += 1
+        if not ok:
+            self.errors[endpoint] += 1
+
+    def report(self, elapsed: float) -> dict:
+        endpoints = {}
+        for endpoint in sorted(self.statuses):
+            ordered = sorted(self.latencies[endpoint])
+            count = len(ordered)
+
+            def pct(q: float) -> float:
+                return ordered[min(count - 1, int(count * q))] if count else 0.0
+
+            endpoints[endpoint] = {
+                "requests": count,
+                "errors": self.errors[endpoint],
+                "error_rate": self.errors[endpoint] / count if count else 0.0,
+                "throughput": count / elapsed,
+                "p50": pct(0.50),
+                "p95": pct(0.95),
+                "p99": pct(0.99),
+                "max": ordered[-1] if ordered else 0.0,
+                "statuses": dict(self.statuses[endpoint]),
+            }
+        total = sum(e["requests"] for e in endpoints.values())
+        return {
+            "duration": elapsed,
+            "requests": total,
+            "throughput": total / elapsed,
+            "client_shed": self.shed,
+            "endpoints": endpoints,
+        }
+
+
+async def _send(client: httpx.AsyncClient, recorder: Recorder, endpoint: str, body: dict, started: float):
+    try:
+        response = await client.post(f"/{endpoint}", json=body)
+        status = str(response.status_code)
+        ok = response.status_code == 200
+        if ok and endpoint == "reviews":
+            # /reviews reports scoring failures in the body with HTTP 200.
+            ok = response.json().get("success", False)
+    except httpx.HTTPError as e:
+        status, ok = type(e).__name__, False
+    recorder.record(endpoint, time.perf_counter() - started, status, ok)
+
+
+async def closed_loop(client, workload: Workload, recorder: Recorder, concurrency: int, stop_at: float):
+    async def user():
+        while time.perf_counter() < stop_at:
+            endpoint, body = workload.next()
+            await _send(client, recorder, endpoint, body, time.perf_counter())
+
+    await asyncio.gather(*(user() for _ in range(concurrency)))
+
+
+async def open_loop(client, workload: Workload, recorder: Recorder, rate: float, concurrency: int,
+                    stop_at: float):
+    outstanding = set()
+    next_arrival = time.perf_counter()
+    while next_arrival < stop_at:
+        delay = next_arrival - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if len(outstanding) >= concurrency:
+            if recorder.recording:
+                recorder.shed += 1
+        else:
+            endpoint, body = workload.next()
+            task = asyncio.create_task(_send(client, recorder, endpoint, body, next_arrival))
+            outstanding.add(task)
+            task.add_done_callback(outstanding.discard)
+        next_arrival += workload.rng.expovariate(rate)
+    if outstanding:
+        await asyncio.gather(*outstanding)
+
+
+async def drive(args) -> dict:
+    workload = Workload(parse_mix(args.mix), args.users, args.page_size, args.seed)
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    headers = {"Authorization": f"Bearer {args.token}"}
+    async with httpx.AsyncClient(base_url=args.url, headers=headers, limits=limits, timeout=args.timeout) as client:
+        start = time.perf_counter()
+        stop_at = start + args.warmup + args.duration
+
+        async def start_recording():
+            await asyncio.sleep(args.warmup)
+            recorder.recording = True
+
+        switch = asyncio.create_task(start_recording())
+        if args.rate:
+            await open_loop(client, workload, recorder, args.rate, args.concurrency, stop_at)
+        else:
+            await closed_loop(client, workload, recorder, args.concurrency, stop_at)
+        await switch
+        elapsed = time.perf_counter() - start - args.warmup
+
+    report = recorder.report(elapsed)
+    report["config"] = {
+        "url": args.url, "mode": "open" if args.rate else "closed", "rate": args.rate,
+        "concurrency": args.concurrency, "mix": args.mix, "duration": args.duration,
+        "warmup": args.warmup, "users": args.users, "page_size": args.page_size,
+    }
+    return report
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def launch_server(workdir: str, port: int, workers: int, env: Dict[str, str]) -> subprocess.Popen:
+    """
+    Starts uvicorn serving fastapi_app from workdir (logs/ and metrics/ go there)
+    with DB_FILE pointing at a scratch database.
+    """
+    server_env = dict(os.environ, DB_FILE=os.path.join(workdir, "load.db"), **env)
+    command = [sys.executable, "-m", "uvicorn", "fastapi_app:app", "--app-dir", REPO_ROOT,
+               "--host", "127.0.0.1", "--port", str(port), "--workers", str(workers), "--log-level", "warning"]
+    return subprocess.Popen(command, cwd=workdir, env=server_env)
+
+
+def wait_until_ready(url: str, token: str, process: Optional[subprocess.Popen], timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode}")
+        try:
+            if httpx.get(f"{url}/cache/stats", headers={"Authorization": f"Bearer {token}"}).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} not ready after {timeout}s")
+
+
+def seed_history(url: str, token: str, users: int, per_user: int):
+    """
+    Stores a little history through /reviews/batch so reads return data.
+    """
+    texts = generate(users * per_user, "mixed", seed=7)
+    reviews = [
+        {"request_id": f"seed-{i}", "user_id": f"user{i % users}", "data": {"review_text": text}}
+        for i, text in enumerate(texts)
+    ]
+    headers = {"Authorization": f"Bearer {token}"}
+    with httpx.Client(base_url=url, headers=headers, timeout=120) as client:
+        for i in range(0, len(reviews), 5000):
+            client.post("/reviews/batch", json={"reviews": reviews[i:i + 5000]}).raise_for_status()
+
+
+def print_report(report: dict):
+    print(f"\n{report['requests']} requests in {report['duration']:.1f}s: {report['throughput']:,.1f} req/s"
+          + (f", {report['client_shed']} arrivals shed by the client" if report["client_shed"] else ""))
+    print(f"{'endpoint':12} {'requests':>9} {'req/s':>9} {'errors':>8} {'p50 ms':>9} {'p95 ms':>9} "
+          f"{'p99 ms':>9} {'max ms':>9}")
+    for name, e in report["endpoints"].items():
+        print(f"{name:12} {e['requests']:9d} {e['throughput']:9.1f} {e['error_rate']:8.2%} "
+              f"{e['p50'] * 1e3:9.2f} {e['p95'] * 1e3:9.2f} {e['p99'] * 1e3:9.2f} {e['max'] * 1e3:9.2f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Load test /reviews, /data_db and /data_all_db.")
+    parser.add_argument("--url", help="Target an already running API instead of launching one.")
+    parser.add_argument("--token", help="Bearer token (default: SECRET_KEY from the environment or .env).")
+    parser.add_argument("--duration", type=float, default=30, help="Measured seconds.")
+    parser.add_argument("--warmup", type=float, default=3, help="Seconds of load before measuring.")
+    parser.add_argument("--concurrency", type=int, default=32,
+                        help="Closed loop: concurrent clients. Open loop: maximum outstanding requests.")
+    parser.add_argument("--rate", type=float, help="Open loop: mean arrivals per second.")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Endpoint weights, e.g. reviews=80,data_db=20.")
+    parser.add_argument("--users", type=int, default=1000, help="Number of distinct user ids.")
+    parser.add_argument("--page-size", type=int, default=100, help="limit sent to the read endpoints.")
+    parser.add_argument("--seed-history", type=int, default=20,
+                        help="Reviews per user stored before a launched run (0 to skip).")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for a launched server.")
+    parser.add_argument("--server-env", action="append", default=[],
+                        help="KEY=VALUE setting for a launched server, e.g. SCORING_MODE=process (repeatable).")
+    parser.add_argument("--timeout", type=float, default=30, help="Per-request timeout in seconds.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also save the report as JSON.")
+    args = parser.parse_args(argv)
+
+    if args.token is None:
+        from dotenv import load_dotenv
+        load_dotenv(os.path.join(REPO_ROOT, ".env"))
+        args.token = os.getenv("SECRET_KEY", "MY_VERY_SECRET_TOKEN")
+
+    process = workdir = None
+    if args.url is None:
+        workdir = tempfile.mkdtemp(prefix="review-load-")
+        port = _free_port()
+        args.url = f"http://127.0.0.1:{port}"
+        server_env = dict(item.split("=", 1) for item in args.server_env)
+        process = launch_server(workdir, port, args.workers, server_env)
+    try:
+        wait_until_ready(args.url, args.token, process)
+        if process is not None and args.seed_history:
+            seed_history(args.url, args.token, args.users, args.seed_history)
+        report = asyncio.run(drive(args))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(report)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,313 @@
+"""
+Module: benchmarks/microbench.py
+Description: Times the scoring, storage and metrics hot paths and flags regressions.
+
+Each benchmark calls one function many times on a synthetic corpus (see corpus.py) and
+records the duration of every call. Results (median, p95, mean, min, max, ops/sec per
+benchmark) are saved as JSON. Benchmarks run in a temporary directory against a fresh
+database, so the real sentiment_analysis.db, logs/ and metrics/ are never touched.
+
+Benchmarks:
+  - sentiment.<kind>: analyze_sentiment on uncached texts of each corpus kind.
+  - sentiment.cached: analyze_sentiment on a text already in the result cache.
+  - db.insert_feedback: one row per transaction.
+  - db.insert_feedback_batch_100: 100 rows per transaction (time per call).
+  - metrics.write_metrics_record: one direct CSV append.
+  - api.reviews: the full POST /reviews path through an in-process test client.
+  - api.reviews_batch_100: POST /reviews/batch with 100 new reviews.
+  - api.data_all_db_1000: POST /data_all_db returning a page of 1000 rows.
+  - api.data_db_5000[_columns]: POST /data_db returning a page of 5000 rows of one user,
+    as row objects or (with the Accept header) column-oriented JSON.
+  - api.export_<format>_20000: GET /export streaming 20000 rows as NDJSON or CSV.
+
+Usage (from the repository root):
+    python -m benchmarks.microbench run --save-baseline
+    python -m benchmarks.microbench run --only sentiment
+    python -m benchmarks.microbench compare   # latest.json against baseline.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+from benchmarks.corpus import generate
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+LATEST_FILE = os.path.join(RESULTS_DIR, "latest.json")
+BASELINE_FILE = os.path.join(RESULTS_DIR, "baseline.json")
+
+# Median slowdown (as a fraction) reported as a regression by compare.
+DEFAULT_THRESHOLD = 0.10
+
+
+def summarize(samples: List[float]) -> dict:
+    """
+    Summarizes per-call durations (seconds).
+    """
+    ordered = sorted(samples)
+    mean = statistics.fmean(ordered)
+    return {
+        "calls": len(ordered),
+        "median": statistics.median(ordered),
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "mean": mean,
+        "min": ordered[0],
+        "max": ordered[-1],
+        "ops_per_sec": 1 / mean if mean else 0.0,
+    }
+
+
+def time_calls(fn: Callable, inputs: Iterable, setup: Optional[Callable] = None, warmup: int = 20) -> dict:
+    """
+    Calls fn(item) for every item and times each call. setup(), if given, runs
+    before every call outside the timed region. The first `warmup` calls are not recorded.
+    """
+    perf_counter = time.perf_counter
+    samples = []
+    for i, item in enumerate(inputs):
+        if setup is not None:
+            setup()
+        start = perf_counter()
+        fn(item)
+        elapsed = perf_counter() - start
+        if i >= warmup:
+            samples.append(elapsed)
+    return summarize(samples)
+
+
+def _benchmarks(number: int) -> Dict[str, Callable[[], dict]]:
+    """
+    Returns the benchmark functions by name. Application modules are imported here,
+    after the working directory and DB_FILE point at the scratch location.
+    """
+    import my_db
+    import metrics_writer
+    from exporters import PAGE_MEDIA_TYPES
+    from models import MetricsData
+    from sentiment_analysis import analyze_sentiment, result_cache
+
+    my_db.create_database()
+
+    def sentiment(kind: str, count: int):
+        texts = generate(count, kind, seed=1)
+        return lambda: time_calls(analyze_sentiment, texts, setup=result_cache.clear)
+
+    def sentiment_cached():
+        analyze_sentiment("This product is great")
+        return time_calls(analyze_sentiment, ["This product is great"] * number)
+
+    def insert_feedback():
+        texts = generate(number, "short", seed=2)
+        return time_calls(
+            lambda item: my_db.insert_feedback(f"bench-{item[0]}", "bench", item[1], "positive", 0.5),
+            enumerate(texts)
+        )
+
+    def insert_feedback_batch():
+        texts = generate(100, "short", seed=3)
+        batches = ([(f"bench-{n}-{i}", "bench", t, "positive", 0.5) for i, t in enumerate(texts)]
+                   for n in range(max(number // 20, 30)))
+        return time_calls(my_db.insert_feedback_batch, batches, warmup=5)
+
+    def write_metrics_record():
+        records = [
+            MetricsData(request_id=f"bench-{i}", user_id="bench", review_text=text,
+                        sentiment="positive", average_confidence_score=1, execution_time=0.001)
+            for i, text in enumerate(generate(number, "short", seed=4))
+        ]
+        return time_calls(metrics_writer.write_metrics_record, records)
+
+    def api_call(path: str, bodies: Iterable[dict], warmup: int = 20, method: str = "POST",
+                 headers: Optional[dict] = None):
+        # bodies are the JSON bodies of POST requests, or the query parameters of GET requests.
+        from fastapi.testclient import TestClient
+        import fastapi_app
+
+        headers = {"Authorization": f"Bearer {fastapi_app.SECRET_KEY}", **(headers or {})}
+        with TestClient(fastapi_app.app) as client:
+            def call(body):
+                if method == "GET":
+                    response = client.get(path, params=body, headers=headers)
+                else:
+                    response = client.post(path, json=body, headers=headers)
+                if response.status_code != 200:
+                    raise RuntimeError(f"{path} returned {response.status_code}: {response.text}")
+            return time_calls(call, bodies, warmup=warmup)
+
+    def api_reviews():
+        return api_call("/reviews", [
+            {"request_id": f"bench-api-{i}", "user_id": "bench", "data": {"review_text": text}}
+            for i, text in enumerate(generate(number, "mixed", seed=5))
+        ])
+
+    def api_reviews_batch():
+        texts = generate(100, "mixed", seed=6)
+        return api_call("/reviews/batch", (
+            {"reviews": [{"request_id": f"bench-batch-{n}-{i}", "user_id": "bench", "data": {"review_text": t}}
+                         for i, t in enumerate(texts)]}
+            for n in range(max(number // 20, 30))
+        ), warmup=5)
+
+    def api_data_all_db():
+        texts = generate(1000, "mixed", seed=7)
+        my_db.insert_feedback_batch(
+            (f"bench-page-{i}", f"bench-{i % 10}", t, "positive", 0.5) for i, t in enumerate(texts))
+        return api_call("/data_all_db", ({"limit": 1000} for _ in range(max(number // 20, 30))), warmup=5)
+
+    large_history = []
+
+    def store_large_history():
+        # 20000 reviews of one user, stored once for the large page and export benchmarks.
+        if not large_history:
+            texts = generate(20000, "mixed", seed=8)
+            large_history.extend(
+                (f"bench-large-{i}", "bench-large", t, "positive", 0.5) for i, t in enumerate(texts))
+            my_db.insert_feedback_batch(large_history)
+
+    def api_data_db(page_format: str):
+        def bench():
+            store_large_history()
+            accept = {"Accept": PAGE_MEDIA_TYPES[page_format]}
+            return api_call("/data_db", ({"id": "bench-large", "limit": 5000} for _ in range(max(number // 50, 15))),
+                            warmup=3, headers=accept)
+        return bench
+
+    def api_export(export_format: str):
+        def bench():
+            store_large_history()
+            return api_call("/export", ({"format": export_format, "user_id": "bench-large"}
+                                        for _ in range(max(number // 100, 10))), warmup=2, method="GET")
+        return bench
+
+    benchmarks = {f"sentiment.{kind}": sentiment(kind, number if kind != "long" else max(number // 10, 50))
+                  for kind in ("short", "long", "emoji", "multilingual")}
+    benchmarks.update({
+        "sentiment.cached": sentiment_cached,
+        "db.insert_feedback": insert_feedback,
+        "db.insert_feedback_batch_100": insert_feedback_batch,
+        "metrics.write_metrics_record": write_metrics_record,
+        "api.reviews": api_reviews,
+        "api.reviews_batch_100": api_reviews_batch,
+        "api.data_all_db_1000": api_data_all_db,
+        "api.data_db_5000": api_data_db("rows"),
+        "api.data_db_5000_columns": api_data_db("columns"),
+        "api.export_ndjson_20000": api_export("ndjson"),
+        "api.export_csv_20000": api_export("csv"),
+    })
+    return benchmarks
+
+
+def run(number: int, only: Optional[str] = None) -> dict:
+    """
+    Runs the benchmarks (those whose name contains `only`, if given) in a scratch
+    directory and returns the results document.
+    """
+    workdir = tempfile.mkdtemp(prefix="review-bench-")
+    previous_cwd = os.getcwd()
+    repo_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    os.environ["DB_FILE"] = os.path.join(workdir, "bench.db")
+    sys.path.insert(0, repo_root)
+    os.chdir(workdir)
+    results = {}
+    try:
+        for name, bench in _benchmarks(number).items():
+            if only and only not in name:
+                continue
+            results[name] = bench()
+            print(f"{name:32} median {results[name]['median'] * 1e6:10.1f} us   "
+                  f"p95 {results[name]['p95'] * 1e6:10.1f} us   {results[name]['ops_per_sec']:12,.0f} ops/s",
+                  flush=True)
+    finally:
+        import my_db
+        my_db.close_connections()
+        os.chdir(previous_cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "calls": number,
+            "sentiment_engine": os.getenv("SENTIMENT_ENGINE", "lexicon"),
+        },
+        "results": results,
+    }
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[str]:
+    """
+    Prints a comparison of median times and returns the names of benchmarks whose
+    median is more than `threshold` (a fraction) slower than the baseline.
+    """
+    regressions = []
+    print(f"{'benchmark':32} {'baseline us':>12} {'current us':>12} {'change':>8}")
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:32} {'-':>12} {result['median'] * 1e6:12.1f}      new")
+            continue
+        change = result["median"] / base["median"] - 1 if base["median"] else 0.0
+        flag = ""
+        if change > threshold:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:32} {base['median'] * 1e6:12.1f} {result['median'] * 1e6:12.1f} {change:+8.1%}{flag}")
+    return regressions
+
+
+def _load(path: str) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _save(path: str, document: dict):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Microbenchmarks for the review scoring service.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the benchmarks and save the results.")
+    run_parser.add_argument("--number", type=int, default=2000, help="Calls per benchmark.")
+    run_parser.add_argument("--only", help="Run only benchmarks whose name contains this string.")
+    run_parser.add_argument("--output", default=LATEST_FILE, help="Results file.")
+    run_parser.add_argument("--save-baseline", action="store_true", help="Also save the results as the baseline.")
+
+    compare_parser = commands.add_parser("compare", help="Compare results against a baseline.")
+    compare_parser.add_argument("current", nargs="?", default=LATEST_FILE)
+    compare_parser.add_argument("--baseline", default=BASELINE_FILE)
+    compare_parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                                help="Median slowdown flagged as a regression (0.10 = 10%%).")
+
+    args = parser.parse_args(argv)
+    if args.command == "run":
+        document = run(args.number, args.only)
+        _save(args.output, document)
+        print(f"Results saved to {args.output}")
+        if args.save_baseline:
+            _save(BASELINE_FILE, document)
+            print(f"Baseline saved to {BASELINE_FILE}")
+        return 0
+
+    regressions = compare(_load(args.baseline), _load(args.current), args.threshold)
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    print("No regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,267 @@
+"""
+Module: bulk_score.py
+Description: Offline bulk scoring of review corpora into the reviews table.
+
+Streams a JSONL or CSV file record by record, scores chunks of reviews across a
+process pool and bulk-loads the results in large transactions. After every
+committed transaction the byte offset of the next unread record is written to a
+checkpoint file, so an interrupted run resumes where it stopped. Rows whose
+request_id is already stored are skipped by the database, so records committed after
+the last checkpoint are not loaded twice. Memory stays bounded: only
+--workers * 2 chunks are in flight at any time.
+
+Accepted records:
+  - JSONL: {"request_id": ..., "user_id": ..., "data": {"review_text": ...}}
+    (the /reviews request body) or flat {"request_id", "user_id", "review_text"}.
+  - CSV: a header row with review_text and optionally request_id and user_id.
+A missing request_id is derived from the file name and record offset, so reruns
+produce the same ids; a missing user_id defaults to --user-id.
+
+Usage:
+    python bulk_score.py reviews.jsonl --workers 8
+    python bulk_score.py reviews.csv --commit-size 50000 --restart
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+import my_db
+from logger import MyLogger
+from sentiment_analysis import analyze_sentiment_batch
+
+logger = MyLogger.get_logger(__name__)
+
+# (request_id, user_id, review_text)
+Record = Tuple[str, str, str]
+
+
+class _LineReader:
+    """
+    Iterates the decoded lines of a binary file from a start offset, remembering
+    the byte offset just after the last line handed out.
+    """
+
+    def __init__(self, handle, offset: int):
+        handle.seek(offset)
+        self.handle = handle
+        self.offset = offset
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        line = self.handle.readline()
+        if not line:
+            raise StopIteration
+        self.offset = self.handle.tell()
+        return line.decode("utf-8")
+
+
+def _record_from_json(obj: dict, default_id: str, default_user: str) -> Record:
+    data = obj.get("data")
+    review_text = data.get("review_text") if isinstance(data, dict) else obj.get("review_text")
+    if review_text is None:
+        raise ValueError("missing review_text")
+    return (
+        str(obj.get("request_id") or default_id),
+        str(obj.get("user_id") or default_user),
+        str(review_text),
+    )
+
+
+def read_records(path: str, fmt: str, offset: int, fieldnames: Optional[List[str]],
+                 default_user: str, state: dict) -> Iterator[Tuple[Optional[Record], int]]:
+    """
+    Yields (record, offset_after_record) from the input, starting at a byte offset.
+    Malformed records are yielded as (None, offset) so they are counted and skipped.
+    state["fieldnames"] is set to the CSV header so it can be checkpointed.
+    """
+    prefix = os.path.basename(path)
+    with open(path, "rb") as handle:
+        lines = _LineReader(handle, offset)
+        if fmt == "jsonl":
+            for line in lines:
+                record_offset = lines.offset
+                if not line.strip():
+                    continue
+                try:
+                    yield _record_from_json(json.loads(line), f"{prefix}:{record_offset}", default_user), record_offset
+                except (ValueError, AttributeError) as e:
+                    logger.warning("bulk_score - Skipping malformed record before offset %s: %s", record_offset, e)
+                    yield None, record_offset
+        else:
+            reader = csv.reader(lines)
+            if fieldnames is None:
+                fieldnames = next(reader, None) or []
+            state["fieldnames"] = fieldnames
+            for row in reader:
+                record_offset = lines.offset
+                if not row:
+                    continue
+                try:
+                    yield _record_from_json(dict(zip(fieldnames, row)), f"{prefix}:{record_offset}", default_user), record_offset
+                except ValueError as e:
+                    logger.warning("bulk_score - Skipping malformed row before offset %s: %s", record_offset, e)
+                    yield None, record_offset
+
+
+def _chunks(records, size: int):
+    """
+    Groups (record, offset) pairs into (records, skipped, end_offset) chunks.
+    """
+    chunk, skipped, end_offset = [], 0, None
+    for record, offset in records:
+        end_offset = offset
+        if record is None:
+            skipped += 1
+        else:
+            chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk, skipped, end_offset
+            chunk, skipped = [], 0
+    if chunk or skipped:
+        yield chunk, skipped, end_offset
+
+
+def _score_chunk(records: List[Record]) -> List[Tuple]:
+    """
+    Scores a chunk in a worker process. Returns insert-ready rows; reviews that
+    fail to score are dropped.
+    """
+    results = analyze_sentiment_batch([text for _request_id, _user_id, text in records])
+    return [
+        (request_id, user_id, text, result["sentiment"], result["confidence"])
+        for (request_id, user_id, text), result in zip(records, results)
+        if result["sentiment"] is not None
+    ]
+
+
+def load_checkpoint(path: str, input_path: str) -> dict:
+    if not os.path.isfile(path):
+        return {"input": input_path, "offset": 0, "rows": 0, "skipped": 0, "duplicates": 0, "fieldnames": None}
+    with open(path, encoding="utf-8") as f:
+        checkpoint = json.load(f)
+    if checkpoint.get("input") != input_path:
+        raise ValueError(f"Checkpoint {path} belongs to {checkpoint.get('input')}, not {input_path}")
+    return checkpoint
+
+
+def save_checkpoint(path: str, checkpoint: dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp, path)
+
+
+def run(args) -> int:
+    fmt = args.format or ("csv" if args.input.lower().endswith(".csv") else "jsonl")
+    checkpoint_path = args.checkpoint or args.input + ".checkpoint"
+    if args.restart and os.path.isfile(checkpoint_path):
+        os.remove(checkpoint_path)
+    checkpoint = load_checkpoint(checkpoint_path, args.input)
+    if checkpoint["offset"]:
+        print(f"Resuming {args.input} at byte {checkpoint['offset']} ({checkpoint['rows']} rows already loaded)")
+
+    my_db.create_database()
+    state = {"fieldnames": checkpoint.get("fieldnames")}
+    records = read_records(args.input, fmt, checkpoint["offset"], state["fieldnames"], args.user_id, state)
+    chunks = _chunks(records, args.chunk_size)
+
+    pool = None
+    if args.workers > 0:
+        pool = ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    start = time.perf_counter()
+    last_report = start
+    loaded = 0
+    pending_rows, pending_skipped, pending_offset = [], 0, None
+    in_flight = deque()
+
+    def commit():
+        nonlocal pending_rows, pending_skipped, loaded
+        if pending_offset is None:
+            return
+        inserted = my_db.insert_feedback_batch(pending_rows)
+        loaded += inserted
+        checkpoint["rows"] += inserted
+        checkpoint["duplicates"] = checkpoint.get("duplicates", 0) + len(pending_rows) - inserted
+        checkpoint["skipped"] += pending_skipped
+        checkpoint["offset"] = pending_offset
+        checkpoint["fieldnames"] = state["fieldnames"]
+        save_checkpoint(checkpoint_path, checkpoint)
+        pending_rows, pending_skipped = [], 0
+
+    try:
+        exhausted = False
+        while not exhausted or in_flight:
+            # Keep a bounded number of chunks in flight; results are consumed in input order.
+            while not exhausted and len(in_flight) < max(args.workers, 1) * 2:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    exhausted = True
+                    break
+                records_, skipped, end_offset = chunk
+                future = pool.submit(_score_chunk, records_) if pool else None
+                in_flight.append((future, records_, skipped, end_offset))
+            if not in_flight:
+                break
+
+            future, records_, skipped, end_offset = in_flight.popleft()
+            rows = future.result() if future is not None else _score_chunk(records_)
+            pending_skipped += skipped + len(records_) - len(rows)
+            pending_rows.extend(rows)
+            pending_offset = end_offset
+            if len(pending_rows) >= args.commit_size:
+                commit()
+
+            now = time.perf_counter()
+            if now - last_report >= args.report_every:
+                rate = (loaded + len(pending_rows)) / (now - start)
+                print(f"{loaded + len(pending_rows)} rows scored, {loaded} committed, {rate:,.0f} rows/s", flush=True)
+                last_report = now
+        commit()
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        my_db.close_connections()
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Done: {loaded} rows loaded in {elapsed:.1f}s ({loaded / max(elapsed, 1e-9):,.0f} rows/s), "
+        f"{checkpoint['rows']} total, {checkpoint['skipped']} skipped, "
+        f"{checkpoint.get('duplicates', 0)} already stored"
+    )
+    logger.info("bulk_score - Loaded %d rows from %s in %.1fs", loaded, args.input, elapsed)
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk score a JSONL or CSV review corpus into the reviews table.")
+    parser.add_argument("input", help="Path of the JSONL or CSV input file.")
+    parser.add_argument("--format", choices=("jsonl", "csv"), help="Input format (default: from the file extension).")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="Scoring processes; 0 scores in this process.")
+    parser.add_argument("--chunk-size", type=int, default=2000, help="Reviews per worker task.")
+    parser.add_argument("--commit-size", type=int, default=20000, help="Rows per database transaction.")
+    parser.add_argument("--checkpoint", help="Checkpoint file (default: <input>.checkpoint).")
+    parser.add_argument("--restart", action="store_true", help="Ignore any existing checkpoint.")
+    parser.add_argument("--user-id", default="bulk", help="user_id for records without one.")
+    parser.add_argument("--report-every", type=float, default=5.0, help="Seconds between progress reports.")
+    args = parser.parse_args(argv)
+    try:
+        return run(args)
+    except KeyboardInterrupt:
+        print(f"Interrupted; rerun the same command to resume from {args.checkpoint or args.input + '.checkpoint'}")
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
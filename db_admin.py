@@ -0,0 +1,169 @@
+"""
+Module: db_admin.py
+Description: Maintenance commands for the reviews database.
+
+Usage:
+    python db_admin.py rebuild-summary
+    python db_admin.py rebuild-rollups
+    python db_admin.py dedupe-request-ids
+    python db_admin.py rebuild-search
+    python db_admin.py optimize-search
+    python db_admin.py compact-storage [--chunk-size N] [--pause SECONDS]
+    python db_admin.py apply-retention [--months N] [--archive-dir DIR] [--dry-run] [--vacuum]
+    python db_admin.py migrate-metrics
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+import my_db
+from metrics_writer import METRICS_FILE, migrate_metrics_file
+
+load_dotenv()
+
+
+def rebuild_summary(args) -> int:
+    start = time.perf_counter()
+    users = my_db.rebuild_user_summary()
+    print(f"Rebuilt user_summary for {users} users in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+def rebuild_rollups(args) -> int:
+    start = time.perf_counter()
+    buckets = my_db.rebuild_rollups()
+    print(f"Rebuilt review_rollups ({buckets} buckets) in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+def dedupe_request_ids(args) -> int:
+    deleted = my_db.dedupe_request_ids()
+    print(f"Deleted {deleted} duplicate reviews; request_id is now unique")
+    return 0
+
+
+def rebuild_search(args) -> int:
+    start = time.perf_counter()
+    reviews = my_db.rebuild_search_index()
+    print(f"Rebuilt the search index ({reviews} reviews) in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+def optimize_search(args) -> int:
+    start = time.perf_counter()
+    my_db.optimize_search_index()
+    print(f"Optimized the search index in {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+def compact_storage(args) -> int:
+    start = time.perf_counter()
+
+    def report(copied, total):
+        print(f"Copied {copied}/{total} reviews ({time.perf_counter() - start:.1f}s)", flush=True)
+
+    try:
+        copied = my_db.compact_storage(chunk_size=args.chunk_size, pause=args.pause, on_progress=report)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"reviews uses monthly partitions ({copied} reviews migrated in {time.perf_counter() - start:.2f}s)")
+    return 0
+
+
+def apply_retention(args) -> int:
+    if args.months <= 0:
+        print("No retention configured; pass --months or set REVIEW_RETENTION_MONTHS", file=sys.stderr)
+        return 1
+    start = time.perf_counter()
+    try:
+        months = my_db.apply_retention(args.months, archive_dir=args.archive_dir or None,
+                                       dry_run=args.dry_run, pause=args.pause)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    if args.dry_run:
+        print(f"Would drop {len(months)} partitions: {', '.join(months) or '-'}")
+    else:
+        print(f"Dropped {len(months)} partitions ({', '.join(months) or '-'}) "
+              f"in {time.perf_counter() - start:.2f}s")
+        if months and args.vacuum:
+            my_db.vacuum_database()
+            print(f"Vacuumed the database in {time.perf_counter() - start:.2f}s")
+        elif months:
+            print("The freed space is reused for new reviews; run with --vacuum (API stopped) "
+                  "to shrink the database file")
+    return 0
+
+
+def migrate_metrics(args) -> int:
+    rows = migrate_metrics_file()
+    if rows:
+        print(f"Rewrote {rows} rows of {METRICS_FILE} with the current columns")
+    else:
+        print(f"{METRICS_FILE} is missing or already current")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Maintenance commands for the reviews database.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    summary_parser = commands.add_parser(
+        "rebuild-summary",
+        help="Recompute user_summary from the stored reviews; months dropped by retention are lost.")
+    summary_parser.set_defaults(handler=rebuild_summary)
+
+    rollups_parser = commands.add_parser(
+        "rebuild-rollups",
+        help="Recompute review_rollups from the stored reviews; months dropped by retention are lost.")
+    rollups_parser.set_defaults(handler=rebuild_rollups)
+
+    dedupe_parser = commands.add_parser(
+        "dedupe-request-ids", help="Keep the first review per request_id and enforce uniqueness.")
+    dedupe_parser.set_defaults(handler=dedupe_request_ids)
+
+    search_parser = commands.add_parser("rebuild-search", help="Rebuild the full-text search index from reviews.")
+    search_parser.set_defaults(handler=rebuild_search)
+
+    optimize_parser = commands.add_parser("optimize-search", help="Merge the full-text index segments.")
+    optimize_parser.set_defaults(handler=optimize_search)
+
+    compact_parser = commands.add_parser(
+        "compact-storage", help="Migrate a legacy reviews table to monthly partitions, online.")
+    compact_parser.add_argument("--chunk-size", type=int, default=10000, help="Rows copied per transaction.")
+    compact_parser.add_argument("--pause", type=float, default=0.05,
+                                help="Seconds between transactions, leaving the database to other writers.")
+    compact_parser.set_defaults(handler=compact_storage)
+
+    retention_parser = commands.add_parser(
+        "apply-retention", help="Drop (and optionally archive) the partitions of expired months.")
+    retention_parser.add_argument("--months", type=int, default=int(os.getenv("REVIEW_RETENTION_MONTHS", "0")),
+                                  help="Calendar months kept, the current one included.")
+    retention_parser.add_argument("--archive-dir", default=os.getenv("REVIEW_ARCHIVE_DIR", ""),
+                                  help="Directory to copy each partition to before it is dropped.")
+    retention_parser.add_argument("--dry-run", action="store_true", help="Only list the partitions to drop.")
+    retention_parser.add_argument("--pause", type=float, default=0.05,
+                                  help="Seconds between transactions, leaving the database to other writers.")
+    retention_parser.add_argument("--vacuum", action="store_true",
+                                  help="VACUUM afterwards to shrink the file; blocks writers, so stop the API first.")
+    retention_parser.set_defaults(handler=apply_retention)
+
+    metrics_parser = commands.add_parser(
+        "migrate-metrics", help="Rewrite a Metrics.csv with outdated columns to the current header.")
+    metrics_parser.set_defaults(handler=migrate_metrics)
+
+    args = parser.parse_args(argv)
+    my_db.create_database()
+    try:
+        return args.handler(args)
+    finally:
+        my_db.close_connections()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
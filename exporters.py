@@ -0,0 +1,85 @@
+"""
+Module: exporters.py
+Description: Encoders that turn chunks of review rows into streamed export formats.
+
+Each encoder takes the exported column names and an iterator of row chunks
+(as produced by my_db.iter_review_chunks) and yields one string per chunk,
+so a response can be streamed without holding the whole table in memory.
+
+History pages (POST /data_db and /data_all_db) are offered in two formats,
+chosen by the Accept header: "rows", the JSON array of row objects, and
+"columns", one JSON object mapping each column name to the list of its values.
+The column format names each column once instead of once per row, and a
+dataframe is built from it without per-row parsing.
+"""
+
+import csv
+import io
+from typing import Iterable, Iterator, List, Sequence
+
+import orjson
+
+# Export format name -> media type.
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+}
+
+
+def ndjson_lines(columns: List[str], chunks: Iterable[Sequence[tuple]]) -> Iterator[bytes]:
+    """
+    Yields newline-delimited JSON (UTF-8): one object per row.
+    """
+    dumps = orjson.dumps
+    for rows in chunks:
+        yield b"".join(dumps(dict(zip(columns, row))) + b"\n" for row in rows)
+
+
+def csv_lines(columns: List[str], chunks: Iterable[Sequence[tuple]]) -> Iterator[str]:
+    """
+    Yields CSV text: a header row followed by the data rows.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+ENCODERS = {
+    "ndjson": ndjson_lines,
+    "csv": csv_lines,
+}
+
+
+# History page format name -> media type, default first.
+PAGE_MEDIA_TYPES = {
+    "rows": "application/json",
+    "columns": "application/vnd.reviews.columns+json",
+}
+
+
+def rows_json(columns: Sequence[str], rows: Sequence[tuple]) -> bytes:
+    """
+    Returns a page of rows as a JSON array of row objects.
+    """
+    return orjson.dumps([dict(zip(columns, row)) for row in rows])
+
+
+def columns_json(columns: Sequence[str], rows: Sequence[tuple]) -> bytes:
+    """
+    Returns a page of rows as one JSON object of column name -> list of values.
+    """
+    values = list(zip(*rows)) if rows else [()] * len(columns)
+    return orjson.dumps(dict(zip(columns, values)))
+
+
+PAGE_ENCODERS = {
+    "rows": rows_json,
+    "columns": columns_json,
+}
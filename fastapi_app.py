@@ -3,23 +3,48 @@ FastAPI application that secures a review-sentiment endpoint with a static Beare
 The token is read from the SECRET_KEY environment variable.
 """
 
+import asyncio
+import math
 import os
 import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
 from dotenv import load_dotenv
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import iterate_in_threadpool
+from fastapi.responses import ORJSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from models import (
     ProductReviewRequest,
     ProductReviewResponse,
-    ProductReviewResponseData,
+    ProductReviewBatchRequest,
+    ProductReviewBatchResponse,
     MetricsData,
-    Dataretrieve
+    Dataretrieve,
+    HistoryQuery,
+    UserSummary,
+    RollupResponse,
+    SearchResponse,
+    JobAccepted,
+    JobStatus,
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE
 )
-from sentiment_analysis import analyze_sentiment
+from sentiment_analysis import result_cache
 from logger import MyLogger
 import my_db 
-from my_db import file
-from metrics_writer import write_metrics_record
+from metrics_writer import metrics_sink, write_metrics_record, write_metrics_records
+from write_behind import feedback_writer
+from exporters import ENCODERS, MEDIA_TYPES, PAGE_ENCODERS, PAGE_MEDIA_TYPES
+import monitoring
+import profiling
+from profiling import profiler
+from scoring_executor import scoring_executor
+from single_flight import SingleFlight
+from jobs import QueueFullError, job_queue
+from admission import HIGH, LOW, NORMAL, Overloaded, RateLimited, admission
 
 # Load environment variables from a .env file if present.
 load_dotenv()
@@ -30,6 +55,9 @@ logger = MyLogger.get_logger(__name__)
 # Retrieve the static token from SECRET_KEY, or use a default.
 SECRET_KEY = os.getenv("SECRET_KEY", "MY_VERY_SECRET_TOKEN")
 
+# Whether responses carry a Server-Timing header with the per-stage durations.
+SERVER_TIMING = os.getenv("SERVER_TIMING", "true").lower() in ("1", "true", "yes")
+
 # HTTPBearer is a FastAPI security utility that extracts "Authorization: Bearer <token>"
 auth_scheme = HTTPBearer()
 
@@ -54,124 +82,793 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Expose the state of the cache and the background queues alongside the latency histograms.
+monitoring.registry.callback(
+    "sentiment_cache_entries", "Entries in the sentiment result cache.",
+    lambda: result_cache.stats()["size"])
+monitoring.registry.callback(
+    "sentiment_cache_hits_total", "Sentiment result cache hits.",
+    lambda: result_cache.hits, type="counter")
+monitoring.registry.callback(
+    "sentiment_cache_misses_total", "Sentiment result cache misses.",
+    lambda: result_cache.misses, type="counter")
+monitoring.registry.callback(
+    "sentiment_cache_evictions_total", "Sentiment result cache evictions.",
+    lambda: result_cache.evictions, type="counter")
+monitoring.registry.callback(
+    "feedback_queue_depth", "Feedback rows waiting in the write-behind queue.",
+    feedback_writer.qsize)
+monitoring.registry.callback(
+    "metrics_queue_depth", "Metrics records waiting in the metrics sink queue.",
+    metrics_sink.qsize)
+monitoring.registry.callback(
+    "scoring_in_flight", "Scoring calls currently running in the scoring executor.",
+    lambda: scoring_executor.in_flight)
+monitoring.registry.callback(
+    "metrics_dropped_total", "Metrics records dropped because the sink queue was full.",
+    lambda: metrics_sink.dropped, type="counter")
+monitoring.registry.callback(
+    "job_queue_depth", "Async review jobs waiting to start.",
+    job_queue.qsize)
+monitoring.registry.callback(
+    "jobs_rejected_total", "Async review jobs rejected because the job queue was full.",
+    lambda: job_queue.rejected, type="counter")
+monitoring.registry.callback(
+    "admission_in_flight", "Review requests holding an admission slot.",
+    admission.in_flight)
+monitoring.registry.callback(
+    "admission_waiting", "Review requests waiting for an admission slot.",
+    admission.waiting)
+monitoring.registry.callback(
+    "scoring_coalesced_total", "Scoring calls that reused a concurrent call's result for the same text.",
+    lambda: scoring_executor.coalesced, type="counter")
+
+# Concurrent /reviews requests with the same request_id are processed once.
+review_flights = SingleFlight()
+
+class RequestIdConflict(Exception):
+    """
+    Raised when a request_id that is stored (or being processed) for one user_id
+    is sent again with another user_id.
+    """
+
+class RequestMetricsMiddleware:
+    """
+    Records the duration, status and errors of every request, and reports the
+    stages timed while handling it in the Server-Timing header.
+    Handlers may set request.state.sentiment to label the duration, and
+    request.state.failed for errors returned as structured 200 responses.
+
+    A plain ASGI middleware: it runs the request in the same task and only
+    wraps send, rather than re-wrapping the response like @app.middleware("http").
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        # Shared with request.state of the handlers, which read it from the scope.
+        state = scope.setdefault("state", {})
+        status_code = 500  # If the application fails before starting a response.
+
+        with monitoring.request_timings() as timings:
+            async def send_with_timing(message):
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    if SERVER_TIMING:
+                        value = monitoring.server_timing(timings, total=time.perf_counter() - start_time)
+                        message = {**message, "headers": [*message.get("headers", ()),
+                                                          (b"server-timing", value.encode("latin-1"))]}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                duration = time.perf_counter() - start_time
+                route = scope.get("route")
+                endpoint = route.path if route is not None else "unmatched"
+                monitoring.REQUEST_SECONDS.observe(
+                    duration,
+                    endpoint=endpoint,
+                    sentiment=state.get("sentiment", "none")
+                )
+                monitoring.REQUESTS_TOTAL.inc(endpoint=endpoint, status=str(status_code))
+                if status_code >= 500 or state.get("failed", False):
+                    monitoring.ERRORS_TOTAL.inc(endpoint=endpoint)
+
+app.add_middleware(RequestMetricsMiddleware)
+
 @app.on_event("startup")
-def startup_event():
+async def startup_event():
     """
     Called when the FastAPI application starts.
-    Ensures the database and necessary tables are created.
+    Ensures the database and necessary tables are created and starts the
+    scoring executor, the write-behind writer, the metrics sink and the job workers.
     """
     logger.info("Application startup: Initializing database.")
     my_db.create_database()  # Create/Verify the database and table existence.
+    await scoring_executor.start()
+    await feedback_writer.start()
+    metrics_sink.start()
+    await job_queue.start(_run_review_job)
 
-@app.post("/data_all_db")
-async def retrieve_data_db(token: str = Depends(verify_token)):
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    Called when the FastAPI application stops.
+    Runs the queued jobs, then flushes all feedback rows and metrics records still
+    waiting in their queues.
+    """
+    logger.info("Application shutdown: Flushing pending feedback rows and metrics.")
+    await job_queue.stop()
+    await scoring_executor.stop()
+    await feedback_writer.stop()
+    my_db.close_connections()
+    await asyncio.to_thread(metrics_sink.stop)
+
+@app.get("/metrics", response_class=PlainTextResponse, tags=["Monitoring"])
+async def metrics(token: str = Depends(verify_token)):
+    """
+    Returns latency histograms, request and error counts and cache/queue gauges
+    in the Prometheus text exposition format.
+    """
+    return PlainTextResponse(
+        monitoring.registry.render(),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+@app.get("/cache/stats", tags=["Monitoring"])
+async def cache_stats(token: str = Depends(verify_token)):
+    """
+    Returns size and hit/miss/eviction counters of the sentiment result cache.
+    """
+    return result_cache.stats()
+
+@app.get("/debug/profile", tags=["Monitoring"])
+async def debug_profile(
+    seconds: float = Query(10.0, gt=0, description="How long to profile"),
+    mode: str = Query("cprofile", description="cprofile (event-loop thread) or sample (all threads)"),
+    format: str = Query("text", description="cprofile only: text or pstats"),
+    sort: str = Query("cumulative", description="cprofile text only: pstats sort order"),
+    limit: int = Query(50, ge=1, description="cprofile text only: number of functions listed"),
+    interval: float = Query(0.005, gt=0, le=1, description="sample only: seconds between samples"),
+    token: str = Depends(verify_token)
+):
+    """
+    Profiles the live API for `seconds` and returns the profile: a cProfile
+    report (or .pstats file) of the event-loop thread, or sampled stacks of all
+    threads in collapsed form for flame graphs. One profile runs at a time.
+    """
+    if seconds > profiler.max_seconds:
+        raise HTTPException(status_code=400, detail=f"seconds must be at most {profiler.max_seconds:g}")
+    if mode not in ("cprofile", "sample"):
+        raise HTTPException(status_code=400, detail="mode must be 'cprofile' or 'sample'")
+    if format not in ("text", "pstats"):
+        raise HTTPException(status_code=400, detail="format must be 'text' or 'pstats'")
+    if sort not in profiling.SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(profiling.SORT_KEYS)}")
 
     try:
-        query = "SELECT * FROM reviews"
-        results = await file.fetch_all(query=query)
+        if mode == "sample":
+            stacks = await asyncio.to_thread(profiler.sample, seconds, interval)
+            return PlainTextResponse(stacks)
+        profile = await profiler.cprofile(seconds)
+    except profiling.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
 
-        return  results
+    if format == "pstats":
+        return Response(
+            profiling.dump_stats(profile),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": 'attachment; filename="profile.pstats"'}
+        )
+    return PlainTextResponse(profiling.format_stats(profile, sort=sort, limit=limit))
+
+def _negotiate(accept: Optional[str], offered: dict) -> Optional[str]:
+    """
+    Returns the name of the offered format (name -> media type, default first)
+    that best matches an Accept header, or None if none is acceptable. Higher
+    q-values win, then exact media types over wildcards, then the earlier format.
+    """
+    if not accept:
+        return next(iter(offered))
+    best, best_rank = None, None
+    for part in accept.split(","):
+        media_range, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality <= 0:
+            continue
+        for index, (name, media_type) in enumerate(offered.items()):
+            if media_range == media_type:
+                specificity = 2
+            elif media_range in ("*/*", media_type.split("/")[0] + "/*"):
+                specificity = 0
+            else:
+                continue
+            rank = (quality, specificity, -index)
+            if best_rank is None or rank > best_rank:
+                best, best_rank = name, rank
+    return best
+
+async def _history_page(query: HistoryQuery, request: Request, user_id: Optional[str] = None):
+    """
+    Fetches one page of history and sets the X-Next-Cursor header when more rows follow.
+    The page is a JSON array of row objects, or column-oriented JSON when the
+    Accept header asks for it (see exporters.PAGE_MEDIA_TYPES).
+    """
+    page_format = _negotiate(request.headers.get("accept"), PAGE_MEDIA_TYPES)
+    if page_format is None:
+        raise HTTPException(
+            status_code=status.HTTP_406_NOT_ACCEPTABLE,
+            detail=f"Unsupported Accept header. Use one of {list(PAGE_MEDIA_TYPES.values())}"
+        )
+    try:
+        rows, next_cursor = await my_db.fetch_review_rows(
+            limit=query.limit,
+            user_id=user_id,
+            after=query.after,
+            start=query.start,
+            end=query.end
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
-        print(e)
+        logger.error("Error retrieving history for user_id=%s: %s", user_id, e)
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="An error occurred while retrieving history"
+        )
+
+    headers = {"Vary": "Accept"}
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = next_cursor
+    # The rows are encoded straight from the database tuples, skipping FastAPI's generic encoding.
+    return Response(
+        PAGE_ENCODERS[page_format](my_db.REVIEW_COLUMNS, rows),
+        media_type=PAGE_MEDIA_TYPES[page_format],
+        headers=headers
+    )
+
+@app.post("/data_all_db", tags=["Data Retrieval"])
+async def retrieve_data_db(
+    request: Request,
+    query: Optional[HistoryQuery] = None,
+    token: str = Depends(verify_token)
+):
+    """
+    Returns one page of reviews of all users, oldest first.
+    The body is optional; without it the first DEFAULT_PAGE_SIZE rows are returned.
+    """
+    return await _history_page(query or HistoryQuery(), request)
 
 @app.post("/data_db",tags=["Data Retrieval"])
-async def fetch_data(id: Dataretrieve,token: str = Depends(verify_token)):
+async def fetch_data(id: Dataretrieve, request: Request, token: str = Depends(verify_token)):
+    """
+    Returns one page of reviews of the given user, oldest first.
+    """
+    return await _history_page(id, request, user_id=id.id)
+
+@app.get("/users/{user_id}/summary", response_model=UserSummary, tags=["Data Retrieval"])
+async def user_summary(user_id: str, token: str = Depends(verify_token)):
+    """
+    Returns the sentiment counts and confidence statistics of a user.
+    Reads one row of the incrementally maintained user_summary table,
+    so the cost does not depend on the size of the user's history.
+    """
     try:
-        query = "SELECT * FROM reviews WHERE user_id={}".format(str(id.id))
-        results = await file.fetch_all(query=query)
+        row = await my_db.fetch_user_summary(user_id)
+    except Exception as e:
+        logger.error("user_summary - Failed to read summary for user_id=%s: %s", user_id, e)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal Server Error")
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"No reviews for user {user_id}")
 
-        return  results
+    total = row["total"]
+    mean = row["confidence_sum"] / total
+    variance = max(row["confidence_sq_sum"] / total - mean * mean, 0.0)
+    return UserSummary(
+        user_id=user_id,
+        total=total,
+        positive=row["positive"],
+        negative=row["negative"],
+        neutral=row["neutral"],
+        average_confidence=round(mean, 4),
+        confidence_stddev=round(math.sqrt(variance), 4),
+        first_seen=row["first_seen"],
+        last_seen=row["last_seen"]
+    )
+
+@app.get("/rollups", response_model=RollupResponse, tags=["Data Retrieval"])
+async def rollups(
+    granularity: str = Query("hour", description="Bucket size: minute, hour or day."),
+    start: Optional[datetime] = Query(None, description="First bucket to return: the one containing this time (UTC if naive)."),
+    end: Optional[datetime] = Query(None, description="Only buckets starting before this time (UTC if naive)."),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum buckets; the latest ones if start is omitted."),
+    token: str = Depends(verify_token)
+):
+    """
+    Returns sentiment counts and mean confidence per time bucket, oldest first.
+    Buckets are read from the precomputed review_rollups table, so the cost depends
+    on the number of buckets, not the number of reviews. Empty buckets are omitted.
+    """
+    try:
+        buckets = await my_db.fetch_rollups(granularity, start=start, end=end, limit=limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
     except Exception as e:
-        print(e)
+        logger.error("rollups - Failed to read %s rollups: %s", granularity, e)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal Server Error")
+    return RollupResponse(granularity=granularity, buckets=buckets)
 
-@app.post("/reviews", response_model=ProductReviewResponse, tags=["Sentiment Analysis"])
-async def analyze_product_review(
-    review_request: ProductReviewRequest,
+@app.get("/search", response_model=SearchResponse, tags=["Data Retrieval"])
+async def search(
+    q: str = Query(..., description="Words the review must contain; end a word with * to match a prefix."),
+    sentiment: Optional[str] = Query(None, description="Only reviews with this sentiment: positive, negative or neutral."),
+    user_id: Optional[str] = Query(None, description="Only reviews of this user."),
+    start: Optional[datetime] = Query(None, description="Only reviews created at or after this time (UTC if naive)."),
+    end: Optional[datetime] = Query(None, description="Only reviews created before this time (UTC if naive)."),
+    limit: int = Query(20, ge=1, le=1000, description="Maximum results to return."),
+    offset: int = Query(0, ge=0, description="Results to skip; the next_offset of the previous page."),
     token: str = Depends(verify_token)
-) -> ProductReviewResponse:
+):
     """
-    POST endpoint for analyzing a product review.
-    The caller must provide a valid Bearer token matching SECRET_KEY.
-    Returns a structured response with sentiment data or error details.
+    Full-text search over stored reviews, best match first.
+    Served by the reviews_fts index, so only matching reviews are read.
     """
-    start_time = time.perf_counter()
     try:
-        logger.info(
-            f"analyze_product_review - Received request_id={review_request.request_id}, "
-            f"user_id={review_request.user_id}"
+        rows, next_offset = await my_db.search_reviews(
+            q, limit=limit, offset=offset, sentiment=sentiment, user_id=user_id, start=start, end=end)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error("search - Failed to search for q=%r: %s", q, e)
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Internal Server Error")
+    return SearchResponse(query=q, results=rows, next_offset=next_offset)
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse that closes its body iterator as soon as the response ends:
+    sent in full, cut short by a client disconnect, or failed. Starlette leaves
+    an unfinished iterator to the garbage collector.
+    """
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
+
+async def _export_stream(body: Iterator, chunks) -> AsyncIterator:
+    """
+    Yields the encoded export, produced in a worker thread, and closes the row
+    chunks when done, which releases their database connection at once.
+    """
+    try:
+        async for part in iterate_in_threadpool(body):
+            yield part
+    finally:
+        chunks.close()
+
+@app.get("/export", tags=["Data Retrieval"])
+async def export_history(
+    format: str = Query("ndjson", description="Export format: ndjson or csv."),
+    columns: Optional[str] = Query(None, description="Comma-separated columns; all columns if omitted."),
+    user_id: Optional[str] = Query(None, description="Only export reviews of this user."),
+    start: Optional[datetime] = Query(None, description="Only rows created at or after this time (UTC if naive)."),
+    end: Optional[datetime] = Query(None, description="Only rows created before this time (UTC if naive)."),
+    token: str = Depends(verify_token)
+):
+    """
+    Streams the review history as NDJSON or CSV, oldest first.
+    Rows are read from the database in chunks while the response is sent,
+    so memory use stays constant regardless of table size.
+    """
+    if format not in ENCODERS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported format: {format}. Use one of {sorted(ENCODERS)}"
         )
+    selected = [c.strip() for c in columns.split(",") if c.strip()] if columns else list(my_db.REVIEW_COLUMNS)
+    try:
+        chunks = my_db.iter_review_chunks(columns=selected, user_id=user_id, start=start, end=end)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
-        # Perform sentiment analysis on the provided review text.
-        result = analyze_sentiment(review_request.data.review_text)
+    logger.info("export_history - Streaming %s export of columns=%s", format, selected)
+    return ClosingStreamingResponse(
+        _export_stream(ENCODERS[format](selected, chunks), chunks),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="reviews.{format}"'}
+    )
 
-        # Convert float confidence (e.g., 0.85) to integer (85).
-        confidence_int = int(result["confidence"] * 100)
+async def _lookup_reviews(request_ids: List[str]) -> Dict[str, dict]:
+    """
+    Returns the reviews already stored under the given request ids as request_id ->
+    {"user_id", "sentiment", "confidence"}, including rows acknowledged in "enqueue"
+    mode that are still waiting in the write-behind queue.
+    """
+    found, missing = {}, []
+    for request_id in request_ids:
+        row = feedback_writer.pending(request_id)
+        if row is not None:
+            found[request_id] = {"user_id": row[1], "sentiment": row[3], "confidence": row[4]}
+        else:
+            missing.append(request_id)
+    if missing:
+        found.update(await my_db.fetch_reviews_by_request_id(missing))
+    return found
 
-        # Store the feedback data into the database.
-        my_db.insert_feedback(
-            request_id=review_request.request_id,
-            user_id=review_request.user_id,
-            review_text=review_request.data.review_text,
-            sentiment=result["sentiment"],
-            confidence=result["confidence"]  # stored as float 0-1
+async def _score_and_store(review_request: ProductReviewRequest):
+    """
+    Returns (result, stored) for a review: the stored result if its request_id is
+    already stored, otherwise a fresh score after storing it. The result holds the
+    user_id, sentiment and confidence of the stored row.
+    """
+    with monitoring.stage("lookup"):
+        stored = (await _lookup_reviews([review_request.request_id])).get(review_request.request_id)
+    if stored is not None:
+        return {"user_id": stored["user_id"], "sentiment": stored["sentiment"],
+                "confidence": stored["confidence"]}, True
+
+    # Perform sentiment analysis on the provided review text.
+    with monitoring.stage("score") as timer:
+        result = await scoring_executor.score(review_request.data.review_text)
+    monitoring.SCORING_SECONDS.observe(timer.elapsed, endpoint="/reviews", sentiment=result["sentiment"])
+
+    # Store the feedback data into the database through the write-behind queue.
+    with monitoring.stage("store") as timer:
+        await feedback_writer.submit((
+            review_request.request_id,
+            review_request.user_id,
+            review_request.data.review_text,
+            result["sentiment"],
+            result["confidence"]  # stored as float 0-1
+        ))
+    monitoring.DB_WRITE_SECONDS.observe(timer.elapsed, endpoint="/reviews")
+    return {"user_id": review_request.user_id, **result}, False
+
+@asynccontextmanager
+async def _admitted(priority: str, user_id: Optional[str] = None, token: Optional[str] = None,
+                    user_costs: Optional[Dict[str, int]] = None):
+    """
+    Runs the block under admission control: 429 if the client is over its rate
+    limit, 503 if the request is shed because the service is overloaded.
+    A batch passes user_costs (user_id -> number of its reviews) instead of user_id.
+    """
+    try:
+        async with admission.admit(priority, user_id=user_id, token=token, user_costs=user_costs):
+            yield
+    except RateLimited as e:
+        logger.warning("Rate limited %s (user_id=%s)", e.key_type, user_id or ",".join(user_costs or ()))
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
         )
-        
-        # Build a success response with status_code=200 and success=True.
-        response_data = ProductReviewResponseData(
-            request_id=review_request.request_id,
-            user_id=review_request.user_id,
-            status="COMPLETED",
-            error_message=None,
-            sentiment=result["sentiment"],
-            confidence=confidence_int
+    except Overloaded as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
         )
 
-        # Calculate execution time
-        end_time = time.perf_counter()
-        execution_time = end_time - start_time
-       
-        # Write metrics to CSV
+def _review_data(request_id: str, user_id: str, sentiment: Optional[str] = None,
+                 confidence: Optional[int] = None, error_message: Optional[str] = None) -> dict:
+    """
+    Returns the fields of a ProductReviewResponseData as a plain dictionary:
+    status COMPLETED with a sentiment, or ERROR with an error message.
+    """
+    return {
+        "request_id": request_id,
+        "user_id": user_id,
+        "status": "ERROR" if error_message is not None else "COMPLETED",
+        "error_message": error_message,
+        "sentiment": sentiment,
+        "confidence": confidence
+    }
+
+async def process_review(review_request: ProductReviewRequest) -> Tuple[dict, bool]:
+    """
+    Scores, stores and records the metrics of one review; shared by /reviews and
+    the async job workers. Returns the response data (the fields of
+    ProductReviewResponseData) and whether it is a replay of an earlier or
+    concurrent request with the same request_id. A replay returns the stored row.
+    Raises RequestIdConflict if the request_id belongs to another user_id, and
+    raises on any other error.
+    """
+    start_time = time.perf_counter()
+    (result, stored), shared = await review_flights.run(
+        review_request.request_id, lambda: _score_and_store(review_request))
+    if result["user_id"] != review_request.user_id:
+        raise RequestIdConflict(f"request_id {review_request.request_id} was already used by another user_id")
+
+    # Convert float confidence (e.g., 0.85) to integer (85).
+    confidence_int = int(result["confidence"] * 100)
+
+    # Build the success data.
+    response_data = _review_data(
+        review_request.request_id, result["user_id"], result["sentiment"], confidence_int)
+
+    if stored or shared:
+        # Nothing was computed or stored, so no metrics record is written.
+        monitoring.REPLAYS_TOTAL.inc(endpoint="/reviews", source="stored" if stored else "in_flight")
+        logger.info("process_review - Replayed request_id=%s", review_request.request_id)
+        return response_data, True
+
+    # Calculate execution time
+    end_time = time.perf_counter()
+    execution_time = end_time - start_time
+
+    # Write metrics to CSV
+    with monitoring.stage("metrics") as timer:
+        # The values are already validated, so the record is built without revalidating them.
         write_metrics_record(
-            MetricsData(
+            MetricsData.model_construct(
                 request_id=review_request.request_id,
                 user_id=review_request.user_id,
                 review_text=review_request.data.review_text,
                 sentiment=result["sentiment"],
                 average_confidence_score=confidence_int,
-                execution_time=execution_time
+                execution_time=execution_time,
+                stage_timings=monitoring.current_timings()
             )
         )
+    monitoring.METRICS_WRITE_SECONDS.observe(timer.elapsed, endpoint="/reviews")
+
+    logger.info(
+        "process_review - Successfully processed request_id=%s", review_request.request_id
+    )
+    return response_data, False
 
+@app.post("/reviews", response_model=ProductReviewResponse, tags=["Sentiment Analysis"])
+async def analyze_product_review(
+    review_request: ProductReviewRequest,
+    request: Request,
+    token: str = Depends(verify_token)
+) -> ORJSONResponse:
+    """
+    POST endpoint for analyzing a product review.
+    The caller must provide a valid Bearer token matching SECRET_KEY.
+    Returns a structured response with sentiment data or error details.
+
+    request_id is an idempotency key: if it was already stored, the stored result is
+    returned without scoring or storing again, and the response carries the header
+    Idempotent-Replayed: true. Concurrent requests with the same request_id share
+    one execution. A request_id already used by another user_id gets 409 Conflict.
+    """
+    async with _admitted(HIGH, user_id=review_request.user_id, token=token):
+        try:
+            logger.info(
+                "analyze_product_review - Received request_id=%s, user_id=%s",
+                review_request.request_id, review_request.user_id
+            )
+
+            response_data, replayed = await process_review(review_request)
+            request.state.sentiment = response_data["sentiment"]
+
+            # Build a success response with status_code=200 and success=True. It is
+            # serialized as is, without validating it again against ProductReviewResponse.
+            return ORJSONResponse(
+                {"status_code": 200, "success": True, "message": "completed", "data": response_data},
+                headers={"Idempotent-Replayed": "true"} if replayed else None
+            )
+
+        except RequestIdConflict as exc:
+            logger.warning("analyze_product_review - %s", exc)
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(exc))
+
+        except Exception as exc:
+            # On any exception, return a structured error with status_code=500 and success=False.
+            logger.error("analyze_product_review - Error for request_id=%s: %s", review_request.request_id, exc)
+            request.state.failed = True
+            return ORJSONResponse({
+                "status_code": 500,
+                "success": False,
+                "message": "An error occurred while calculating sentiment",
+                "data": _review_data(review_request.request_id, review_request.user_id, error_message=str(exc))
+            })
+
+async def _run_review_job(review_request: ProductReviewRequest) -> dict:
+    response_data, _replayed = await process_review(review_request)
+    return response_data
+
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).isoformat() if timestamp is not None else None
+
+@app.post("/reviews/async", response_model=JobAccepted, status_code=status.HTTP_202_ACCEPTED,
+          tags=["Sentiment Analysis"])
+async def submit_review_job(
+    review_request: ProductReviewRequest,
+    response: Response,
+    token: str = Depends(verify_token)
+) -> JobAccepted:
+    """
+    Queues a review for scoring and returns a job id at once (202 Accepted).
+    Poll GET /jobs/{job_id} for the result. Submitting a request_id whose job is
+    still queued or running returns that job. When the queue is full the request
+    is rejected with 429 and a Retry-After header.
+    """
+    async with _admitted(NORMAL, user_id=review_request.user_id, token=token):
+        try:
+            job = job_queue.submit(review_request, key=review_request.request_id)
+        except QueueFullError as e:
+            logger.warning("submit_review_job - Queue full, rejected request_id=%s", review_request.request_id)
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail=str(e),
+                headers={"Retry-After": str(e.retry_after)}
+            )
+
+        status_url = f"/jobs/{job.id}"
+        response.headers["Location"] = status_url
+        return JobAccepted(job_id=job.id, status=job.status, status_url=status_url)
+
+@app.get("/jobs/{job_id}", response_model=JobStatus, tags=["Sentiment Analysis"])
+async def get_job(job_id: str, token: str = Depends(verify_token)) -> JobStatus:
+    """
+    Returns the status of a job and, once completed, its result.
+    Finished jobs can be fetched for JOB_RESULT_TTL seconds.
+    """
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Unknown or expired job {job_id}")
+    return JobStatus(
+        job_id=job.id,
+        status=job.status,
+        submitted_at=_isoformat(job.submitted_at),
+        started_at=_isoformat(job.started_at),
+        finished_at=_isoformat(job.finished_at),
+        result=job.result,
+        error=job.error
+    )
+
+@app.post("/reviews/batch", response_model=ProductReviewBatchResponse, tags=["Sentiment Analysis"])
+async def analyze_product_reviews_batch(
+    batch_request: ProductReviewBatchRequest,
+    request: Request,
+    token: str = Depends(verify_token)
+) -> ORJSONResponse:
+    """
+    POST endpoint for analyzing many product reviews in one call.
+    All reviews are scored in one batch, stored in one database transaction and
+    written to the metrics CSV in one append.
+    Returns one result per review, in request order; a review that fails to score
+    is reported with status "ERROR" without failing the rest of the batch.
+    Reviews whose request_id is already stored, or repeated within the batch,
+    get the stored (or first) result and are not scored or stored again; if that
+    request_id belongs to another user_id, the review is reported with status "ERROR".
+    """
+    reviews = batch_request.reviews
+    async with _admitted(LOW, token=token, user_costs=Counter(review.user_id for review in reviews)):
+        start_time = time.perf_counter()
+        logger.info("analyze_product_reviews_batch - Received batch of %d reviews", len(reviews))
+
+        try:
+            # Look up every request_id at once; only the first new review per request_id is scored.
+            with monitoring.stage("lookup"):
+                stored = await _lookup_reviews(list(dict.fromkeys(r.request_id for r in reviews)))
+            fresh = {}
+            for review in reviews:
+                if review.request_id not in stored:
+                    fresh.setdefault(review.request_id, review)
+            fresh = list(fresh.values())
+
+            with monitoring.stage("score") as timer:
+                fresh_results = await scoring_executor.score_batch([review.data.review_text for review in fresh])
+            monitoring.SCORING_SECONDS.observe(timer.elapsed, endpoint="/reviews/batch", sentiment="batch")
+            scored = [
+                (review, result) for review, result in zip(fresh, fresh_results)
+                if result["sentiment"] is not None
+            ]
+
+            by_request_id = {review.request_id: result for review, result in zip(fresh, fresh_results)}
+            by_request_id.update(
+                (request_id, {"sentiment": row["sentiment"], "confidence": row["confidence"]})
+                for request_id, row in stored.items()
+            )
+            owners = {review.request_id: review.user_id for review in fresh}
+            owners.update((request_id, row["user_id"]) for request_id, row in stored.items())
+            results = [
+                by_request_id[review.request_id] if owners[review.request_id] == review.user_id else
+                {"sentiment": None, "confidence": None,
+                 "error": f"request_id {review.request_id} was already used by another user_id"}
+                for review in reviews
+            ]
+            replayed = sum(1 for review in reviews if review.request_id in stored)
+            if replayed:
+                monitoring.REPLAYS_TOTAL.inc(replayed, endpoint="/reviews/batch", source="stored")
+            repeated = len(reviews) - replayed - len(fresh)
+            if repeated:
+                monitoring.REPLAYS_TOTAL.inc(repeated, endpoint="/reviews/batch", source="in_batch")
+
+            # Store all successfully scored reviews in a single transaction, off the event loop.
+            with monitoring.stage("store") as timer:
+                await asyncio.to_thread(my_db.insert_feedback_batch, [
+                    (review.request_id, review.user_id, review.data.review_text,
+                     result["sentiment"], result["confidence"])
+                    for review, result in scored
+                ])
+            monitoring.DB_WRITE_SECONDS.observe(timer.elapsed, endpoint="/reviews/batch")
+        except Exception as exc:
+            logger.error("analyze_product_reviews_batch - Error processing batch: %s", exc)
+            request.state.failed = True
+            return ORJSONResponse({
+                "status_code": 500,
+                "success": False,
+                "message": "An error occurred while processing the batch",
+                "processed": 0,
+                "failed": len(reviews),
+                "data": [_review_data(review.request_id, review.user_id, error_message=str(exc))
+                         for review in reviews]
+            })
+
+        response_data = [
+            _review_data(review.request_id, review.user_id, error_message=result["error"])
+            if result["sentiment"] is None else
+            _review_data(review.request_id, review.user_id, result["sentiment"], int(result["confidence"] * 100))
+            for review, result in zip(reviews, results)
+        ]
+
+        # Execution time and stage timings are reported per review, amortized over the batch.
+        execution_time = (time.perf_counter() - start_time) / len(reviews)
+        stage_timings = {name: seconds / len(reviews) for name, seconds in monitoring.current_timings().items()}
+        try:
+            with monitoring.stage("metrics") as timer:
+                write_metrics_records([
+                    MetricsData.model_construct(
+                        request_id=review.request_id,
+                        user_id=review.user_id,
+                        review_text=review.data.review_text,
+                        sentiment=result["sentiment"],
+                        average_confidence_score=int(result["confidence"] * 100),
+                        execution_time=execution_time,
+                        stage_timings=stage_timings
+                    )
+                    for review, result in scored
+                ])
+            monitoring.METRICS_WRITE_SECONDS.observe(timer.elapsed, endpoint="/reviews/batch")
+        except Exception as exc:
+            # The reviews are already stored; a metrics failure should not fail the batch.
+            logger.error("analyze_product_reviews_batch - Error writing metrics: %s", exc)
+
+        failed = sum(1 for result in results if result["sentiment"] is None)
         logger.info(
-            f"analyze_product_review - Successfully processed request_id={review_request.request_id}"
+            "analyze_product_reviews_batch - Processed %d reviews (%d scored), failed=%d",
+            len(reviews) - failed, len(scored), failed
         )
 
-        return ProductReviewResponse(
-            status_code=200,
-            success=True,
-            message="completed",
-            data=response_data
-        )
+        # Serialized as is, without validating it again against ProductReviewBatchResponse.
+        return ORJSONResponse({
+            "status_code": 200,
+            "success": failed == 0,
+            "message": "completed" if failed == 0 else "completed with errors",
+            "processed": len(reviews) - failed,
+            "failed": failed,
+            "data": response_data
+        })
 
-    except Exception as exc:
-        # On any exception, return a structured error with status_code=500 and success=False.
-        logger.error(f"analyze_product_review - Error for request_id={review_request.request_id}: {exc}")
-        response_data = ProductReviewResponseData(
-            request_id=review_request.request_id,
-            user_id=review_request.user_id,
-            status="ERROR",
-            error_message=str(exc),
-            sentiment=None,
-            confidence=None
-        )
-        return ProductReviewResponse(
-            status_code=500,
-            success=False,
-            message="An error occurred while calculating sentiment",
-            data=response_data
-        )
-# Entry point for local development: run with `python main.py`.
+# Entry point for local development: run with `python fastapi_app.py`.
+# Set UVICORN_WORKERS=N to serve with N worker processes (one event loop per core);
+# each worker runs its own startup hook, scoring executor and caches.
 if __name__ == "__main__":
     import uvicorn
-    logger.info("Starting FastAPI server on host=0.0.0.0, port=8080")
-    uvicorn.run(app, host="0.0.0.0", port=8080)
+    workers = int(os.getenv("UVICORN_WORKERS", "1"))
+    logger.info("Starting FastAPI server on host=0.0.0.0, port=8080, workers=%s", workers)
+    if workers > 1:
+        # Multiple workers require the app as an import string.
+        uvicorn.run("fastapi_app:app", host="0.0.0.0", port=8080, workers=workers)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8080)
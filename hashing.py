@@ -0,0 +1,16 @@
+"""
+Module: hashing.py
+Description: Content hash of review texts.
+
+The database keys review texts by this hash (review_texts_YYYYMM.hash), and the metrics
+writer can record it in place of the text, so both must compute it the same way.
+"""
+
+import hashlib
+
+
+def text_hash(review_text: str) -> bytes:
+    """
+    Returns the 16-byte content hash of a review text.
+    """
+    return hashlib.blake2b(review_text.encode("utf-8"), digest_size=16).digest()
@@ -0,0 +1,241 @@
+"""
+Module: jobs.py
+Description: Bounded in-process job queue for asynchronous review scoring.
+
+POST /reviews/async submits a job and returns its id at once; a pool of JOB_WORKERS
+worker tasks runs queued jobs in arrival order and GET /jobs/{id} reports their status
+and result. The queue holds at most JOB_QUEUE_SIZE waiting jobs. When it is full,
+submit() raises QueueFullError with a retry hint derived from the recent completion
+rate, instead of letting latency grow without bound.
+
+Finished jobs are kept for JOB_RESULT_TTL seconds (at most JOB_MAX_RESULTS of them).
+Jobs live in the memory of one process: they are lost on restart, and with several
+uvicorn workers a job can only be fetched from the worker that accepted it.
+"""
+
+import asyncio
+import math
+import os
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Optional
+
+from dotenv import load_dotenv
+
+from logger import MyLogger
+
+load_dotenv()
+
+# Get a logger for this module
+logger = MyLogger.get_logger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# Window (seconds) over which the completion rate for retry hints is measured.
+_RATE_WINDOW = 10.0
+
+
+class QueueFullError(Exception):
+    """
+    Raised by JobQueue.submit when no more jobs can be queued.
+    retry_after is the suggested wait in seconds.
+    """
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Job queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Job:
+    __slots__ = ("id", "key", "payload", "status", "result", "error",
+                 "submitted_at", "started_at", "finished_at", "expires_at")
+
+    def __init__(self, key: Optional[str], payload: Any):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.payload = payload
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.expires_at = None
+
+
+class JobQueue:
+    """
+    Runs submitted jobs on a fixed pool of worker tasks.
+
+    Args:
+        max_queue (int): Maximum number of jobs waiting to start.
+        workers (int): Number of jobs run concurrently.
+        result_ttl (float): Seconds a finished job can still be fetched.
+        max_results (int): Maximum number of finished jobs kept; the oldest are dropped first.
+    """
+
+    def __init__(self, max_queue: int, workers: int, result_ttl: float, max_results: int):
+        self.max_queue = max_queue
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self.max_results = max_results
+        self._handler: Optional[Callable[[Any], Awaitable[Any]]] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+        self._jobs = {}                 # id -> Job, queued or running
+        self._finished = OrderedDict()  # id -> Job, oldest first
+        self._active_keys = {}          # key -> id of the queued or running job
+        self._completions = deque()     # finish times (monotonic) within _RATE_WINDOW
+        self.submitted = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self, handler: Callable[[Any], Awaitable[Any]]):
+        """
+        Starts the workers. handler(payload) is awaited for every job; its return
+        value becomes the job result and an exception marks the job failed.
+        """
+        self._handler = handler
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        logger.info(
+            "JobQueue started: workers=%s, max_queue=%s, result_ttl=%ss",
+            self.workers, self.max_queue, self.result_ttl
+        )
+
+    async def stop(self):
+        """
+        Runs every queued job, then stops the workers.
+        """
+        if not self.running:
+            return
+        for _ in self._tasks:
+            await self._queue.put(None)
+        await asyncio.gather(*self._tasks)
+        self._tasks = []
+        logger.info("JobQueue stopped: completed=%d, failed=%d", self.completed, self.failed)
+
+    def submit(self, payload: Any, key: Optional[str] = None) -> Job:
+        """
+        Queues a job and returns it. If a job with the same key is still queued or
+        running, that job is returned instead of queueing a duplicate.
+
+        Raises:
+            QueueFullError: If the queue is full (or not started).
+        """
+        if key is not None and key in self._active_keys:
+            return self._jobs[self._active_keys[key]]
+        job = Job(key, payload)
+        try:
+            if self._queue is None:
+                raise asyncio.QueueFull
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFullError(self.retry_after())
+        self._jobs[job.id] = job
+        if key is not None:
+            self._active_keys[key] = job.id
+        self.submitted += 1
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """
+        Returns the job with the given id, or None if it is unknown or expired.
+        """
+        self._expire()
+        return self._jobs.get(job_id) or self._finished.get(job_id)
+
+    def qsize(self) -> int:
+        """
+        Returns the number of jobs waiting to start.
+        """
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def retry_after(self) -> int:
+        """
+        Seconds until the queued jobs are likely done, from the recent completion rate.
+        """
+        now = time.monotonic()
+        self._prune_completions(now)
+        if not self._completions:
+            return 5
+        # Completions per second over the observed span (at least one second).
+        rate = len(self._completions) / max(now - self._completions[0], 1.0)
+        return max(1, min(60, math.ceil(self.qsize() / rate)))
+
+    def stats(self) -> dict:
+        """
+        Returns queue depth and job counters.
+        """
+        return {
+            "running": self.running,
+            "queued": self.qsize(),
+            "active": len(self._jobs),
+            "finished_kept": len(self._finished),
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed
+        }
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            if job is None:
+                break
+            job.status = RUNNING
+            job.started_at = time.time()
+            try:
+                job.result = await self._handler(job.payload)
+                job.status = COMPLETED
+                self.completed += 1
+            except Exception as e:
+                logger.error("JobQueue - Job %s failed: %s", job.id, e)
+                job.error = str(e)
+                job.status = FAILED
+                self.failed += 1
+            self._finish(job)
+
+    def _finish(self, job: Job):
+        job.finished_at = time.time()
+        job.expires_at = time.monotonic() + self.result_ttl
+        job.payload = None
+        self._jobs.pop(job.id, None)
+        if job.key is not None and self._active_keys.get(job.key) == job.id:
+            del self._active_keys[job.key]
+        self._finished[job.id] = job
+        now = time.monotonic()
+        self._completions.append(now)
+        self._prune_completions(now)
+        self._expire()
+
+    def _prune_completions(self, now: float):
+        while self._completions and self._completions[0] < now - _RATE_WINDOW:
+            self._completions.popleft()
+
+    def _expire(self):
+        now = time.monotonic()
+        while self._finished:
+            oldest = next(iter(self._finished.values()))
+            if oldest.expires_at > now and len(self._finished) <= self.max_results:
+                break
+            self._finished.popitem(last=False)
+
+
+# Shared job queue used by the API; started and stopped with the application.
+job_queue = JobQueue(
+    max_queue=int(os.getenv("JOB_QUEUE_SIZE", "1000")),
+    workers=int(os.getenv("JOB_WORKERS", "8")),
+    result_ttl=float(os.getenv("JOB_RESULT_TTL", "600")),
+    max_results=int(os.getenv("JOB_MAX_RESULTS", "100000"))
+)
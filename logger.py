@@ -1,30 +1,113 @@
 """
 Module: logger.py
 Description: Provides a MyLogger class that returns a configured logger with daily rotation.
+
+Logging is configured from the environment:
+  - LOG_MODE: "queue" (default) hands records to a background listener thread that
+    formats and writes them, so callers never touch the disk; "sync" writes on the
+    calling thread.
+  - LOG_LEVEL: default level for all loggers (INFO).
+  - LOG_LEVELS: per-module overrides, e.g. "my_db=WARNING,sentiment_analysis=ERROR".
+  - LOG_INFO_PER_SECOND / LOG_SAMPLE_RATE: once a logger has emitted
+    LOG_INFO_PER_SECOND INFO (or lower) lines in the current second, further ones are
+    kept with probability LOG_SAMPLE_RATE. WARNING and above are never sampled.
+    LOG_INFO_PER_SECOND=0 disables sampling.
 """
 
+import atexit
+import copy
 import logging
 import os
-from logging.handlers import TimedRotatingFileHandler
+import queue
+import random
+import threading
+import time
+from logging.handlers import QueueHandler, QueueListener, TimedRotatingFileHandler
+from dotenv import load_dotenv
+
+load_dotenv()
+
+LOG_MODE = os.getenv("LOG_MODE", "queue").lower()
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = dict(
+    (name.strip(), level.strip().upper())
+    for name, level in (item.split("=", 1) for item in os.getenv("LOG_LEVELS", "").split(",") if "=" in item)
+)
+LOG_INFO_PER_SECOND = int(os.getenv("LOG_INFO_PER_SECOND", "200"))
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))
+
+
+class LoadSamplingFilter(logging.Filter):
+    """
+    Passes every record up to max_per_second INFO-or-lower records per second,
+    then keeps only a sample_rate fraction of them until the next second.
+    """
+
+    def __init__(self, max_per_second: int, sample_rate: float):
+        super().__init__()
+        self.max_per_second = max_per_second
+        self.sample_rate = sample_rate
+        self._second = 0
+        self._count = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO or self.max_per_second <= 0:
+            return True
+        second = int(time.monotonic())
+        if second != self._second:
+            self._second = second
+            self._count = 0
+        self._count += 1
+        return self._count <= self.max_per_second or random.random() < self.sample_rate
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves the layout of the line (timestamp, level, logger name) to
+    the listener thread. Like the stock handler it merges the message with its args and
+    renders the exception before enqueueing, so the listener never sees arguments
+    changed by the caller afterwards or a traceback that is no longer current.
+
+    Once MyLogger.shutdown has stopped the listener, records are written on the calling
+    thread instead of being queued where nothing would write them.
+    """
+
+    _exception_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info:
+            record.exc_text = self._exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        with MyLogger._lock:
+            if self.queue is MyLogger._queue:
+                self.queue.put_nowait(record)
+                return
+        MyLogger._get_file_handler().handle(record)
+
 
 class MyLogger:
-    @staticmethod
-    def get_logger(name: str = __name__):
+    _file_handler = None
+    _queue = None
+    _listener = None
+    _lock = threading.Lock()
+
+    @classmethod
+    def _get_file_handler(cls) -> logging.Handler:
         """
-        Returns a logger instance configured for daily log rotation.
-        Logs are stored in 'logs/app.log', rotated each midnight.
-        Old log files are kept for 30 days by default.
+        Returns the shared handler that writes 'logs/app.log', rotated each midnight.
         """
-        # Ensure the logs/ directory exists.
-        if not os.path.exists("logs"):
-            os.mkdir("logs")
-
-        # Create (or get) a logger.
-        logger = logging.getLogger(name)
-        logger.setLevel(logging.INFO)
+        if cls._file_handler is None:
+            # Ensure the logs/ directory exists.
+            if not os.path.exists("logs"):
+                os.mkdir("logs")
 
-        # Avoid adding multiple handlers if get_logger is called multiple times.
-        if not logger.handlers:
             # Create a TimedRotatingFileHandler that rotates daily at midnight.
             log_file = os.path.join("logs", "app.log")
             handler = TimedRotatingFileHandler(
@@ -42,8 +125,54 @@ class MyLogger:
                 "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
             )
             handler.setFormatter(formatter)
+            cls._file_handler = handler
+        return cls._file_handler
+
+    @classmethod
+    def _get_queue(cls) -> queue.Queue:
+        """
+        Returns the shared log queue, starting its listener thread on first use.
+        """
+        if cls._queue is None:
+            cls._queue = queue.SimpleQueue()
+            cls._listener = QueueListener(cls._queue, cls._get_file_handler())
+            cls._listener.start()
+            atexit.register(cls.shutdown)
+        return cls._queue
+
+    @classmethod
+    def shutdown(cls):
+        """
+        Stops the listener thread after it has written every queued record.
+        Records logged afterwards are written on the calling thread.
+        """
+        with cls._lock:
+            if cls._listener is not None:
+                cls._listener.stop()
+                cls._listener = None
+                cls._queue = None
+
+    @staticmethod
+    def get_logger(name: str = __name__):
+        """
+        Returns a logger instance configured for daily log rotation.
+        Logs are stored in 'logs/app.log', rotated each midnight.
+        Old log files are kept for 30 days by default.
+        """
+        # Create (or get) a logger.
+        logger = logging.getLogger(name)
+        logger.setLevel(LOG_LEVELS.get(name, LOG_LEVEL))
+
+        # Avoid adding multiple handlers if get_logger is called multiple times.
+        with MyLogger._lock:
+            if not logger.handlers:
+                if LOG_MODE == "sync":
+                    handler = MyLogger._get_file_handler()
+                else:
+                    handler = _DeferredQueueHandler(MyLogger._get_queue())
 
-            # Add the handler to the logger.
-            logger.addHandler(handler)
+                # Add the handler to the logger, sampling this logger's INFO lines under load.
+                logger.addHandler(handler)
+                logger.addFilter(LoadSamplingFilter(LOG_INFO_PER_SECOND, LOG_SAMPLE_RATE))
 
         return logger
@@ -1,59 +1,347 @@
 """
 Module: metrics_writer.py
 Description: Writes sentiment analysis metrics to a CSV file in the 'metrics/' directory.
+
+While the application runs, records go through MetricsSink: an in-memory queue drained
+by a background thread that appends records in batches, rotates the CSV by size or day
+and flushes everything still queued on shutdown. Request handlers only enqueue.
+Outside the application (or before the sink is started) records are written directly.
 """
 
 import csv
 import os
+import queue
+import threading
+import time
+from datetime import date, datetime
+from typing import List
+from dotenv import load_dotenv
 from logger import MyLogger
 from models import MetricsData
+from hashing import text_hash
+
+load_dotenv()
 
 logger = MyLogger.get_logger(__name__)
 
 METRICS_DIR = "metrics"
 METRICS_FILE = os.path.join(METRICS_DIR, "Metrics.csv")
 
-def write_metrics_record(record: MetricsData):
+METRICS_HEADER = [
+    "datetime",
+    "request_id",
+    "user_id",
+    "review_text",
+    "sentiment",
+    "average_confidence_score",
+    "execution_time",
+    "stage_timings"
+]
+
+# How review_text is stored: "keep" (full text), "truncate" (first
+# METRICS_REVIEW_TEXT_MAX characters), "hash" (hex content hash, the
+# review_texts_YYYYMM.hash of the stored text) or "drop" (empty column).
+REVIEW_TEXT_MODE = os.getenv("METRICS_REVIEW_TEXT", "keep").lower()
+REVIEW_TEXT_MAX = int(os.getenv("METRICS_REVIEW_TEXT_MAX", "100"))
+
+
+def _review_text(text: str) -> str:
+    if REVIEW_TEXT_MODE == "drop":
+        return ""
+    if REVIEW_TEXT_MODE == "hash":
+        return text_hash(text).hex()
+    if REVIEW_TEXT_MODE == "truncate":
+        return text[:REVIEW_TEXT_MAX]
+    return text
+
+
+def _format_timings(timings: dict) -> str:
+    # "stage=seconds" pairs separated by ";", e.g. "lookup=0.000412;score=0.001530"
+    return ";".join(f"{name}={seconds:.6f}" for name, seconds in timings.items())
+
+
+def _metrics_row(record: MetricsData) -> dict:
     """
-    Writes a single metrics record to 'Metrics.csv' in 'metrics/' directory.
-    Creates the directory and file if not present, and appends new entries otherwise.
+    Converts a metrics record into a CSV row keyed by the METRICS_HEADER columns.
+    """
+    return {
+        "datetime": record.datetime,
+        "request_id": record.request_id,
+        "user_id": record.user_id,
+        "review_text": _review_text(record.review_text),
+        "sentiment": record.sentiment,
+        "average_confidence_score": record.average_confidence_score,
+        "execution_time": record.execution_time,
+        "stage_timings": _format_timings(record.stage_timings)
+    }
+
+
+# Header of each metrics file this process has written to, read once per file.
+_file_headers = {}
+
+
+def _read_header(path: str) -> List[str]:
+    with open(path, newline='', encoding='utf-8') as csvfile:
+        return next(csv.reader(csvfile), None) or []
+
+
+def _file_header(path: str) -> List[str]:
+    """
+    Returns the columns of an existing metrics file. A file written with an older
+    header keeps it: rows are appended with its columns only (a warning is logged
+    once) until `python db_admin.py migrate-metrics` rewrites it.
+    """
+    header = _file_headers.get(path)
+    if header is None:
+        header = _read_header(path)
+        if header != METRICS_HEADER:
+            logger.warning(
+                "%s has outdated columns %s; writing only those until "
+                "'python db_admin.py migrate-metrics' rewrites it", path, header
+            )
+        _file_headers[path] = header
+    return header
+
+
+def migrate_metrics_file(path: str = METRICS_FILE) -> int:
+    """
+    Rewrites a metrics file written with an older header to METRICS_HEADER, leaving
+    the new columns empty in the existing rows. Run it while the API is stopped.
+
+    Returns:
+        int: The number of rows rewritten, or 0 if the file is missing or already current.
+    """
+    if not os.path.isfile(path) or _read_header(path) == METRICS_HEADER:
+        return 0
+
+    migrated = path + ".migrating"
+    rows = 0
+    with open(path, newline='', encoding='utf-8') as source, \
+            open(migrated, 'w', newline='', encoding='utf-8') as target:
+        writer = csv.DictWriter(target, fieldnames=METRICS_HEADER, restval="", extrasaction="ignore")
+        writer.writeheader()
+        for row in csv.DictReader(source):
+            writer.writerow(row)
+            rows += 1
+    os.replace(migrated, path)
+    _file_headers.pop(path, None)
+    logger.info("Migrated %d rows of %s to columns %s", rows, path, METRICS_HEADER)
+    return rows
+
+
+def _append_rows(records: List[MetricsData]):
+    """
+    Appends the given records to 'Metrics.csv' with a single file open.
+    Creates the directory and file (with header) if not present.
     """
     # Create 'metrics/' if it doesn't exist
     if not os.path.exists(METRICS_DIR):
         os.mkdir(METRICS_DIR)
-        logger.info(f"Created directory: {METRICS_DIR}")
+        logger.info("Created directory: %s", METRICS_DIR)
 
     # Check if the CSV file already exists (to know if we need a header)
     file_exists = os.path.isfile(METRICS_FILE)
+    header = _file_header(METRICS_FILE) if file_exists else METRICS_HEADER
+
+    with open(METRICS_FILE, 'a', newline='', encoding='utf-8') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=header, restval="", extrasaction="ignore")
+        # Write header if file did not exist before
+        if not file_exists:
+            writer.writeheader()
+            _file_headers[METRICS_FILE] = METRICS_HEADER
+
+        # Write the actual metrics rows
+        writer.writerows(_metrics_row(record) for record in records)
+
+
+class MetricsSink:
+    """
+    Background writer for metrics records.
+
+    Args:
+        max_queue (int): Maximum number of queued records. When full, new records
+            are dropped (and counted) rather than blocking the request.
+        batch_size (int): Write as soon as this many records are collected.
+        flush_interval (float): Write at most this many seconds after the first record of a batch.
+        rotate (str): "none", "size" (rotate at max_bytes) or "daily".
+        max_bytes (int): File size that triggers rotation when rotate is "size".
+    """
+
+    _STOP = object()
+
+    def __init__(self, max_queue: int, batch_size: int, flush_interval: float,
+                 rotate: str = "none", max_bytes: int = 50 * 1024 * 1024):
+        if rotate not in ("none", "size", "daily"):
+            raise ValueError(f"Unknown rotation policy: {rotate}")
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.rotate = rotate
+        self.max_bytes = max_bytes
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._current_day = date.today()
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """
+        Starts the background writer thread.
+        """
+        if self.running:
+            return
+        # Daily rotation starts from the day the current file was last written.
+        if os.path.isfile(METRICS_FILE):
+            self._current_day = date.fromtimestamp(os.path.getmtime(METRICS_FILE))
+        else:
+            self._current_day = date.today()
+        self._thread = threading.Thread(target=self._run, name="metrics-sink", daemon=True)
+        self._thread.start()
+        logger.info(
+            "MetricsSink started: batch_size=%s, flush_interval=%ss, rotate=%s, review_text=%s",
+            self.batch_size, self.flush_interval, self.rotate, REVIEW_TEXT_MODE
+        )
+
+    def stop(self):
+        """
+        Writes every queued record, then stops the background thread.
+        """
+        if not self.running:
+            return
+        self._queue.put(self._STOP)
+        self._thread.join()
+        self._thread = None
+        logger.info("MetricsSink stopped after writing %d records, dropped=%d", self.written, self.dropped)
+
+    def submit(self, record: MetricsData):
+        """
+        Queues a record without blocking. Drops it if the queue is full.
+        """
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def qsize(self) -> int:
+        """
+        Returns the number of records waiting to be written.
+        """
+        return self._queue.qsize()
+
+    def stats(self) -> dict:
+        """
+        Returns queue depth and write counters.
+        """
+        return {
+            "running": self.running,
+            "queued": self.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "failed": self.failed
+        }
+
+    def _run(self):
+        stopping = False
+        while not stopping:
+            item = self._queue.get()
+            if item is self._STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is self._STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._write(batch)
+
+    def _write(self, batch: List[MetricsData]):
+        try:
+            self._maybe_rotate()
+            _append_rows(batch)
+            self.written += len(batch)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error("MetricsSink - Error writing %d metrics records: %s", len(batch), e)
+
+    def _maybe_rotate(self):
+        if self.rotate == "none" or not os.path.isfile(METRICS_FILE):
+            return
+        if self.rotate == "daily":
+            today = date.today()
+            if today == self._current_day:
+                return
+            suffix = self._current_day.isoformat()
+            self._current_day = today
+        else:
+            if os.path.getsize(METRICS_FILE) < self.max_bytes:
+                return
+            suffix = datetime.now().strftime("%Y-%m-%dT%H%M%S")
+
+        rotated = os.path.join(METRICS_DIR, f"Metrics.{suffix}.csv")
+        os.replace(METRICS_FILE, rotated)
+        _file_headers.pop(METRICS_FILE, None)
+        logger.info("Rotated %s to %s", METRICS_FILE, rotated)
+
+
+# Shared sink used by the API; started and stopped with the application.
+metrics_sink = MetricsSink(
+    max_queue=int(os.getenv("METRICS_QUEUE_SIZE", "10000")),
+    batch_size=int(os.getenv("METRICS_FLUSH_BATCH", "500")),
+    flush_interval=float(os.getenv("METRICS_FLUSH_INTERVAL", "1.0")),
+    rotate=os.getenv("METRICS_ROTATE", "none").lower(),
+    max_bytes=int(os.getenv("METRICS_MAX_BYTES", str(50 * 1024 * 1024)))
+)
+
+
+def write_metrics_record(record: MetricsData):
+    """
+    Writes a single metrics record to 'Metrics.csv' in 'metrics/' directory.
+    Creates the directory and file if not present, and appends new entries otherwise.
+    While metrics_sink is running, the record is only queued.
+    """
+    if metrics_sink.running:
+        metrics_sink.submit(record)
+        return
+
+    try:
+        _append_rows([record])
+        logger.info("Metrics record written for request_id=%s to %s", record.request_id, METRICS_FILE)
+
+    except Exception as e:
+        logger.error("Error writing metrics record for request_id=%s: %s", record.request_id, e)
+        raise
+
+
+def write_metrics_records(records: List[MetricsData]):
+    """
+    Writes many metrics records to 'Metrics.csv' in one append.
+    Used by the batch endpoint so a batch costs one file open instead of one per review.
+    While metrics_sink is running, the records are only queued.
+    """
+    if not records:
+        return
+
+    if metrics_sink.running:
+        for record in records:
+            metrics_sink.submit(record)
+        return
 
     try:
-        with open(METRICS_FILE, 'a', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            # Write header if file did not exist before
-            if not file_exists:
-                writer.writerow([
-                    "datetime",
-                    "request_id",
-                    "user_id",
-                    "review_text",
-                    "sentiment",
-                    "average_confidence_score",
-                    "execution_time"
-                ])
-
-            # Write the actual metrics row
-            writer.writerow([
-                record.datetime,
-                record.request_id,
-                record.user_id,
-                record.review_text,
-                record.sentiment,
-                record.average_confidence_score,
-                record.execution_time
-            ])
-
-        logger.info(f"Metrics record written for request_id={record.request_id} to {METRICS_FILE}")
+        _append_rows(records)
+        logger.info("%d metrics records written to %s", len(records), METRICS_FILE)
 
     except Exception as e:
-        logger.error(f"Error writing metrics record for request_id={record.request_id}: {e}")
+        logger.error("Error writing %d metrics records: %s", len(records), e)
         raise
@@ -3,7 +3,7 @@ Module: models.py
 Description: Contains Pydantic models for product review requests and responses.
 """
 
-from typing import Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel, Field
 from datetime import datetime
 # ---------------------
@@ -25,6 +25,22 @@ class ProductReviewRequest(BaseModel):
     user_id: str = Field(..., description="Unique identifier of the user.")
     data: ProductReviewData = Field(..., description="Data containing the actual review text.")
 
+
+# Upper bound on the number of reviews accepted in one batch request.
+MAX_BATCH_SIZE = 5000
+
+
+class ProductReviewBatchRequest(BaseModel):
+    """
+    Request body for submitting many product reviews in one call.
+    """
+    reviews: List[ProductReviewRequest] = Field(
+        ...,
+        min_length=1,
+        max_length=MAX_BATCH_SIZE,
+        description="The reviews to analyze, each with its own request_id and user_id."
+    )
+
 # ---------------------
 # Response Models
 # ---------------------
@@ -50,6 +66,18 @@ class ProductReviewResponse(BaseModel):
     message: str
     data: ProductReviewResponseData
 
+
+class ProductReviewBatchResponse(BaseModel):
+    """
+    Response for a batch request. Holds one result per submitted review, in request order.
+    """
+    status_code: int
+    success: bool                        # True only if every review was processed
+    message: str
+    processed: int                       # Number of reviews with status "COMPLETED"
+    failed: int                          # Number of reviews with status "ERROR"
+    data: List[ProductReviewResponseData]
+
 # ---------------------
 # Metrics Model
 # ---------------------
@@ -64,6 +92,8 @@ class MetricsData(BaseModel):
     sentiment: str  # e.g., "positive", "negative", "neutral"
     average_confidence_score: int
     execution_time: float  # in seconds
+    # Seconds spent in each timed stage of the request (scoring, storage, ...), in stage order.
+    stage_timings: Dict[str, float] = Field(default_factory=dict)
     datetime: str = Field(
         default_factory=lambda: datetime.now().isoformat()
     )
@@ -71,5 +101,102 @@ class MetricsData(BaseModel):
 # ---------------------
 # Data Retreival
 # ---------------------
-class Dataretrieve(BaseModel):
-    id : str
\ No newline at end of file
+
+# Page size used when the caller does not pass a limit, and the largest allowed.
+DEFAULT_PAGE_SIZE = 1000
+MAX_PAGE_SIZE = 10000
+
+
+class HistoryQuery(BaseModel):
+    """
+    Pagination and time-range filters for history queries.
+    Rows are returned oldest first. Pass the X-Next-Cursor header of a response
+    as `after` to fetch the next page.
+    """
+    limit: int = Field(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="Maximum rows to return.")
+    after: Optional[str] = Field(None, description="Cursor of the last row already seen.")
+    start: Optional[datetime] = Field(None, description="Only rows created at or after this time (UTC if naive).")
+    end: Optional[datetime] = Field(None, description="Only rows created before this time (UTC if naive).")
+
+
+class Dataretrieve(HistoryQuery):
+    id : str
+
+class UserSummary(BaseModel):
+    """
+    Aggregate sentiment statistics of one user, maintained as reviews are stored.
+    """
+    user_id: str
+    total: int
+    positive: int
+    negative: int
+    neutral: int
+    average_confidence: float
+    confidence_stddev: float
+    first_seen: Optional[str]
+    last_seen: Optional[str]
+
+
+class RollupBucket(BaseModel):
+    """
+    Sentiment counts and mean confidence of the reviews in one time bucket.
+    """
+    bucket: str  # start of the bucket, UTC, "YYYY-MM-DD HH:MM:SS"
+    total: int
+    positive: int
+    negative: int
+    neutral: int
+    average_confidence: float
+
+
+class RollupResponse(BaseModel):
+    granularity: str
+    buckets: List[RollupBucket]
+
+
+class SearchHit(BaseModel):
+    """
+    A review matching a full-text search, with its BM25 score (lower is better)
+    and an excerpt with the matched words in [brackets].
+    """
+    id: int
+    request_id: str
+    user_id: str
+    review_text: str
+    sentiment: str
+    confidence: float
+    created_at: str
+    score: float
+    snippet: str
+
+
+class SearchResponse(BaseModel):
+    query: str
+    results: List[SearchHit]
+    next_offset: Optional[int]  # pass as offset to get the next page; None on the last page
+
+
+# ---------------------
+# Async jobs
+# ---------------------
+
+class JobAccepted(BaseModel):
+    """
+    Returned by POST /reviews/async when a review is queued.
+    """
+    job_id: str
+    status: str             # "queued", "running", "completed" or "failed"
+    status_url: str
+
+
+class JobStatus(BaseModel):
+    """
+    Status of an async review job; result is set once the job completed.
+    """
+    job_id: str
+    status: str
+    submitted_at: str
+    started_at: Optional[str]
+    finished_at: Optional[str]
+    result: Optional[ProductReviewResponseData]
+    error: Optional[str]
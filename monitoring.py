@@ -0,0 +1,317 @@
+"""
+Module: monitoring.py
+Description: In-process latency histograms, counters and gauges with a Prometheus text exporter.
+
+Histograms use fixed log-spaced buckets (each bucket sqrt(2) times wider than the
+previous one, from 100 microseconds to about 105 seconds), so memory per label set is
+constant and any quantile can be estimated within one bucket, about 41% relative error
+at worst. All series are kept in memory and rendered on demand by render().
+
+Stages of a request are timed with stage() (a context manager) or timed() (a
+decorator for plain and async functions). Each stage is observed in
+review_stage_duration_seconds and, inside request_timings(), the outermost stages
+are also added to the timings of the current request, which the API reports in
+MetricsData and in the Server-Timing response header. A stage timed inside another
+one (such as a timed function called within a request stage) is only observed in the
+histogram, so the timings of a request never count the same time twice.
+"""
+
+import asyncio
+import bisect
+import functools
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Upper bounds (seconds) of the histogram buckets; the last implicit bucket is +Inf.
+LATENCY_BUCKETS = tuple(round(0.0001 * math.sqrt(2) ** i, 7) for i in range(41))
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _HistogramSeries:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram:
+    """
+    A labelled histogram of durations in seconds with fixed log-spaced buckets.
+    """
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series: Dict[LabelValues, _HistogramSeries] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str):
+        """
+        Records one observation for the given label values.
+        """
+        key = tuple(labels.get(name, "") for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = _HistogramSeries(len(self.buckets) + 1)
+            series.counts[index] += 1
+            series.sum += value
+            series.count += 1
+
+    def quantile(self, q: float, **labels: str) -> float:
+        """
+        Estimates the q-quantile (0 < q <= 1) for the given label values, returning the
+        upper bound of the bucket that holds it, or 0.0 if nothing was observed.
+        """
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None or series.count == 0:
+                return 0.0
+            rank = q * series.count
+            seen = 0
+            for index, count in enumerate(series.counts):
+                seen += count
+                if seen >= rank:
+                    return self.buckets[index] if index < len(self.buckets) else math.inf
+        return math.inf
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = [(key, list(s.counts), s.sum, s.count) for key, s in self._series.items()]
+        for key, counts, total, count in sorted(snapshot):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labels, key, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+class Counter:
+    """
+    A labelled, monotonically increasing counter.
+    """
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels: str) -> float:
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            return self._values.get(key, 0)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            snapshot = sorted(self._values.items())
+        for key, value in snapshot:
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class CallbackMetric:
+    """
+    A gauge or counter whose value is read from a callback at render time,
+    used to expose state owned by other components (cache, queues).
+    """
+
+    def __init__(self, name: str, help: str, callback: Callable[[], float], type: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.callback = callback
+        self.type = type
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.help}",
+            f"# TYPE {self.name} {self.type}",
+            f"{self.name} {float(self.callback())}",
+        ]
+
+
+class Registry:
+    """
+    Holds all metrics of the process and renders them in Prometheus text format.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric already registered: {metric.name}")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Histogram:
+        return self.register(Histogram(name, help, labels))
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def callback(self, name: str, help: str, callback: Callable[[], float], type: str = "gauge"):
+        return self.register(CallbackMetric(name, help, callback, type))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+REQUEST_SECONDS = registry.histogram(
+    "review_request_duration_seconds", "Total request time.", ("endpoint", "sentiment"))
+SCORING_SECONDS = registry.histogram(
+    "review_scoring_duration_seconds", "Sentiment scoring time.", ("endpoint", "sentiment"))
+DB_WRITE_SECONDS = registry.histogram(
+    "review_db_write_duration_seconds", "Time to store reviews in the database.", ("endpoint",))
+METRICS_WRITE_SECONDS = registry.histogram(
+    "review_metrics_write_duration_seconds", "Time to write (or enqueue) metrics records.", ("endpoint",))
+REQUESTS_TOTAL = registry.counter(
+    "review_requests_total", "Requests handled, by HTTP status.", ("endpoint", "status"))
+ERRORS_TOTAL = registry.counter(
+    "review_request_errors_total", "Requests that failed, including structured error responses.", ("endpoint",))
+REPLAYS_TOTAL = registry.counter(
+    "review_replays_total",
+    "Requests answered with the result of an earlier or concurrent request with the same request_id.",
+    ("endpoint", "source"))
+ADMITTED_TOTAL = registry.counter(
+    "admission_admitted_total", "Review requests admitted by the concurrency limit.", ("priority",))
+SHED_TOTAL = registry.counter(
+    "admission_shed_total", "Review requests shed with 503 by the concurrency limit.", ("priority", "reason"))
+RATE_LIMITED_TOTAL = registry.counter(
+    "admission_rate_limited_total", "Review requests rejected with 429 by a per-client rate limit.", ("key_type",))
+STAGE_SECONDS = registry.histogram(
+    "review_stage_duration_seconds", "Time spent in an instrumented stage or function.", ("stage",))
+
+# Stage name -> seconds of the request being handled, if any (see request_timings).
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+# Name of the stage being timed, if any; stages inside it are not added to the request timings.
+_current_stage: ContextVar[Optional[str]] = ContextVar("current_stage", default=None)
+
+
+class StageTimer:
+    __slots__ = ("elapsed",)
+
+    def __init__(self):
+        self.elapsed = 0.0
+
+
+@contextmanager
+def request_timings():
+    """
+    Collects the outermost stages timed in the block (and in the tasks and
+    threads it starts, which inherit the context) into the yielded dictionary of
+    stage name -> seconds. A stage timed more than once is summed.
+    """
+    timings = {}
+    token = _request_timings.set(timings)
+    try:
+        yield timings
+    finally:
+        _request_timings.reset(token)
+
+
+def current_timings() -> Dict[str, float]:
+    """
+    Returns a copy of the stage timings of the current request so far
+    (empty outside request_timings).
+    """
+    timings = _request_timings.get()
+    return dict(timings) if timings else {}
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Times the block as stage `name`. The yielded StageTimer holds the duration
+    in seconds once the block has finished.
+    """
+    timer = StageTimer()
+    outer = _current_stage.get()
+    token = _current_stage.set(name)
+    start = time.perf_counter()
+    try:
+        yield timer
+    finally:
+        timer.elapsed = time.perf_counter() - start
+        _current_stage.reset(token)
+        STAGE_SECONDS.observe(timer.elapsed, stage=name)
+        timings = _request_timings.get()
+        if timings is not None and outer is None:
+            timings[name] = timings.get(name, 0.0) + timer.elapsed
+
+
+def timed(name: Optional[str] = None):
+    """
+    Decorator timing every call of a function (or coroutine function) as a
+    stage, named after the function unless name is given.
+    """
+    def decorator(fn):
+        stage_name = name or fn.__name__
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with stage(stage_name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def server_timing(timings: Dict[str, float], total: Optional[float] = None) -> str:
+    """
+    Formats stage timings (seconds) as a Server-Timing header value (milliseconds).
+    """
+    entries = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in timings.items()]
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(entries)
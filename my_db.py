@@ -1,64 +1,1200 @@
 """
 Module: mydb.py
 Description: Handles SQLite database connection, creation, and data insertion.
+
+All access goes through one ConnectionManager: a single long-lived writer connection,
+serialized by a lock, and a small pool of long-lived reader connections. The database
+runs in WAL mode so readers never block the writer, and the remaining pragmas come
+from the environment (see .env.example).
+
+New databases store reviews in monthly partitions (by created_at, UTC). Partition
+YYYYMM holds each distinct review text of the month once in review_texts_YYYYMM
+(keyed by content hash), one row of integer references per review in
+review_rows_YYYYMM and its own full-text index; users and review_keys (id and
+request_id of every review) are shared. The view reviews_YYYYMM has the columns of
+the original reviews table and the view reviews is their union, so read queries
+work on either layout; history and search only read the partitions overlapping the
+requested time range. Old months are removed by dropping their partition (see
+apply_retention). Older databases keep their reviews table until migrated with
+compact_storage.
 """
 
+import asyncio
+import base64
+import os
+import queue
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Iterable, List, Optional, Tuple
+from dotenv import load_dotenv
+import monitoring
+from hashing import text_hash
 from logger import MyLogger
-from databases import Database
+
+load_dotenv()
+
 # Get a logger for this module
 logger = MyLogger.get_logger(__name__)
 
 # Specify the name (or path) of the SQLite database file.
-DB_FILE = "sentiment_analysis.db"
-file = Database("sqlite:///sentiment_analysis.db")
+DB_FILE = os.getenv("DB_FILE", "sentiment_analysis.db")
+
+_SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+_TEMP_STORE_MODES = ("DEFAULT", "FILE", "MEMORY")
+
+
+class ConnectionManager:
+    """
+    Owns the long-lived SQLite connections of the process.
+
+    Args:
+        db_file (str): Path of the SQLite database file.
+        synchronous (str): PRAGMA synchronous (OFF, NORMAL, FULL or EXTRA).
+        cache_size (int): PRAGMA cache_size (pages, or KiB if negative).
+        mmap_size (int): PRAGMA mmap_size in bytes.
+        temp_store (str): PRAGMA temp_store (DEFAULT, FILE or MEMORY).
+        statement_cache (int): Prepared statements cached per connection.
+        read_pool_size (int): Maximum number of reader connections.
+        busy_timeout (float): Seconds to wait on a locked database.
+    """
+
+    def __init__(self, db_file: str, synchronous: str = "NORMAL", cache_size: int = -65536,
+                 mmap_size: int = 268435456, temp_store: str = "MEMORY",
+                 statement_cache: int = 256, read_pool_size: int = 4, busy_timeout: float = 5.0):
+        synchronous = synchronous.upper()
+        temp_store = temp_store.upper()
+        if synchronous not in _SYNCHRONOUS_MODES:
+            raise ValueError(f"Invalid synchronous mode: {synchronous}")
+        if temp_store not in _TEMP_STORE_MODES:
+            raise ValueError(f"Invalid temp_store mode: {temp_store}")
+        self.db_file = db_file
+        self.pragmas = {
+            "synchronous": synchronous,
+            "cache_size": int(cache_size),
+            "mmap_size": int(mmap_size),
+            "temp_store": temp_store,
+        }
+        self.statement_cache = statement_cache
+        self.read_pool_size = read_pool_size
+        self.busy_timeout = busy_timeout
+        self._writer = None
+        self._write_lock = threading.Lock()
+        self._after_commit: List[Callable[[], None]] = []
+        self._readers = queue.LifoQueue()
+        self._readers_created = 0
+        self._pool_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_file,
+            timeout=self.busy_timeout,
+            check_same_thread=False,  # Connections are handed between worker threads, never shared concurrently.
+            cached_statements=self.statement_cache
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name}={value}")
+        return conn
+
+    @contextmanager
+    def writer(self):
+        """
+        Yields the writer connection inside a transaction, holding the write lock.
+        Commits on success and rolls back on error.
+        """
+        with self._write_lock:
+            if self._writer is None:
+                self._writer = self._connect()
+                logger.info("Opened writer connection to %s with %s", self.db_file, self.pragmas)
+            try:
+                with self._writer:
+                    # Take the write lock up front, so what the transaction reads cannot
+                    # change (by another process) before its writes are applied.
+                    self._writer.execute("BEGIN IMMEDIATE")
+                    yield self._writer
+                for callback in self._after_commit:
+                    callback()
+            finally:
+                self._after_commit = []
+
+    def after_commit(self, callback: Callable[[], None]):
+        """
+        Runs callback once the current writer transaction has committed; it is
+        dropped if the transaction rolls back. Only call it inside writer().
+        """
+        self._after_commit.append(callback)
+
+    @contextmanager
+    def reader(self):
+        """
+        Yields a pooled reader connection, opening one if the pool is not yet full
+        and waiting for a free one otherwise.
+        """
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            with self._pool_lock:
+                create = self._readers_created < self.read_pool_size
+                if create:
+                    self._readers_created += 1
+            if create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    # Give the slot back, or the pool would shrink for good.
+                    with self._pool_lock:
+                        self._readers_created -= 1
+                    raise
+            else:
+                conn = self._readers.get()
+        try:
+            yield conn
+        finally:
+            self._readers.put(conn)
+
+    @contextmanager
+    def dedicated_reader(self):
+        """
+        Yields a new reader connection outside the pool and closes it afterwards.
+        Used by long-running streams so they do not hold a pooled connection.
+        """
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def close(self):
+        """
+        Closes the writer and all idle reader connections. Readers still in use
+        stay counted and return to the pool when released.
+        """
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        with self._pool_lock:
+            while True:
+                try:
+                    conn = self._readers.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+                self._readers_created -= 1
+        logger.info("Closed connections to %s", self.db_file)
+
+
+db = ConnectionManager(
+    DB_FILE,
+    synchronous=os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+    cache_size=int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),
+    mmap_size=int(os.getenv("SQLITE_MMAP_SIZE", "268435456")),
+    temp_store=os.getenv("SQLITE_TEMP_STORE", "MEMORY"),
+    statement_cache=int(os.getenv("SQLITE_STATEMENT_CACHE", "256")),
+    read_pool_size=int(os.getenv("SQLITE_READ_POOL_SIZE", "4")),
+    busy_timeout=float(os.getenv("SQLITE_BUSY_TIMEOUT", "5"))
+)
+
+
+def _fetch_all(query: str, params: Tuple) -> List[dict]:
+    with db.reader() as conn:
+        cursor = conn.execute(query, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+async def fetch_all(query: str, params: Tuple = ()) -> List[dict]:
+    """
+    Runs a read query on a pooled reader connection in a worker thread,
+    so the event loop is not blocked. Returns the rows as dictionaries.
+    """
+    return await asyncio.to_thread(_fetch_all, query, params)
+
+
+def close_connections():
+    """
+    Closes all database connections. Called on application shutdown.
+    """
+    db.close()
+
+
 def create_database():
     """
-    Creates the SQLite database and reviews table if they do not exist.
-    Includes exception handling for any issues during creation.
+    Creates the SQLite database and reviews storage if they do not exist.
+    New databases use the partitioned layout (see _create_partitioned_storage);
+    databases with a legacy reviews table keep it until they are migrated with
+    compact_storage. Includes exception handling for any issues during creation.
     """
     try:
-        with sqlite3.connect(DB_FILE) as conn:
+        with db.writer() as conn:
             cursor = conn.cursor()
-            # Create a table for storing reviews and their sentiment analysis results.
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS reviews (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    request_id TEXT NOT NULL,
-                    user_id TEXT NOT NULL,
-                    review_text TEXT NOT NULL,
-                    sentiment TEXT NOT NULL,
-                    confidence REAL NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                );
-            """)
-            conn.commit()
+            cursor.execute("SELECT type FROM sqlite_master WHERE name = 'reviews'")
+            existing = cursor.fetchone()
+            if existing is None:
+                _create_partitioned_storage(cursor)
+                _create_union_view(cursor)
+            _create_user_summary(cursor)
+            _create_rollups(cursor)
+            if existing is not None and existing[0] == "table":
+                _create_legacy_storage(cursor)
+                logger.info(
+                    "reviews uses the legacy layout; run 'python db_admin.py compact-storage' to migrate it.")
 
         logger.info("Database and reviews table checked/created successfully.")
 
     except Exception as e:
-        logger.error(f"Error creating database or table: {e}")
+        logger.error("Error creating database or table: %s", e)
         raise
+
+
+def _create_legacy_storage(cursor):
+    # Create a table for storing reviews and their sentiment analysis results.
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS reviews (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            request_id TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            review_text TEXT NOT NULL,
+            sentiment TEXT NOT NULL,
+            confidence REAL NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    # Indexes backing the per-user and time-range history queries.
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reviews_user_created
+        ON reviews (user_id, created_at);
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_reviews_created
+        ON reviews (created_at);
+    """)
+    _create_request_id_index(cursor)
+    _create_aggregate_triggers(cursor, "reviews")
+    _create_search_index(cursor, "reviews", fts="reviews_fts", content="reviews")
+
+
+# Sentiment labels as stored in review_rows_*.sentiment.
+SENTIMENT_CODES = {"neutral": 0, "positive": 1, "negative": 2}
+
+
+def _create_partitioned_storage(cursor):
+    """
+    Creates the tables shared by all monthly partitions:
+      - users: each user_id once, referenced by a small integer;
+      - review_keys: the id, request_id and partition month of every review. It
+        hands out review ids and keeps request_id unique across partitions;
+      - review_partitions: the months that have a partition, with their time range.
+    """
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY,
+            user_id TEXT NOT NULL UNIQUE
+        );
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS review_keys (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            request_id TEXT NOT NULL UNIQUE,
+            month TEXT NOT NULL
+        );
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS review_partitions (
+            month TEXT PRIMARY KEY,
+            start TIMESTAMP NOT NULL,
+            end TIMESTAMP NOT NULL
+        ) WITHOUT ROWID;
+    """)
+
+
+def _partition_month(created_at: str) -> str:
+    # "YYYY-MM-DD HH:MM:SS" -> "YYYYMM"
+    return created_at[:4] + created_at[5:7]
+
+
+def _partition_range(month: str) -> Tuple[str, str]:
+    year, number = int(month[:4]), int(month[4:])
+    end_year, end_number = (year + 1, 1) if number == 12 else (year, number + 1)
+    return f"{year:04d}-{number:02d}-01 00:00:00", f"{end_year:04d}-{end_number:02d}-01 00:00:00"
+
+
+def _create_partition(cursor, month: str, aggregates: bool = True, union_view: bool = True):
+    """
+    Creates the partition of one month (YYYYMM):
+      - review_texts_<month>: each distinct review text of the month once, keyed
+        by its content hash;
+      - review_rows_<month>: one row per review with integer references and the
+        sentiment as a SENTIMENT_CODES integer;
+      - reviews_<month>: a view with the columns of the legacy reviews table;
+      - reviews_fts_<month>: the full-text index of the month.
+    aggregates=False leaves out the user_summary and review_rollups triggers and
+    union_view=False leaves the reviews view as it is (both used while migrating).
+    """
+    start, end = _partition_range(month)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS review_texts_{month} (
+            id INTEGER PRIMARY KEY,
+            hash BLOB NOT NULL UNIQUE,
+            review_text TEXT NOT NULL
+        );
+    """)
+    cursor.execute(f"""
+        CREATE TABLE IF NOT EXISTS review_rows_{month} (
+            id INTEGER PRIMARY KEY,
+            user_ref INTEGER NOT NULL REFERENCES users (id),
+            text_ref INTEGER NOT NULL REFERENCES review_texts_{month} (id),
+            sentiment INTEGER NOT NULL,
+            confidence REAL NOT NULL,
+            created_at TIMESTAMP NOT NULL CHECK (created_at >= '{start}' AND created_at < '{end}')
+        );
+    """)
+    cursor.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_review_rows_{month}_user_created
+        ON review_rows_{month} (user_ref, created_at);
+    """)
+    cursor.execute(f"""
+        CREATE INDEX IF NOT EXISTS idx_review_rows_{month}_created
+        ON review_rows_{month} (created_at);
+    """)
+    cursor.execute(f"""
+        CREATE VIEW IF NOT EXISTS reviews_{month} AS
+        SELECT r.id, k.request_id, u.user_id, t.review_text,
+               {_sentiment_label("r.sentiment")} AS sentiment,
+               r.confidence, r.created_at
+        FROM review_rows_{month} r
+        JOIN review_keys k ON k.id = r.id
+        JOIN users u ON u.id = r.user_ref
+        JOIN review_texts_{month} t ON t.id = r.text_ref
+    """)
+    _create_search_index(cursor, f"review_rows_{month}", fts=f"reviews_fts_{month}", content=f"reviews_{month}")
+    if aggregates:
+        _create_aggregate_triggers(cursor, f"review_rows_{month}")
+    cursor.execute(
+        "INSERT OR IGNORE INTO review_partitions (month, start, end) VALUES (?, ?, ?)", (month, start, end))
+    if union_view:
+        _create_union_view(cursor)
+    logger.info("Created partition %s", month)
+
+
+def _drop_partition(cursor, month: str):
+    # Dropping the tables also drops their indexes and triggers.
+    cursor.execute(f"DROP TABLE IF EXISTS reviews_fts_{month}")
+    cursor.execute(f"DROP VIEW IF EXISTS reviews_{month}")
+    cursor.execute(f"DROP TABLE IF EXISTS review_rows_{month}")
+    cursor.execute(f"DROP TABLE IF EXISTS review_texts_{month}")
+    cursor.execute("DELETE FROM review_partitions WHERE month = ?", (month,))
+    _create_union_view(cursor)
+    _known_partitions.discard(month)
+
+
+def _partition_months(cursor) -> List[str]:
+    cursor = cursor.execute("SELECT month FROM review_partitions ORDER BY month")
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _create_union_view(cursor):
+    """
+    (Re)creates the read-only reviews view as the union of all partitions, so
+    queries on reviews keep working. The API itself queries the partitions.
+    """
+    months = _partition_months(cursor)
+    cursor.execute("DROP VIEW IF EXISTS reviews")
+    if months:
+        body = "\nUNION ALL\n".join(f"SELECT * FROM reviews_{month}" for month in months)
+    else:
+        body = ("SELECT NULL AS id, NULL AS request_id, NULL AS user_id, NULL AS review_text, "
+                "NULL AS sentiment, NULL AS confidence, NULL AS created_at WHERE 0")
+    cursor.execute(f"CREATE VIEW reviews AS {body}")
+
+
+# Months whose partition this process has seen committed, so inserts skip the catalog lookup.
+_known_partitions = set()
+
+
+def _ensure_partition(cursor, month: str, migrating: bool = False):
+    if month in _known_partitions:
+        return
+    cursor.execute("SELECT 1 FROM review_partitions WHERE month = ?", (month,))
+    if cursor.fetchone() is None:
+        _create_partition(cursor, month, aggregates=not migrating, union_view=not migrating)
+    # Only once committed: after a rollback the partition would not exist.
+    db.after_commit(lambda: _known_partitions.add(month))
+
+
+def _forget_dropped_partitions(cursor):
+    # Re-reads the catalog after another process may have dropped partitions. Months
+    # are only removed: one created by the open transaction is not committed yet.
+    _known_partitions.intersection_update(_partition_months(cursor))
+
+
+def _sentiment_label(code: str) -> str:
+    # SQL expression turning a SENTIMENT_CODES integer into its label.
+    cases = " ".join(f"WHEN {value} THEN '{label}'" for label, value in SENTIMENT_CODES.items())
+    return f"CASE {code} {cases} END"
+
+
+def _is_partitioned(cursor) -> bool:
+    cursor = cursor.execute("SELECT type FROM sqlite_master WHERE name = 'reviews'")
+    row = cursor.fetchone()
+    return row is not None and row[0] == "view"
+
+
+# SQL expressions for the columns of the inserted (NEW) or deleted (OLD) row, per
+# store table (reviews or review_rows_<month>), for use in its triggers.
+def _row_columns(table: str, row: str) -> dict:
+    if table.startswith("review_rows_"):
+        texts = "review_texts_" + table[len("review_rows_"):]
+        return {
+            "user_id": f"(SELECT user_id FROM users WHERE id = {row}.user_ref)",
+            "review_text": f"(SELECT review_text FROM {texts} WHERE id = {row}.text_ref)",
+            "text_column": "text_ref",
+            "sentiment": _sentiment_label(f"{row}.sentiment"),
+        }
+    return {
+        "user_id": f"{row}.user_id",
+        "review_text": f"{row}.review_text",
+        "text_column": "review_text",
+        "sentiment": f"{row}.sentiment",
+    }
+
+
+def _create_aggregate_triggers(cursor, table: str):
+    _create_user_summary_trigger(cursor, table)
+    _create_rollups_trigger(cursor, table)
+
+
+def _table_exists(cursor, name: str) -> bool:
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,))
+    return cursor.fetchone() is not None
+
+
+# Recomputes user_summary from scratch; used on creation and by rebuild_user_summary.
+_USER_SUMMARY_REBUILD = """
+    INSERT INTO user_summary (user_id, total, positive, negative, neutral,
+                              confidence_sum, confidence_sq_sum, first_seen, last_seen)
+    SELECT user_id, COUNT(*),
+           SUM(sentiment = 'positive'), SUM(sentiment = 'negative'), SUM(sentiment = 'neutral'),
+           SUM(confidence), SUM(confidence * confidence), MIN(created_at), MAX(created_at)
+    FROM reviews
+    GROUP BY user_id
+"""
+
+
+def _create_user_summary(cursor):
+    """
+    Creates the per-user summary table, filled from reviews when newly created.
+    It is kept current by a trigger on each store table (see
+    _create_user_summary_trigger).
+    """
+    is_new = not _table_exists(cursor, "user_summary")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS user_summary (
+            user_id TEXT PRIMARY KEY,
+            total INTEGER NOT NULL,
+            positive INTEGER NOT NULL,
+            negative INTEGER NOT NULL,
+            neutral INTEGER NOT NULL,
+            confidence_sum REAL NOT NULL,
+            confidence_sq_sum REAL NOT NULL,
+            first_seen TIMESTAMP,
+            last_seen TIMESTAMP
+        ) WITHOUT ROWID;
+    """)
+    if is_new:
+        cursor.execute(_USER_SUMMARY_REBUILD)
+        logger.info("Created user_summary for %d users", cursor.rowcount)
+
+
+def _create_user_summary_trigger(cursor, table: str):
+    """
+    Creates the trigger that adds each review inserted into table to user_summary.
+    It runs inside the inserting transaction, so the summary always matches the
+    committed reviews.
+    """
+    new = _row_columns(table, "NEW")
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_user_summary
+        AFTER INSERT ON {table}
+        BEGIN
+            INSERT INTO user_summary (user_id, total, positive, negative, neutral,
+                                      confidence_sum, confidence_sq_sum, first_seen, last_seen)
+            VALUES ({new["user_id"]}, 1, {new["sentiment"]} = 'positive', {new["sentiment"]} = 'negative',
+                    {new["sentiment"]} = 'neutral', NEW.confidence, NEW.confidence * NEW.confidence,
+                    NEW.created_at, NEW.created_at)
+            ON CONFLICT (user_id) DO UPDATE SET
+                total = total + 1,
+                positive = positive + excluded.positive,
+                negative = negative + excluded.negative,
+                neutral = neutral + excluded.neutral,
+                confidence_sum = confidence_sum + excluded.confidence_sum,
+                confidence_sq_sum = confidence_sq_sum + excluded.confidence_sq_sum,
+                first_seen = MIN(first_seen, excluded.first_seen),
+                last_seen = MAX(last_seen, excluded.last_seen);
+        END;
+    """)
+
+
+def rebuild_user_summary() -> int:
+    """
+    Recomputes the user_summary table from the reviews table in one transaction.
+    Only stored reviews are counted: after apply_retention has dropped partitions,
+    the rebuilt totals no longer include the reviews of those months.
+
+    Returns:
+        int: The number of users in the rebuilt summary.
+    """
+    with db.writer() as conn:
+        conn.execute("DELETE FROM user_summary")
+        users = conn.execute(_USER_SUMMARY_REBUILD).rowcount
+    logger.info("rebuild_user_summary - Rebuilt summary for %d users", users)
+    return users
+
+
+async def fetch_user_summary(user_id: str) -> Optional[dict]:
+    """
+    Returns the summary row of a user (a primary key lookup), or None if the
+    user has no reviews.
+    """
+    rows = await fetch_all("SELECT * FROM user_summary WHERE user_id = ?", (user_id,))
+    return rows[0] if rows else None
+
+
+def _create_request_id_index(cursor):
+    """
+    Makes request_id unique, so a retried request never stores a second row.
+    Older databases may already hold duplicates; the index is then left out
+    (with a warning) until they are removed with dedupe_request_ids.
+    """
+    try:
+        cursor.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_reviews_request_id
+            ON reviews (request_id);
+        """)
+    except sqlite3.IntegrityError:
+        logger.warning(
+            "reviews contains duplicate request_id values; request_id is not enforced unique. "
+            "Run 'python db_admin.py dedupe-request-ids' to remove the duplicates."
+        )
+
+
+def dedupe_request_ids() -> int:
+    """
+    Deletes every review whose request_id was already stored by an earlier row,
+    creates the unique request_id index and rebuilds the aggregate tables,
+    all in one transaction. The partitioned layout enforces a unique request_id
+    from the start, so there is nothing to do on it.
+
+    Returns:
+        int: The number of rows deleted.
+    """
+    with db.writer() as conn:
+        if _is_partitioned(conn):
+            return 0
+        deleted = conn.execute("""
+            DELETE FROM reviews
+            WHERE id NOT IN (SELECT MIN(id) FROM reviews GROUP BY request_id)
+        """).rowcount
+        conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_reviews_request_id ON reviews (request_id)")
+        if deleted:
+            conn.execute("DELETE FROM user_summary")
+            conn.execute(_USER_SUMMARY_REBUILD)
+            conn.execute("DELETE FROM review_rollups")
+            for granularity in ROLLUP_GRANULARITIES:
+                conn.execute(_rollup_rebuild(granularity))
+    logger.info("dedupe_request_ids - Deleted %d duplicate reviews", deleted)
+    return deleted
+
+
+_REQUEST_ID_COLUMNS = ("request_id", "user_id", "sentiment", "confidence")
+
+
+def _fetch_by_request_id(request_ids: List[str]) -> dict:
+    found = {}
+    with db.reader() as conn:
+        partitioned = _is_partitioned(conn)
+        # One read transaction, so retention cannot drop a month between the two lookups.
+        conn.execute("BEGIN")
+        try:
+            # Stay well below SQLite's limit on bound parameters.
+            for i in range(0, len(request_ids), 500):
+                chunk = request_ids[i:i + 500]
+                placeholders = ", ".join("?" * len(chunk))
+                if not partitioned:
+                    rows = conn.execute(
+                        f"SELECT request_id, user_id, sentiment, confidence FROM reviews "
+                        f"WHERE request_id IN ({placeholders}) ORDER BY id",
+                        chunk
+                    ).fetchall()
+                    for row in rows:
+                        found.setdefault(row[0], dict(zip(_REQUEST_ID_COLUMNS, row)))
+                    continue
+                # Resolve each request_id to its month, then probe only that partition
+                # instead of every partition of the reviews view.
+                ids_by_month = {}
+                # (Keys of a month dropped by retention linger until released; skip them.)
+                keys = conn.execute(
+                    f"SELECT k.id, k.month FROM review_keys k JOIN review_partitions p ON p.month = k.month "
+                    f"WHERE k.request_id IN ({placeholders})",
+                    chunk
+                )
+                for review_id, month in keys:
+                    ids_by_month.setdefault(month, []).append(review_id)
+                for month, ids in ids_by_month.items():
+                    rows = conn.execute(
+                        f"SELECT request_id, user_id, sentiment, confidence FROM reviews_{month} "
+                        f"WHERE id IN ({', '.join('?' * len(ids))})",
+                        ids
+                    ).fetchall()
+                    for row in rows:
+                        found[row[0]] = dict(zip(_REQUEST_ID_COLUMNS, row))
+        finally:
+            conn.commit()
+    return found
+
+
+async def fetch_reviews_by_request_id(request_ids: List[str]) -> dict:
+    """
+    Returns the stored reviews with the given request ids, as a dictionary from
+    request_id to row. Request ids that were never stored are absent.
+    """
+    return await asyncio.to_thread(_fetch_by_request_id, request_ids)
+
+
+# Time buckets of the review_rollups table: strftime format of the bucket start.
+ROLLUP_GRANULARITIES = {
+    "minute": "%Y-%m-%d %H:%M:00",
+    "hour": "%Y-%m-%d %H:00:00",
+    "day": "%Y-%m-%d 00:00:00",
+}
+
+
+def _rollup_upsert(granularity: str, table: str) -> str:
+    sentiment = _row_columns(table, "NEW")["sentiment"]
+    return f"""
+        INSERT INTO review_rollups (granularity, bucket, total, positive, negative, neutral, confidence_sum)
+        VALUES ('{granularity}', strftime('{ROLLUP_GRANULARITIES[granularity]}', NEW.created_at), 1,
+                {sentiment} = 'positive', {sentiment} = 'negative', {sentiment} = 'neutral',
+                NEW.confidence)
+        ON CONFLICT (granularity, bucket) DO UPDATE SET
+            total = total + 1,
+            positive = positive + excluded.positive,
+            negative = negative + excluded.negative,
+            neutral = neutral + excluded.neutral,
+            confidence_sum = confidence_sum + excluded.confidence_sum;
+    """
+
+
+def _rollup_rebuild(granularity: str) -> str:
+    return f"""
+        INSERT INTO review_rollups (granularity, bucket, total, positive, negative, neutral, confidence_sum)
+        SELECT '{granularity}', strftime('{ROLLUP_GRANULARITIES[granularity]}', created_at), COUNT(*),
+               SUM(sentiment = 'positive'), SUM(sentiment = 'negative'), SUM(sentiment = 'neutral'),
+               SUM(confidence)
+        FROM reviews
+        GROUP BY 2
+    """
+
+
+def _create_rollups(cursor):
+    """
+    Creates the review_rollups table (sentiment counts and confidence sum per
+    minute, hour and day), filled from reviews when newly created. It is kept
+    current by a trigger on each store table (see _create_rollups_trigger).
+    """
+    is_new = not _table_exists(cursor, "review_rollups")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS review_rollups (
+            granularity TEXT NOT NULL,
+            bucket TIMESTAMP NOT NULL,
+            total INTEGER NOT NULL,
+            positive INTEGER NOT NULL,
+            negative INTEGER NOT NULL,
+            neutral INTEGER NOT NULL,
+            confidence_sum REAL NOT NULL,
+            PRIMARY KEY (granularity, bucket)
+        ) WITHOUT ROWID;
+    """)
+    if is_new:
+        for granularity in ROLLUP_GRANULARITIES:
+            cursor.execute(_rollup_rebuild(granularity))
+        logger.info("Created review_rollups from existing reviews")
+
+
+def _create_rollups_trigger(cursor, table: str):
+    """
+    Creates the trigger that adds each review inserted into table to its
+    review_rollups buckets, inside the inserting transaction.
+    """
+    cursor.execute(
+        f"CREATE TRIGGER IF NOT EXISTS trg_{table}_rollups AFTER INSERT ON {table} BEGIN"
+        + "".join(_rollup_upsert(granularity, table) for granularity in ROLLUP_GRANULARITIES)
+        + "END;"
+    )
+
+
+def rebuild_rollups() -> int:
+    """
+    Recomputes the review_rollups table from the reviews table in one transaction.
+    Only stored reviews are counted: after apply_retention has dropped partitions,
+    the buckets of those months are gone from the rebuilt table.
+
+    Returns:
+        int: The number of buckets in the rebuilt table.
+    """
+    buckets = 0
+    with db.writer() as conn:
+        conn.execute("DELETE FROM review_rollups")
+        for granularity in ROLLUP_GRANULARITIES:
+            buckets += conn.execute(_rollup_rebuild(granularity)).rowcount
+    logger.info("rebuild_rollups - Rebuilt %d rollup buckets", buckets)
+    return buckets
+
+
+async def fetch_rollups(
+    granularity: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = 1000
+) -> List[dict]:
+    """
+    Returns up to `limit` rollup buckets of the given granularity, oldest first,
+    each with its sentiment counts and mean confidence. Buckets whose start lies in
+    [start, end) are returned; without a start, the latest `limit` buckets are.
+    Only buckets that contain reviews exist.
+
+    Raises:
+        ValueError: If the granularity is unknown.
+    """
+    if granularity not in ROLLUP_GRANULARITIES:
+        raise ValueError(f"Unknown granularity: {granularity}. Use one of {list(ROLLUP_GRANULARITIES)}")
+
+    conditions, params = ["granularity = ?"], [granularity]
+    if start is not None:
+        # Include the bucket that contains start.
+        conditions.append(f"bucket >= strftime('{ROLLUP_GRANULARITIES[granularity]}', ?)")
+        params.append(to_db_timestamp(start))
+    if end is not None:
+        conditions.append("bucket < ?")
+        params.append(to_db_timestamp(end))
+    order = "ASC" if start is not None else "DESC"
+    query = f"""
+        SELECT bucket, total, positive, negative, neutral,
+               ROUND(confidence_sum / total, 4) AS average_confidence
+        FROM review_rollups
+        WHERE {" AND ".join(conditions)}
+        ORDER BY bucket {order}
+        LIMIT ?
+    """
+    params.append(limit)
+    rows = await fetch_all(query, tuple(params))
+    return rows if start is not None else rows[::-1]
+
+
+def _create_search_index(cursor, table: str, fts: str, content: str):
+    """
+    Creates the full-text index fts over the review_text of the content view (or
+    table) and the triggers on the store table that keep it in step. It is an
+    external-content FTS5 table: it stores only the index, and the text itself is
+    read from content. A newly created index is filled from content.
+    """
+    new, old = _row_columns(table, "NEW"), _row_columns(table, "OLD")
+    is_new = not _table_exists(cursor, fts)
+    cursor.execute(f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+            review_text,
+            content='{content}',
+            content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        );
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_insert
+        AFTER INSERT ON {table}
+        BEGIN
+            INSERT INTO {fts} (rowid, review_text) VALUES (NEW.id, {new["review_text"]});
+        END;
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_delete
+        AFTER DELETE ON {table}
+        BEGIN
+            INSERT INTO {fts} ({fts}, rowid, review_text) VALUES ('delete', OLD.id, {old["review_text"]});
+        END;
+    """)
+    cursor.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_fts_update
+        AFTER UPDATE OF {new["text_column"]} ON {table}
+        BEGIN
+            INSERT INTO {fts} ({fts}, rowid, review_text) VALUES ('delete', OLD.id, {old["review_text"]});
+            INSERT INTO {fts} (rowid, review_text) VALUES (NEW.id, {new["review_text"]});
+        END;
+    """)
+    if is_new:
+        cursor.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+        logger.info("Created %s from existing reviews", fts)
+
+
+def _sources(conn, start: Optional[str] = None, end: Optional[str] = None) -> List[Tuple[str, str]]:
+    """
+    Returns the (reviews view or table, full-text index) pairs that can hold
+    reviews created in [start, end), oldest first: the partitions overlapping the
+    range, or the legacy reviews table.
+    """
+    if not _is_partitioned(conn):
+        return [("reviews", "reviews_fts")]
+    conditions, params = [], []
+    if start is not None:
+        conditions.append("end > ?")
+        params.append(start)
+    if end is not None:
+        conditions.append("start < ?")
+        params.append(end)
+    query = "SELECT month FROM review_partitions"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    rows = conn.execute(query + " ORDER BY month", params).fetchall()
+    return [(f"reviews_{month}", f"reviews_fts_{month}") for (month,) in rows]
+
+
+def rebuild_search_index() -> int:
+    """
+    Rebuilds the full-text indexes from the reviews they cover, in one transaction.
+
+    Returns:
+        int: The number of reviews indexed.
+    """
+    reviews = 0
+    with db.writer() as conn:
+        for view, fts in _sources(conn):
+            conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+            reviews += conn.execute(f"SELECT COUNT(*) FROM {view}").fetchone()[0]
+    logger.info("rebuild_search_index - Indexed %d reviews", reviews)
+    return reviews
+
+
+def optimize_search_index():
+    """
+    Merges the segments of each full-text index into one, which speeds up
+    queries after many small inserts.
+    """
+    with db.writer() as conn:
+        for _view, fts in _sources(conn):
+            conn.execute(f"INSERT INTO {fts} ({fts}) VALUES ('optimize')")
+    logger.info("optimize_search_index - Merged full-text index segments")
+
+
+SENTIMENTS = ("positive", "negative", "neutral")
+
+
+def build_match_query(text: str) -> str:
+    """
+    Turns free text into an FTS5 query matching reviews that contain every word.
+    Each word is quoted, so FTS5 operators in the text are matched literally;
+    a word ending in * matches any word with that prefix.
+
+    Raises:
+        ValueError: If the text contains no words.
+    """
+    terms = []
+    for word in text.split():
+        prefix = word.endswith("*")
+        word = word.rstrip("*")
+        if word:
+            terms.append('"' + word.replace('"', '""') + '"' + ("*" if prefix else ""))
+    if not terms:
+        raise ValueError("Search query is empty")
+    return " ".join(terms)
+
+
+def _search(match: str, limit: int, offset: int, filters: List[Tuple[str, object]],
+            start: Optional[str], end: Optional[str]) -> List[dict]:
+    with db.reader() as conn:
+        rows = []
+        # One read transaction, so retention cannot drop a listed partition mid-search.
+        conn.execute("BEGIN")
+        try:
+            # Each source returns its own best offset + limit + 1 matches; the merged
+            # list is then cut to the requested page.
+            for view, fts in _sources(conn, start, end):
+                conditions = [f"{fts} MATCH ?"] + [condition for condition, _ in filters]
+                cursor = conn.execute(f"""
+                    SELECT r.id, r.request_id, r.user_id, r.review_text, r.sentiment, r.confidence, r.created_at,
+                           {fts}.rank AS score,
+                           snippet({fts}, 0, '[', ']', '...', 16) AS snippet
+                    FROM {fts} JOIN {view} r ON r.id = {fts}.rowid
+                    WHERE {" AND ".join(conditions)}
+                    ORDER BY {fts}.rank, r.id
+                    LIMIT ?
+                """, [match] + [value for _, value in filters] + [offset + limit + 1])
+                columns = [column[0] for column in cursor.description]
+                rows.extend(dict(zip(columns, row)) for row in cursor.fetchall())
+        finally:
+            conn.commit()
+    rows.sort(key=lambda row: (row["score"], row["id"]))
+    rows = rows[offset:offset + limit + 1]
+    for row in rows:
+        row["score"] = round(row["score"], 4)
+    return rows
+
+
+async def search_reviews(
+    text: str,
+    limit: int,
+    offset: int = 0,
+    sentiment: Optional[str] = None,
+    user_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> Tuple[List[dict], Optional[int]]:
+    """
+    Finds reviews containing every word of text, best match (BM25) first,
+    optionally restricted to one sentiment, one user and a time range. Only the
+    partitions overlapping the time range are searched; scores come from each
+    partition's own index. Each row carries its score (lower is better) and a
+    snippet with the matches in [brackets].
+
+    Returns:
+        Tuple[List[dict], Optional[int]]: The rows, and the offset of the next
+        page, or None if this is the last page.
+
+    Raises:
+        ValueError: If the text has no words or the sentiment is unknown.
+    """
+    if sentiment is not None and sentiment not in SENTIMENTS:
+        raise ValueError(f"Unknown sentiment: {sentiment}. Use one of {list(SENTIMENTS)}")
+
+    match = build_match_query(text)
+    start = to_db_timestamp(start) if start is not None else None
+    end = to_db_timestamp(end) if end is not None else None
+    filters = []
+    if sentiment is not None:
+        filters.append(("r.sentiment = ?", sentiment))
+    if user_id is not None:
+        filters.append(("r.user_id = ?", user_id))
+    if start is not None:
+        filters.append(("r.created_at >= ?", start))
+    if end is not None:
+        filters.append(("r.created_at < ?", end))
+    rows = await asyncio.to_thread(_search, match, limit, offset, filters, start, end)
+    if len(rows) > limit:
+        return rows[:limit], offset + limit
+    return rows, None
+
+
+# Columns of the reviews table, in table order.
+REVIEW_COLUMNS = ("id", "request_id", "user_id", "review_text", "sentiment", "confidence", "created_at")
+
+
+def _history_sources(conn, start: Optional[datetime], end: Optional[datetime],
+                     after: Optional[str] = None) -> List[str]:
+    # Reviews tables or partition views that can hold matching rows, oldest first.
+    lower = to_db_timestamp(start) if start is not None else None
+    if after is not None:
+        created_at, _ = decode_cursor(after)
+        lower = max(lower, created_at) if lower is not None else created_at
+    upper = to_db_timestamp(end) if end is not None else None
+    return [view for view, _fts in _sources(conn, lower, upper)]
+
+
+def _iter_chunks(columns: str, user_id: Optional[str], start: Optional[datetime],
+                 end: Optional[datetime], chunk_size: int):
+    with db.dedicated_reader() as conn:
+        # One read transaction for the whole stream: the partitions listed stay
+        # readable even if retention drops them meanwhile.
+        conn.execute("BEGIN")
+        try:
+            for table in _history_sources(conn, start, end):
+                query, params = build_history_query(user_id=user_id, start=start, end=end,
+                                                    columns=columns, table=table)
+                cursor = conn.execute(query, params)
+                while True:
+                    rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield rows
+        finally:
+            conn.commit()
+
+
+def iter_review_chunks(
+    columns: Iterable[str] = REVIEW_COLUMNS,
+    user_id: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    chunk_size: int = 1000
+):
+    """
+    Returns an iterator over the selected columns of matching reviews, yielding
+    lists of row tuples (at most chunk_size rows at a time) in (created_at, id)
+    order. Rows are read from the database cursor as they are consumed, one
+    partition after the other, so memory use does not depend on table size.
+    The iterator holds a dedicated connection until it is exhausted; close it
+    to release the connection early.
+
+    Raises:
+        ValueError: If no column or an unknown column is requested. Raised
+            immediately, before any row is read.
+    """
+    columns = list(columns)
+    unknown = [column for column in columns if column not in REVIEW_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown columns: {unknown}")
+    if not columns:
+        raise ValueError("No columns selected")
+
+    return _iter_chunks(", ".join(columns), user_id, start, end, chunk_size)
+
+
+def encode_cursor(row: dict) -> str:
+    """
+    Encodes the keyset position (created_at, id) of a row as an opaque cursor string.
+    """
+    raw = f"{row['created_at']}|{row['id']}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """
+    Decodes a cursor made by encode_cursor. Raises ValueError if it is malformed.
+    """
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").rsplit("|", 1)
+        return created_at, int(row_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def to_db_timestamp(value: datetime) -> str:
+    """
+    Formats a datetime like SQLite's CURRENT_TIMESTAMP (UTC), so it compares
+    correctly against created_at. Naive datetimes are taken as UTC.
+    """
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def build_history_query(
+    user_id: Optional[str] = None,
+    after: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    columns: str = "*",
+    table: str = "reviews"
+) -> Tuple[str, list]:
+    """
+    Builds a parameterized query over table (reviews, or the view of one
+    partition) in (created_at, id) order, optionally restricted to one user, a
+    time range and rows after a cursor. Both the user and time filters are
+    served by the table indexes.
+
+    Returns:
+        Tuple[str, list]: The SQL (without LIMIT) and its parameters.
+    """
+    conditions, params = [], []
+    if user_id is not None:
+        conditions.append("user_id = ?")
+        params.append(user_id)
+    if start is not None:
+        conditions.append("created_at >= ?")
+        params.append(to_db_timestamp(start))
+    if end is not None:
+        conditions.append("created_at < ?")
+        params.append(to_db_timestamp(end))
+    if after is not None:
+        conditions.append("(created_at, id) > (?, ?)")
+        params.extend(decode_cursor(after))
+
+    query = f"SELECT {columns} FROM {table}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY created_at, id"
+    return query, params
+
+
+def _fetch_page(limit: int, user_id: Optional[str], after: Optional[str],
+                start: Optional[datetime], end: Optional[datetime]) -> List[tuple]:
+    rows = []
+    with db.reader() as conn:
+        # One read transaction, so retention cannot drop a listed partition mid-page.
+        conn.execute("BEGIN")
+        try:
+            for table in _history_sources(conn, start, end, after):
+                query, params = build_history_query(user_id=user_id, after=after, start=start, end=end,
+                                                    columns=", ".join(REVIEW_COLUMNS), table=table)
+                # Fetch one extra row to know whether another page follows.
+                rows.extend(conn.execute(query + " LIMIT ?", params + [limit + 1 - len(rows)]).fetchall())
+                if len(rows) > limit:
+                    break
+        finally:
+            conn.commit()
+    return rows
+
+
+async def fetch_review_rows(
+    limit: int,
+    user_id: Optional[str] = None,
+    after: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> Tuple[List[tuple], Optional[str]]:
+    """
+    Fetches one keyset-paginated page of reviews as tuples of REVIEW_COLUMNS.
+    Partitions are read in time order, starting at the one holding the cursor,
+    until the page is full.
+
+    Returns:
+        Tuple[List[tuple], Optional[str]]: The rows, and the cursor for the next
+        page, or None if this is the last page.
+    """
+    rows = await asyncio.to_thread(_fetch_page, limit, user_id, after, start, end)
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(dict(zip(REVIEW_COLUMNS, rows[-1])))
+    return rows, None
+
+
+async def fetch_reviews(
+    limit: int,
+    user_id: Optional[str] = None,
+    after: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """
+    Fetches one keyset-paginated page of reviews as dictionaries (see fetch_review_rows).
+
+    Returns:
+        Tuple[List[dict], Optional[str]]: The rows, and the cursor for the next
+        page, or None if this is the last page.
+    """
+    rows, next_cursor = await fetch_review_rows(limit, user_id=user_id, after=after, start=start, end=end)
+    return [dict(zip(REVIEW_COLUMNS, row)) for row in rows], next_cursor
+
+
 def retrive_data_user(
         u_id:str
 ):
     try:
-        with sqlite3.connect(DB_FILE) as conn:
+        with db.reader() as conn:
             cursor= conn.cursor()
             cursor.execute("""
-                SELECT * FROM reviews where user_id = {}
-                           """)
+                SELECT * FROM reviews where user_id = ?
+                           """, (u_id,))
             output = cursor.fetchmany() 
             for row in output: 
                 print(row) 
-            conn.commit()
     except Exception as e:
-        logger.error(f"Error inserting feedback: {e}")
+        logger.error("Error inserting feedback: %s", e)
         raise
 
 def retrive_data():
     try:
-        with sqlite3.connect(DB_FILE) as conn:
+        with db.reader() as conn:
             cursor= conn.cursor()
             cursor.execute("""
                 SELECT * FROM reviews
@@ -66,12 +1202,102 @@ def retrive_data():
             output = cursor.fetchmany() 
             for row in output: 
                 print(row)
-            conn.commit()
     except Exception as e:
-        logger.error(f"Error inserting feedback: {e}")
+        logger.error("Error inserting feedback: %s", e)
         raise
 
 
+_LEGACY_INSERT = """
+    INSERT OR IGNORE INTO reviews (request_id, user_id, review_text, sentiment, confidence)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+
+def _insert_month(conn, cursor, month: str, month_rows: List[tuple], migrating: bool):
+    # (id, user_id, review_text, sentiment code, confidence, created_at) rows of one month.
+    _ensure_partition(cursor, month, migrating=migrating)
+    hashes = [text_hash(row[2]) for row in month_rows]
+    conn.executemany(
+        f"INSERT OR IGNORE INTO review_texts_{month} (hash, review_text) VALUES (?, ?)",
+        [(digest, row[2]) for digest, row in zip(hashes, month_rows)]
+    )
+    conn.executemany(f"""
+        INSERT INTO review_rows_{month} (id, user_ref, text_ref, sentiment, confidence, created_at)
+        VALUES (?, (SELECT id FROM users WHERE user_id = ?),
+                (SELECT id FROM review_texts_{month} WHERE hash = ?), ?, ?, ?)
+    """, [(row[0], row[1], digest, row[3], row[4], row[5]) for row, digest in zip(month_rows, hashes)])
+
+
+def _insert_partitioned(conn, rows: List[tuple], migrating: bool = False) -> int:
+    """
+    Inserts (id, request_id, user_id, review_text, sentiment, confidence, created_at)
+    rows into the partitions of their months, interning texts and user ids and
+    creating missing partitions. id and created_at may be None for a new id and
+    the current time. Rows whose request_id is already stored, or repeats one of
+    an earlier row, are ignored.
+
+    Returns:
+        int: The number of reviews inserted.
+    """
+    now = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    try:
+        codes = [SENTIMENT_CODES[row[4]] for row in rows]
+    except KeyError as e:
+        raise ValueError(f"Unknown sentiment: {e.args[0]}") from None
+    conn.executemany("INSERT OR IGNORE INTO users (user_id) VALUES (?)", [(row[2],) for row in rows])
+
+    # Keep the first row of each request_id that is not stored yet.
+    request_ids = list(dict.fromkeys(row[1] for row in rows))
+    stored = set()
+    for i in range(0, len(request_ids), 500):
+        chunk = request_ids[i:i + 500]
+        placeholders = ", ".join("?" * len(chunk))
+        stored.update(request_id for (request_id,) in conn.execute(
+            f"SELECT request_id FROM review_keys WHERE request_id IN ({placeholders})", chunk))
+    new_rows = []
+    for row, code in zip(rows, codes):
+        if row[1] not in stored:
+            stored.add(row[1])
+            created_at = row[6] or now
+            new_rows.append((row, code, created_at, _partition_month(created_at)))
+    if not new_rows:
+        return 0
+    conn.executemany("INSERT INTO review_keys (id, request_id, month) VALUES (?, ?, ?)",
+                     [(row[0], row[1], month) for row, _code, _created_at, month in new_rows])
+    ids = {}
+    new_ids = [row[1] for row, _code, _created_at, _month in new_rows if row[0] is None]
+    for i in range(0, len(new_ids), 500):
+        chunk = new_ids[i:i + 500]
+        placeholders = ", ".join("?" * len(chunk))
+        ids.update((request_id, review_id) for review_id, request_id in conn.execute(
+            f"SELECT id, request_id FROM review_keys WHERE request_id IN ({placeholders})", chunk))
+
+    by_month = {}
+    for row, code, created_at, month in new_rows:
+        review_id = row[0] if row[0] is not None else ids[row[1]]
+        by_month.setdefault(month, []).append((review_id, row[2], row[3], code, row[5], created_at))
+
+    cursor = conn.cursor()
+    for month, month_rows in by_month.items():
+        try:
+            _insert_month(conn, cursor, month, month_rows, migrating)
+        except sqlite3.OperationalError:
+            if month not in _known_partitions:
+                raise
+            # Another process (apply-retention) dropped the partition since this one
+            # saw it: forget the dropped months and create the partition again.
+            _forget_dropped_partitions(cursor)
+            _insert_month(conn, cursor, month, month_rows, migrating)
+    return sum(len(month_rows) for month_rows in by_month.values())
+
+
+def _insert_rows(conn, rows: List[Tuple[str, str, str, str, float]]) -> int:
+    # Checked per transaction, so a running process follows a migration to partitions.
+    if _is_partitioned(conn):
+        return _insert_partitioned(conn, [(None,) + tuple(row) + (None,) for row in rows])
+    return conn.executemany(_LEGACY_INSERT, rows).rowcount
+
+
 def insert_feedback(
     request_id: str,
     user_id: str,
@@ -88,21 +1314,219 @@ def insert_feedback(
         review_text (str): The text of the product review.
         sentiment (str): The computed sentiment label (positive, negative, neutral).
         confidence (float): The sentiment confidence score (0.0 to 1.0).
+
+    A request_id that is already stored is ignored, so retries never create duplicates.
+
+    Returns:
+        bool: True if the row was inserted, False if the request_id was already stored.
     """
     try:
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO reviews (request_id, user_id, review_text, sentiment, confidence)
-                VALUES (?, ?, ?, ?, ?)
-            """, (request_id, user_id, review_text, sentiment, confidence))
-            conn.commit()
+        with db.writer() as conn:
+            inserted = _insert_rows(conn, [(request_id, user_id, review_text, sentiment, confidence)]) > 0
 
         logger.info(
-            f"insert_feedback - Inserted feedback for request_id={request_id}, "
-            f"user_id={user_id}, sentiment={sentiment}, confidence={confidence}"
+            "insert_feedback - Inserted feedback for request_id=%s, user_id=%s, sentiment=%s, confidence=%s",
+            request_id, user_id, sentiment, confidence
         )
+        return inserted
 
     except Exception as e:
-        logger.error(f"Error inserting feedback: {e}")
+        logger.error("Error inserting feedback: %s", e)
         raise
+
+
+@monitoring.timed()
+def insert_feedback_batch(rows: Iterable[Tuple[str, str, str, str, float]]) -> int:
+    """
+    Inserts many feedback rows into the reviews table in a single transaction.
+
+    Args:
+        rows (Iterable[Tuple]): (request_id, user_id, review_text, sentiment, confidence)
+            tuples, with the same meaning as the insert_feedback arguments.
+            Rows whose request_id is already stored are ignored.
+
+    Returns:
+        int: The number of rows inserted.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+
+    try:
+        with db.writer() as conn:
+            inserted = _insert_rows(conn, rows)
+
+        logger.info("insert_feedback_batch - Inserted %d of %d feedback rows", inserted, len(rows))
+        return inserted
+
+    except Exception as e:
+        logger.error("Error inserting feedback batch: %s", e)
+        raise
+
+
+def _copy_legacy_chunk(conn, last_id: int, chunk_size: int) -> Tuple[int, int]:
+    rows = conn.execute("""
+        SELECT id, request_id, user_id, review_text, sentiment, confidence, created_at
+        FROM reviews WHERE id > ? ORDER BY id LIMIT ?
+    """, (last_id, chunk_size)).fetchall()
+    if rows:
+        _insert_partitioned(conn, rows, migrating=True)
+        last_id = rows[-1][0]
+    return len(rows), last_id
+
+
+def compact_storage(chunk_size: int = 10000, pause: float = 0.0, on_progress=None) -> int:
+    """
+    Migrates a legacy reviews table to monthly partitions while the database
+    stays in use. Rows are copied in id order, keeping their ids, chunk_size rows
+    per transaction, sleeping `pause` seconds between transactions so other
+    writers get the lock. The last transaction copies the rows stored in the
+    meantime, renames the legacy table to reviews_legacy, and creates the reviews
+    view and the aggregate triggers of the partitions; reviews_legacy and its
+    search index are then dropped. The aggregate tables carry over unchanged.
+    An interrupted migration resumes from the last copied row.
+
+    Args:
+        chunk_size (int): Rows copied per transaction.
+        pause (float): Seconds to sleep between transactions.
+        on_progress (callable): Called with (copied, total) after each transaction.
+
+    Returns:
+        int: The number of reviews copied by this call.
+
+    Raises:
+        ValueError: If request_id is not yet unique (run dedupe_request_ids first).
+    """
+    with db.writer() as conn:
+        if _is_partitioned(conn):
+            conn.execute("DROP TABLE IF EXISTS reviews_legacy")
+            conn.execute("DROP TABLE IF EXISTS reviews_fts")
+            logger.info("compact_storage - reviews already uses partitions")
+            return 0
+        if not conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_reviews_request_id'").fetchone():
+            raise ValueError(
+                "request_id is not unique in reviews; run 'python db_admin.py dedupe-request-ids' first")
+        _create_partitioned_storage(conn.cursor())
+        last_id, done = conn.execute("SELECT COALESCE(MAX(id), 0), COUNT(*) FROM review_keys").fetchone()
+        total = conn.execute("SELECT COUNT(*) FROM reviews").fetchone()[0]
+    if done:
+        logger.info("compact_storage - Resuming after %d copied reviews", done)
+
+    copied = 0
+    while True:
+        with db.writer() as conn:
+            count, last_id = _copy_legacy_chunk(conn, last_id, chunk_size)
+        copied += count
+        if on_progress is not None:
+            on_progress(done + copied, total)
+        if count < chunk_size:
+            break
+        time.sleep(pause)
+
+    with db.writer() as conn:
+        # Rows stored since the last chunk, then the switch to the view.
+        while True:
+            count, last_id = _copy_legacy_chunk(conn, last_id, chunk_size)
+            copied += count
+            if count < chunk_size:
+                break
+        cursor = conn.cursor()
+        cursor.execute("ALTER TABLE reviews RENAME TO reviews_legacy")
+        _create_union_view(cursor)
+        for month in _partition_months(cursor):
+            _create_aggregate_triggers(cursor, f"review_rows_{month}")
+    with db.writer() as conn:
+        conn.execute("DROP TABLE reviews_legacy")
+        conn.execute("DROP TABLE IF EXISTS reviews_fts")
+    logger.info("compact_storage - Copied %d reviews; reviews now uses monthly partitions", copied)
+    return copied
+
+
+def vacuum_database():
+    """
+    Rebuilds the database file without its free pages, returning the space of
+    dropped partitions and migrated tables to the filesystem. It needs free disk
+    space up to the size of the database and blocks all writers until done, so
+    run it while the API is stopped or idle.
+    """
+    # On its own connection: VACUUM cannot run inside a transaction.
+    with db.dedicated_reader() as conn:
+        conn.execute("VACUUM")
+    logger.info("vacuum_database - Rebuilt %s", db.db_file)
+
+
+def _expired_months(cursor, months: int) -> List[str]:
+    # Partitions older than the current month and the months - 1 before it.
+    now = datetime.now(timezone.utc)
+    index = now.year * 12 + now.month - 1 - (months - 1)
+    oldest_kept = f"{index // 12:04d}{index % 12 + 1:02d}"
+    return [month for month in _partition_months(cursor) if month < oldest_kept]
+
+
+def _archive_partition(month: str, archive_dir: str) -> str:
+    """
+    Copies the reviews of one partition into a standalone SQLite file
+    reviews_<month>.db (table reviews, with the columns of the legacy table) and
+    returns its path. The file is written under a temporary name and renamed
+    when complete, so an existing archive is never left half written.
+    """
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f"reviews_{month}.db")
+    partial = path + ".partial"
+    if os.path.exists(partial):
+        os.remove(partial)
+    with db.dedicated_reader() as conn:
+        conn.execute("ATTACH DATABASE ? AS archive", (partial,))
+        try:
+            conn.execute(f"CREATE TABLE archive.reviews AS SELECT * FROM main.reviews_{month} ORDER BY id")
+            conn.commit()
+        finally:
+            conn.execute("DETACH DATABASE archive")
+    os.replace(partial, path)
+    return path
+
+
+def apply_retention(months: int, archive_dir: Optional[str] = None, dry_run: bool = False,
+                    key_chunk: int = 10000, pause: float = 0.0) -> List[str]:
+    """
+    Drops the partitions older than the last `months` calendar months (the
+    current month included), optionally archiving each one to archive_dir first.
+    Dropping a partition removes its tables and search index at once instead of
+    deleting rows one by one; its request ids are then released from
+    review_keys in chunks of key_chunk, pausing between transactions. The
+    user_summary and review_rollups aggregates keep their lifetime totals until
+    rebuilt: rebuild_user_summary and rebuild_rollups only count the reviews
+    still stored. The freed pages are reused by new reviews but the database
+    file only shrinks after vacuum_database().
+
+    Returns:
+        List[str]: The months (YYYYMM) dropped, or that would be with dry_run.
+
+    Raises:
+        ValueError: If months is below 1 or the database is not partitioned.
+    """
+    if months < 1:
+        raise ValueError("Retention must keep at least one month")
+    with db.reader() as conn:
+        if not _is_partitioned(conn):
+            raise ValueError("reviews is not partitioned; run 'python db_admin.py compact-storage' first")
+        expired = _expired_months(conn.cursor(), months)
+    if dry_run:
+        return expired
+
+    for month in expired:
+        if archive_dir:
+            path = _archive_partition(month, archive_dir)
+            logger.info("apply_retention - Archived partition %s to %s", month, path)
+        with db.writer() as conn:
+            first, last = conn.execute(f"SELECT MIN(id), MAX(id) FROM review_rows_{month}").fetchone()
+            _drop_partition(conn.cursor(), month)
+        if first is not None:
+            for low in range(first, last + 1, key_chunk):
+                with db.writer() as conn:
+                    conn.execute("DELETE FROM review_keys WHERE id >= ? AND id < ? AND month = ?",
+                                 (low, low + key_chunk, month))
+                time.sleep(pause)
+        logger.info("apply_retention - Dropped partition %s", month)
+    return expired
@@ -1,4 +1,5 @@
  # Importing all the required libraries
+import pandas as pd
 import requests
 import streamlit as st
 import time
@@ -17,6 +18,10 @@ logger = MyLogger.get_logger(__name__)
 
 # Storing App URL in a variable
 API_URL_db = "http://127.0.0.1:8080/data_db"
+API_URL_summary = "http://127.0.0.1:8080/users/{user_id}/summary"
+
+# Number of records shown when the user asks to see them
+RECORDS_PAGE_SIZE = 100
 
 # Loading the environment
 load_dotenv()
@@ -27,45 +32,62 @@ headers = {
     'Content-Type': 'application/json'
 }
 
+# History records are requested column-oriented ({column: [values]}), which loads
+# straight into a dataframe.
+headers_columns = {**headers, 'Accept': 'application/vnd.reviews.columns+json'}
+
 # Input for the request
 u_id= str(st.text_input("Enter the desired user id"))
 
+show_records = st.checkbox(f"Also show the first {RECORDS_PAGE_SIZE} records")
+
 if st.button("View"):
         start_time= time.perf_counter()
         logger.info(
                 f"Program starts now: {start_time}"
         )
-        if u_id is not None :
+        if u_id:
             try:
-                payload_db={
-                    "id":u_id
-                    }
-                response = requests.post(API_URL_db, json=payload_db
-                ,headers=headers)
+                # The summary is a single precomputed row, however long the user's history is.
+                response = requests.get(API_URL_summary.format(user_id=u_id), headers=headers)
                 logger.info(
                 f"this the json response generated by the api: {response}"
             )
-                # printing the response on the streamlit page
                 if response.status_code == 200 :
-                    response_data = response.json()
-                    if "error" in response_data:
-                        st.error(response_data["error"])
-                    else: 
-                        user_hist= response.json()
-                        st.header(f"All records of the user {u_id}")
-                        df_user= st.dataframe(user_hist)
-                        st.header(f"Graphical Representation for the user {u_id}")
-                        st.bar_chart(user_hist,x='confidence',
-                                     y='sentiment')
-                        
-                        logger.info(
-                f"this the json response for the data generated by the api: {user_hist}"
-            )
-                if response.status_code == 200:
-                    response_data= response.json()
+                    summary = response.json()
+                    st.header(f"Summary for the user {u_id}")
+                    col1, col2, col3 = st.columns(3)
+                    col1.metric("Reviews", summary["total"])
+                    col2.metric("Average confidence", summary["average_confidence"])
+                    col3.metric("Confidence std. dev.", summary["confidence_stddev"])
+                    st.write(f"First review: {summary['first_seen']} | Last review: {summary['last_seen']}")
+                    st.header(f"Graphical Representation for the user {u_id}")
+                    st.bar_chart(
+                        {
+                            "sentiment": ["positive", "neutral", "negative"],
+                            "reviews": [summary["positive"], summary["neutral"], summary["negative"]]
+                        },
+                        x="sentiment",
+                        y="reviews"
+                    )
+                elif response.status_code == 404:
+                    st.warning(f"No records found for the user {u_id}")
                 else:
                     st.error(f"Request failed with status code {response.status_code}")
 
+                if show_records and response.status_code == 200:
+                    payload_db={
+                        "id":u_id,
+                        "limit":RECORDS_PAGE_SIZE
+                        }
+                    response = requests.post(API_URL_db, json=payload_db
+                    ,headers=headers_columns)
+                    if response.status_code == 200:
+                        st.header(f"Records of the user {u_id}")
+                        st.dataframe(pd.DataFrame(response.json()))
+                    else:
+                        st.error(f"Request failed with status code {response.status_code}")
+
             except Exception as e:
                 st.error(f"an error occured : {e}")
         else:
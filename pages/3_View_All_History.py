@@ -1,4 +1,6 @@
  # Importing all the required libraries
+import os
+import pandas as pd
 import requests
 import streamlit as st
 import time
@@ -15,28 +17,70 @@ headers = {
     'Content-Type': 'application/json'
 }
 
+# History records are requested column-oriented ({column: [values]}), which loads
+# straight into a dataframe.
+headers_columns = {**headers, 'Accept': 'application/vnd.reviews.columns+json'}
+
 # Storing App URL in a variable
 API_URL_db = "http://127.0.0.1:8080/data_all_db"
+API_URL_rollups = "http://127.0.0.1:8080/rollups"
+API_URL_export = "http://127.0.0.1:8080/export"
+
+# Number of records shown when the user asks to see them
+RECORDS_PAGE_SIZE = 100
+
 # Setting up the sidebar
+granularity = st.selectbox("Group reviews by", ["hour", "day", "minute"])
+show_records = st.checkbox(f"Also show the first {RECORDS_PAGE_SIZE} records")
+
 if st.button("View History"):
         start_time= time.perf_counter()
         logger.info(
                 f"Program starts now: {start_time}"
         )
         try:
-                response = requests.post(API_URL_db ,headers=headers)
+                # Rollups are precomputed per time bucket, so the chart costs the same
+                # however many reviews are stored.
+                response = requests.get(API_URL_rollups, params={"granularity": granularity}, headers=headers)
                 if response.status_code == 200 :
-                    response_data = response.json()
-                    if "error" in response_data:
-                        st.error(response_data["error"])
-                    else: 
-                        hist_response= response.json()
-                        st.header("All records of all users")
-                        df1=st.dataframe(hist_response)
-                        st.header("Graphical Representations")
-                        st.line_chart(hist_response, y='sentiment')
-                        logger.info(
-                f"this the json response for the data generated by the api: {hist_response}"
-            )
+                    buckets = response.json()["buckets"]
+                    if not buckets:
+                        st.warning("No reviews stored yet")
+                    else:
+                        st.header(f"Reviews per {granularity}")
+                        st.line_chart(buckets, x="bucket", y=["positive", "neutral", "negative"])
+                        st.header(f"Average confidence per {granularity}")
+                        st.line_chart(buckets, x="bucket", y="average_confidence")
+                        logger.info(f"Loaded {len(buckets)} {granularity} rollup buckets")
+                else:
+                    st.error(f"Request failed with status code {response.status_code}")
+
+                if show_records:
+                    response = requests.post(API_URL_db, json={"limit": RECORDS_PAGE_SIZE}, headers=headers_columns)
+                    if response.status_code == 200:
+                        st.header("Records of all users")
+                        st.dataframe(pd.DataFrame(response.json()))
+                    else:
+                        st.error(f"Request failed with status code {response.status_code}")
+        except Exception as e:
+                st.error(f"an error occured : {e}")
+
+# Exporting the full history: the response is streamed to a file chunk by chunk,
+# so neither the API nor this page holds the whole table in memory.
+export_format = st.selectbox("Export format", ["csv", "ndjson"])
+if st.button("Export Full History"):
+        try:
+                os.makedirs("exports", exist_ok=True)
+                export_path = os.path.join("exports", f"reviews.{export_format}")
+                with requests.get(API_URL_export, params={"format": export_format},
+                                  headers=headers, stream=True) as response:
+                    if response.status_code == 200:
+                        with open(export_path, "wb") as export_file:
+                            for chunk in response.iter_content(chunk_size=65536):
+                                export_file.write(chunk)
+                        st.success(f"Full history exported to {export_path}")
+                        logger.info(f"Full history exported to {export_path}")
+                    else:
+                        st.error(f"Request failed with status code {response.status_code}")
         except Exception as e:
-                st.error(f"an error occured : {e}")
\ No newline at end of file
+                st.error(f"an error occured : {e}")
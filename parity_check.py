@@ -0,0 +1,107 @@
+"""
+Parity check between the precompiled lexicon engine and TextBlob.
+
+Scores a corpus with both TextBlob and polarity_engine and fails if any label differs
+or any confidence differs by more than CONFIDENCE_TOLERANCE. The corpus is a set of
+hand-picked edge cases plus every review text found in the metrics CSV and database.
+tests/test_parity.py runs the same comparison on a fixed corpus.
+
+Run with: python parity_check.py
+"""
+
+import csv
+import os
+import sqlite3
+import sys
+import time
+from typing import Tuple
+
+from textblob import TextBlob
+
+from polarity_engine import get_engine
+from sentiment_analysis import _classify
+
+CONFIDENCE_TOLERANCE = 0.01
+
+EDGE_CASES = [
+    "I absolutely love using this new phone!",
+    "This product is absolutely amazing!",
+    "I found this roduct very useful.!",
+    "This product is bad!",
+    "Not Useful product!",
+    "not bad at all",
+    "It is not a good product",
+    "really not good",
+    "I don't like it, it's terribly slow...",
+    "Great!!! :) would buy again",
+    "worst purchase ever :( ",
+    "Yeah, great product (!)",
+    "The U.S. version works fine, e.g. the battery is ok.",
+    "\"Excellent\" quality, 'highly' recommended",
+    "Never again.",
+    "meh",
+    "",
+    "12345",
+    "Très bien, j'adore ce produit",
+    "This is really a overwhelmed feelings for me that the product is really very nice, "
+    "sturdy and well built..I am very happy with the purchase as it is really really very "
+    "reasonable price but only one thing I felt is about the size is little small but am "
+    "happy with the quality.",
+]
+
+
+def load_corpus() -> list:
+    """
+    Returns the edge cases plus all distinct review texts stored by the app.
+    """
+    texts = list(EDGE_CASES)
+    if os.path.isfile("metrics/Metrics.csv"):
+        with open("metrics/Metrics.csv", newline="", encoding="utf-8") as csvfile:
+            texts.extend(row["review_text"] for row in csv.DictReader(csvfile))
+    if os.path.isfile("sentiment_analysis.db"):
+        with sqlite3.connect("sentiment_analysis.db") as conn:
+            texts.extend(row[0] for row in conn.execute("SELECT review_text FROM reviews"))
+    return list(dict.fromkeys(texts))
+
+
+def compare(corpus: list) -> Tuple[list, float, float]:
+    """
+    Scores every text with TextBlob and with the engine.
+
+    Returns:
+        Tuple[list, float, float]: The (text, textblob result, engine result) of
+        the texts whose results differ, and the seconds TextBlob and the engine took.
+    """
+    engine = get_engine()
+
+    start = time.perf_counter()
+    expected = [_classify(TextBlob(text).sentiment.polarity) for text in corpus]
+    textblob_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    actual = [_classify(engine.polarity(text)) for text in corpus]
+    engine_time = time.perf_counter() - start
+
+    mismatches = [
+        (text, want, got) for text, want, got in zip(corpus, expected, actual)
+        if want["sentiment"] != got["sentiment"]
+        or abs(want["confidence"] - got["confidence"]) > CONFIDENCE_TOLERANCE
+    ]
+    return mismatches, textblob_time, engine_time
+
+
+def main() -> int:
+    corpus = load_corpus()
+    mismatches, textblob_time, engine_time = compare(corpus)
+    for text, want, got in mismatches:
+        print(f"MISMATCH {text!r}: textblob={want} engine={got}")
+
+    print(f"{len(corpus)} texts, {len(mismatches)} mismatches "
+          f"(tolerance {CONFIDENCE_TOLERANCE}); "
+          f"textblob {textblob_time:.4f}s, engine {engine_time:.4f}s, "
+          f"speedup x{textblob_time / max(engine_time, 1e-9):.1f}")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
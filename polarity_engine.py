@@ -0,0 +1,198 @@
+"""
+Module: polarity_engine.py
+Description: Precompiled lexicon polarity engine, a faster drop-in for TextBlob's PatternAnalyzer.
+
+TextBlob rebuilds a TextBlob object, runs its general purpose tokenizer and walks a
+dict-of-dicts lexicon with per-word dict assessments on every call. This engine loads
+the same English sentiment lexicon once into a flat {word: (polarity, intensity,
+is_modifier)} table and scores a text in a single pass over its tokens, applying the
+same intensifier, negation, exclamation and emoticon rules as PatternAnalyzer.
+
+Parity tolerance: sentiment labels match TextBlob exactly and confidence (rounded
+absolute polarity) is within 0.01 of TextBlob for every review in the parity corpus.
+Run `python parity_check.py` to verify this against the installed TextBlob.
+"""
+
+import re
+from typing import Dict, Tuple
+
+from textblob._text import (
+    ABBREVIATIONS,
+    EMOTICONS,
+    PUNCTUATION,
+    RE_ABBR1,
+    RE_ABBR2,
+    RE_ABBR3,
+    RE_EMOTICONS,
+    RE_SARCASM,
+)
+from textblob.en import sentiment as pattern_sentiment
+from logger import MyLogger
+
+# Get a logger for this module
+logger = MyLogger.get_logger(__name__)
+
+# Bump whenever the scoring rules or the lexicon source change, so cached scores are invalidated.
+ENGINE_VERSION = "lexicon-1"
+
+NEGATIONS = frozenset(("no", "not", "n't", "never"))
+
+# Contractions are split from the preceding word before tokenizing ("don't" => "do n't").
+_RE_CONTRACTIONS = re.compile(r"(n't|'d|'m|'s|'ll|'re|'ve)")
+# Quotes are always split into separate tokens.
+_QUOTES = str.maketrans({q: f" {q} " for q in ("“", "”", "‘", "’", "'", '"')})
+_LEADING = tuple(PUNCTUATION.replace(".", ""))
+_TRAILING = _LEADING + (".",)
+
+
+def _build_lexicon() -> Dict[str, Tuple[float, float, bool]]:
+    """
+    Compiles TextBlob's English sentiment lexicon into a flat lookup table.
+    Each word maps to (polarity, intensity, is_modifier), using the scores averaged
+    over all parts of speech, exactly as PatternAnalyzer sees untagged text.
+    """
+    # len() forces the lazily loaded lexicon (including derived "-ly" adverbs) to load.
+    len(pattern_sentiment)
+    lexicon = {}
+    for word, senses in dict.items(pattern_sentiment):
+        polarity, _subjectivity, intensity = senses[None]
+        lexicon[word] = (polarity, intensity, "RB" in senses)
+    return lexicon
+
+
+def _build_emoticons() -> Dict[str, float]:
+    """
+    Flattens the emoticon table into {lowercased emoticon: polarity}.
+    The first matching expression wins, as in PatternAnalyzer.
+    """
+    emoticons = {}
+    for (_type, polarity), faces in EMOTICONS.items():
+        for face in faces:
+            emoticons.setdefault(face.lower(), polarity)
+    return emoticons
+
+
+def tokenize(text: str) -> list:
+    """
+    Splits text into lowercased tokens the way TextBlob's tokenizer does for sentiment:
+    contractions and quotes are split off, punctuation is separated from words
+    (keeping abbreviations such as "e.g." intact), and emoticons and sarcasm marks "(!)"
+    are kept as single tokens.
+    """
+    text = _RE_CONTRACTIONS.sub(r" \1", text).translate(_QUOTES)
+
+    tokens = []
+    append = tokens.append
+    for t in text.split():
+        while t.startswith(_LEADING):
+            append(t[0])
+            t = t[1:]
+        tail = []
+        while t.endswith(_TRAILING):
+            if t.endswith(_LEADING):
+                tail.append(t[-1])
+                t = t[:-1]
+            if t.endswith("..."):
+                tail.append("...")
+                t = t[:-3].rstrip(".")
+            if t.endswith("."):
+                if (
+                    t in ABBREVIATIONS
+                    or RE_ABBR1.match(t) is not None
+                    or RE_ABBR2.match(t) is not None
+                    or RE_ABBR3.match(t) is not None
+                ):
+                    break
+                tail.append(".")
+                t = t[:-1]
+        if t:
+            append(t)
+        if tail:
+            tokens.extend(reversed(tail))
+
+    joined = RE_SARCASM.sub("(!)", " ".join(tokens))
+    joined = RE_EMOTICONS.sub(lambda m: m.group(1).replace(" ", "") + m.group(2), joined)
+    return joined.lower().split()
+
+
+class PolarityEngine:
+    """
+    Scores text polarity from a lexicon compiled once at construction time.
+    Instances are read-only after construction and safe to share between threads.
+    """
+
+    def __init__(self):
+        self.lexicon = _build_lexicon()
+        self.emoticons = _build_emoticons()
+        logger.info("PolarityEngine - Loaded %d lexicon entries", len(self.lexicon))
+
+    def polarity(self, text: str) -> float:
+        """
+        Returns the polarity of the text, from -1.0 (most negative) to 1.0 (most positive).
+        Known words are averaged; an adverb such as "very" scales the next known word by
+        its intensity, a preceding negation halves and flips it, and "!" boosts the
+        previous assessment by 25%.
+        """
+        lexicon = self.lexicon
+        # Each assessment is [polarity, intensity, negated].
+        assessments = []
+        modifier = None  # Preceding known adverb ("really good").
+        negation = None  # Preceding negation ("not good").
+
+        for w in tokenize(text):
+            entry = lexicon.get(w)
+            if entry is not None:
+                p, i, is_modifier = entry
+                if modifier is None:
+                    assessments.append([p, i, False])
+                else:
+                    last = assessments[-1]
+                    last[0] = max(-1.0, min(p * last[1], 1.0))
+                    last[1] = i
+                if negation is not None:
+                    last = assessments[-1]
+                    last[1] = 1.0 / last[1]
+                    last[2] = True
+                modifier = w if is_modifier else None
+                negation = w if w in NEGATIONS else None
+                continue
+
+            if w in NEGATIONS:
+                negation = w
+            elif negation and len(w.strip("'")) > 1:
+                # Retain negation across small words only ("not a good").
+                negation = None
+            if negation is not None and modifier is not None and modifier.endswith("ly"):
+                # Negation after an adverb ("really not good").
+                assessments[-1][2] = True
+                negation = None
+            elif modifier and len(w) > 2:
+                # Retain modifier across small words only ("really is a good").
+                modifier = None
+            if w == "!" and assessments:
+                last = assessments[-1]
+                last[0] = max(-1.0, min(last[0] * 1.25, 1.0))
+            if w == "(!)":
+                assessments.append([0.0, 1.0, False])
+            if not w.isalpha() and len(w) <= 5 and w not in PUNCTUATION:
+                face = self.emoticons.get(w)
+                if face is not None:
+                    assessments.append([face, 1.0, False])
+
+        if not assessments:
+            return 0.0
+        # "not good" = slightly bad, "not bad" = slightly good.
+        return sum(p * -0.5 if negated else p for p, _i, negated in assessments) / len(assessments)
+
+
+_engine = None
+
+
+def get_engine() -> PolarityEngine:
+    """
+    Returns the process-wide PolarityEngine, compiling the lexicon on first use.
+    """
+    global _engine
+    if _engine is None:
+        _engine = PolarityEngine()
+    return _engine
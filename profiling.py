@@ -0,0 +1,135 @@
+"""
+Module: profiling.py
+Description: On-demand profiles of the running API, captured from live traffic.
+
+Two kinds of profile are available (GET /debug/profile):
+  - cProfile: a deterministic profile of the event-loop thread, where requests are
+    parsed, routed and serialized and the async stages run, for a number of seconds.
+    Returned as pstats text or as a binary .pstats file for snakeviz and similar tools.
+  - Stack sampling: the stacks of every thread (event loop, database, scoring and
+    background writer threads) are sampled at a fixed interval. The result is
+    wall-clock time in collapsed ("folded") form, one "frame;frame;frame count" line
+    per distinct stack, ready for flamegraph.pl or speedscope. Idle threads show up
+    waiting in their queue or selector.
+
+Only one profile runs at a time, for at most PROFILE_MAX_SECONDS seconds.
+"""
+
+import asyncio
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+from logger import MyLogger
+
+load_dotenv()
+
+# Get a logger for this module
+logger = MyLogger.get_logger(__name__)
+
+# Sort orders accepted by format_stats.
+SORT_KEYS = tuple(sorted(pstats.Stats.sort_arg_dict_default))
+
+
+class ProfilerBusy(Exception):
+    """
+    Raised when a profile is requested while another one is running.
+    """
+
+
+class Profiler:
+    """
+    Captures cProfile or stack-sampling profiles, one at a time.
+
+    Args:
+        max_seconds (float): Longest profile that may be requested.
+    """
+
+    def __init__(self, max_seconds: float):
+        self.max_seconds = max_seconds
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _claim(self):
+        if not self._lock.acquire(blocking=False):
+            raise ProfilerBusy("A profile is already being captured")
+        try:
+            yield
+        finally:
+            self._lock.release()
+
+    async def cprofile(self, seconds: float) -> cProfile.Profile:
+        """
+        Profiles the event-loop thread for `seconds` and returns the profile.
+
+        Raises:
+            ProfilerBusy: If another profile is running.
+        """
+        with self._claim():
+            logger.info("Profiler - Capturing a %.1fs cProfile", seconds)
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                await asyncio.sleep(seconds)
+            finally:
+                profile.disable()
+        return profile
+
+    def sample(self, seconds: float, interval: float) -> str:
+        """
+        Samples the stacks of all other threads every `interval` seconds for
+        `seconds` and returns them in collapsed form, most frequent first. Blocks
+        the calling thread, so run it in a worker thread.
+
+        Raises:
+            ProfilerBusy: If another profile is running.
+        """
+        with self._claim():
+            logger.info("Profiler - Sampling stacks for %.1fs every %.4fs", seconds, interval)
+            own = threading.get_ident()
+            stacks = Counter()
+            deadline = time.monotonic() + seconds
+            while time.monotonic() < deadline:
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        code = frame.f_code
+                        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                        frame = frame.f_back
+                    stack.append(names.get(ident, str(ident)))
+                    stacks[";".join(reversed(stack))] += 1
+                time.sleep(interval)
+        return "".join(f"{stack} {count}\n" for stack, count in stacks.most_common())
+
+
+def format_stats(profile: cProfile.Profile, sort: str = "cumulative", limit: int = 50) -> str:
+    """
+    Returns the pstats report of a profile: the `limit` top functions by `sort`.
+    """
+    stream = io.StringIO()
+    pstats.Stats(profile, stream=stream).sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+
+def dump_stats(profile: cProfile.Profile) -> bytes:
+    """
+    Returns a profile in the binary format of pstats.Stats.dump_stats.
+    """
+    profile.create_stats()
+    return marshal.dumps(profile.stats)
+
+
+# Shared profiler used by the API.
+profiler = Profiler(max_seconds=float(os.getenv("PROFILE_MAX_SECONDS", "60")))
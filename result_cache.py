@@ -0,0 +1,124 @@
+"""
+Module: result_cache.py
+Description: Bounded LRU cache with optional TTL for sentiment results.
+
+Entries are keyed on a hash of the whitespace-normalized review text. Case is kept,
+since it can change the score (e.g. the ":D" emoticon or "Mr." abbreviations).
+Every key also includes the scorer version, so results computed by an older scorer
+are never served after the scorer changes.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+
+def normalize_text(text: str) -> str:
+    """
+    Collapses runs of whitespace and strips the ends. This never changes the score,
+    because the tokenizer splits on whitespace anyway.
+    """
+    return " ".join(text.split())
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache of analyze_sentiment results.
+
+    Args:
+        max_size (int): Maximum number of entries; the least recently used entry is
+            evicted when full. 0 disables the cache.
+        ttl (float): Seconds an entry stays valid, or 0 for no expiry.
+        version (str): Scorer version included in every key.
+    """
+
+    def __init__(self, max_size: int, ttl: float = 0, version: str = ""):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.version = version
+        self._entries = OrderedDict()  # key -> (expires_at, result)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def key(self, text: str) -> str:
+        """
+        Returns the cache key for the given text under the current scorer version.
+        """
+        data = f"{self.version}\0{normalize_text(text)}".encode("utf-8")
+        return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+    def get(self, text: str) -> Optional[dict]:
+        """
+        Returns a copy of the cached result for the text, or None on a miss.
+        """
+        if self.max_size <= 0:
+            return None
+        key = self.key(text)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, result = entry
+            if expires_at and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return dict(result)
+
+    def put(self, text: str, result: dict):
+        """
+        Stores a result for the text, evicting the least recently used entries if full.
+        """
+        if self.max_size <= 0:
+            return
+        key = self.key(text)
+        expires_at = time.monotonic() + self.ttl if self.ttl > 0 else 0
+        with self._lock:
+            self._entries[key] = (expires_at, dict(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def set_version(self, version: str):
+        """
+        Switches the scorer version and drops every entry computed by the old one.
+        """
+        with self._lock:
+            if version != self.version:
+                self.version = version
+                self._entries.clear()
+
+    def clear(self):
+        """
+        Drops all entries. Counters are kept.
+        """
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """
+        Returns the cache configuration, size and hit/miss/eviction counters.
+        """
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "version": self.version,
+                "max_size": self.max_size,
+                "ttl": self.ttl,
+                "size": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,247 @@
+"""
+Module: scoring_executor.py
+Description: Runs CPU-bound sentiment scoring off the event loop.
+
+SCORING_MODE selects where scoring runs:
+  - "inline": on the event loop thread. The lexicon engine scores a typical review in
+    tens of microseconds, often less than a round trip to a worker, but a long text
+    stalls every other request on the loop.
+  - "thread" (default on a single CPU): in a thread pool. Keeps the loop responsive
+    for long texts, but shares the GIL.
+  - "process" (default with more than one CPU): in a pool of SCORING_WORKERS processes,
+    so scoring uses every core. Each worker compiles the lexicon once when it starts.
+
+In thread and process mode, single-review requests arriving within SCORING_BATCH_WINDOW
+seconds of each other are grouped (up to SCORING_MAX_BATCH reviews) into one call to a
+worker. At most SCORING_MAX_IN_FLIGHT scoring calls are outstanding at once; further
+requests wait for a slot. The result cache is consulted in the API process, so only
+cache misses are sent to workers, and concurrent misses for the same normalized text
+are scored once.
+"""
+
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+import monitoring
+from logger import MyLogger
+from sentiment_analysis import result_cache, score_texts
+from single_flight import SingleFlight
+
+load_dotenv()
+
+# Get a logger for this module
+logger = MyLogger.get_logger(__name__)
+
+SCORING_MODES = ("inline", "thread", "process")
+
+# Scoring leaves the event loop by default: in processes when there are cores to spread it over.
+DEFAULT_SCORING_MODE = "process" if (os.cpu_count() or 1) > 1 else "thread"
+
+
+def _warm_up() -> int:
+    """
+    Runs in each worker on start: scores one text so the lexicon is compiled
+    and the scoring code paths are loaded before real requests arrive.
+    """
+    score_texts(["warm up"])
+    return os.getpid()
+
+
+class ScoringExecutor:
+    """
+    Scores review texts inline, in a thread pool or in a process pool.
+
+    Args:
+        mode (str): "inline", "thread" or "process".
+        workers (int): Pool size for thread and process mode.
+        max_in_flight (int): Maximum concurrent scoring calls to the pool.
+        batch_window (float): Seconds to wait for more single-review requests to group
+            into one call. 0 disables micro-batching.
+        max_batch (int): Maximum number of reviews grouped into one call.
+    """
+
+    def __init__(self, mode: str, workers: int, max_in_flight: int,
+                 batch_window: float, max_batch: int):
+        if mode not in SCORING_MODES:
+            raise ValueError(f"Unknown scoring mode: {mode}")
+        self.mode = mode
+        self.workers = workers
+        self.max_in_flight = max_in_flight
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self._pool = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pending: Optional[asyncio.Queue] = None
+        self._batcher: Optional[asyncio.Task] = None
+        self._flights = SingleFlight()
+        self.in_flight = 0
+
+    @property
+    def micro_batching(self) -> bool:
+        return self._pending is not None
+
+    async def start(self):
+        """
+        Creates the worker pool and waits until every worker is warmed up.
+        """
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        if self.mode == "inline":
+            logger.info("ScoringExecutor started in inline mode")
+            return
+
+        if self.mode == "thread":
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="scoring")
+        else:
+            # "spawn" keeps the API process's threads (logging, metrics sink) out of the workers.
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_warm_up
+            )
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self._pool, _warm_up) for _ in range(self.workers)))
+
+        if self.batch_window > 0:
+            self._pending = asyncio.Queue()
+            self._batcher = asyncio.create_task(self._collect())
+        logger.info(
+            "ScoringExecutor started: mode=%s, workers=%s, max_in_flight=%s, batch_window=%ss, max_batch=%s",
+            self.mode, self.workers, self.max_in_flight, self.batch_window, self.max_batch
+        )
+
+    async def stop(self):
+        """
+        Scores every pending request, then shuts the worker pool down.
+        """
+        if self._batcher is not None:
+            await self._pending.put(None)
+            await self._batcher
+            self._batcher = None
+            self._pending = None
+        if self._pool is not None:
+            await asyncio.to_thread(self._pool.shutdown)
+            self._pool = None
+        logger.info("ScoringExecutor stopped")
+
+    async def score(self, text: str) -> dict:
+        """
+        Scores one text. Returns the same dictionary as analyze_sentiment and
+        raises ValueError if the text could not be scored.
+        """
+        cached = result_cache.get(text)
+        if cached is not None:
+            return cached
+
+        result, _shared = await self._flights.run(result_cache.key(text), lambda: self._score_one(text))
+        if result["sentiment"] is None:
+            raise ValueError(result["error"])
+        return dict(result)
+
+    @property
+    def coalesced(self) -> int:
+        """
+        Number of score() calls that reused a concurrent call's result for the same text.
+        """
+        return self._flights.coalesced
+
+    async def _score_one(self, text: str) -> dict:
+        if self.micro_batching:
+            future = asyncio.get_running_loop().create_future()
+            await self._pending.put((text, future))
+            result = await future
+        else:
+            result = (await self._score_uncached([text]))[0]
+        if result["sentiment"] is not None:
+            result_cache.put(text, result)
+        return result
+
+    async def score_batch(self, texts: List[str]) -> List[dict]:
+        """
+        Scores many texts in one call. Returns the same list as analyze_sentiment_batch.
+        """
+        results = [result_cache.get(text) for text in texts]
+        misses = [i for i, result in enumerate(results) if result is None]
+        if misses:
+            scored = await self._score_uncached([texts[i] for i in misses])
+            for i, result in zip(misses, scored):
+                results[i] = result
+                if result["sentiment"] is not None:
+                    result_cache.put(texts[i], result)
+        return results
+
+    async def _score_uncached(self, texts: List[str]) -> List[dict]:
+        # Timed here rather than in score_texts: in process mode it runs in a worker,
+        # whose metrics never reach the API's /metrics.
+        if self._slots is None:
+            # Not started (e.g. the app runs without its startup hook): score inline.
+            with monitoring.stage("score_texts"):
+                return score_texts(texts)
+        async with self._slots:
+            self.in_flight += 1
+            try:
+                with monitoring.stage("score_texts"):
+                    if self._pool is None:
+                        return score_texts(texts)
+                    return await asyncio.get_running_loop().run_in_executor(self._pool, score_texts, texts)
+            finally:
+                self.in_flight -= 1
+
+    async def _collect(self):
+        loop = asyncio.get_running_loop()
+        dispatches = set()
+        stopping = False
+        while not stopping:
+            item = await self._pending.get()
+            if item is None:
+                break
+            group = [item]
+            deadline = loop.time() + self.batch_window
+            while len(group) < self.max_batch:
+                try:
+                    item = self._pending.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._pending.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                group.append(item)
+
+            task = asyncio.create_task(self._dispatch(group))
+            dispatches.add(task)
+            task.add_done_callback(dispatches.discard)
+
+        if dispatches:
+            await asyncio.gather(*dispatches)
+
+    async def _dispatch(self, group):
+        try:
+            results = await self._score_uncached([text for text, _future in group])
+        except Exception as e:
+            for _text, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_text, future), result in zip(group, results):
+            if not future.done():
+                future.set_result(result)
+
+
+# Shared executor used by the API.
+scoring_executor = ScoringExecutor(
+    mode=(os.getenv("SCORING_MODE") or DEFAULT_SCORING_MODE).lower(),
+    workers=int(os.getenv("SCORING_WORKERS", str(os.cpu_count() or 1))),
+    max_in_flight=int(os.getenv("SCORING_MAX_IN_FLIGHT", "64")),
+    batch_window=float(os.getenv("SCORING_BATCH_WINDOW", "0.002")),
+    max_batch=int(os.getenv("SCORING_MAX_BATCH", "64"))
+)
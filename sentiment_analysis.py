@@ -1,18 +1,69 @@
 """
 Module: sentiment_analysis.py
-Description: Provides functions to analyze text sentiment using TextBlob
+Description: Provides functions to analyze text sentiment using TextBlob's lexicon.
+
+Scoring uses the precompiled lexicon engine in polarity_engine.py by default.
+Set SENTIMENT_ENGINE=textblob to score with TextBlob's PatternAnalyzer instead.
 """
 
-from textblob import TextBlob
+import os
+from typing import List
+from dotenv import load_dotenv
+from textblob.sentiments import PatternAnalyzer
 from logger import MyLogger
+from polarity_engine import ENGINE_VERSION, get_engine
+from result_cache import ResultCache
+
+load_dotenv()
 
 # Get a logger for this module
 logger = MyLogger.get_logger(__name__)
 
+# Which scorer computes polarity: "lexicon" (precompiled engine) or "textblob".
+SENTIMENT_ENGINE = os.getenv("SENTIMENT_ENGINE", "lexicon").lower()
+
+if SENTIMENT_ENGINE == "textblob":
+    _polarity = PatternAnalyzer().analyze
+    SCORER_VERSION = "textblob-pattern"
+
+    def polarity(text: str) -> float:
+        """Returns the TextBlob PatternAnalyzer polarity of the text."""
+        return _polarity(text).polarity
+else:
+    polarity = get_engine().polarity
+    SCORER_VERSION = ENGINE_VERSION
+
+# Result cache in front of the scorer. SENTIMENT_CACHE_SIZE=0 disables it;
+# SENTIMENT_CACHE_TTL is in seconds, 0 meaning entries never expire.
+result_cache = ResultCache(
+    max_size=int(os.getenv("SENTIMENT_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("SENTIMENT_CACHE_TTL", "0")),
+    version=SCORER_VERSION
+)
+
+
+def _classify(polarity: float) -> dict:
+    """
+    Maps a polarity score (-1.0 to 1.0) to the sentiment label and confidence
+    returned by analyze_sentiment.
+    """
+    if polarity > 0:
+        sentiment_label = "positive"
+    elif polarity < 0:
+        sentiment_label = "negative"
+    else:
+        sentiment_label = "neutral"
+
+    return {
+        "sentiment": sentiment_label,
+        "confidence": round(abs(polarity), 2)  # Round to 2 decimals for readability
+    }
+
 
 def analyze_sentiment(text: str) -> dict:
     """
-    Analyze the sentiment of the given text using TextBlob for sentiment scoring.
+    Analyze the sentiment of the given text using the configured polarity scorer.
+    Results are served from result_cache when the same text was scored before.
 
     Args:
         text (str): The input text for sentiment analysis.
@@ -29,29 +80,69 @@ def analyze_sentiment(text: str) -> dict:
             "confidence": 0.5
         }
     """
+    cached = result_cache.get(text)
+    if cached is not None:
+        logger.info("analyze_sentiment - Cache hit, text length: %d", len(text))
+        return cached
 
-    # Use TextBlob for a simple sentiment polarity score.
-    blob = TextBlob(text)
-    polarity = blob.sentiment.polarity  # Range: -1.0 (most negative) to 1.0 (most positive)
-
-    # Classify sentiment based on polarity.
-    if polarity > 0:
-        sentiment_label = "positive"
-    elif polarity < 0:
-        sentiment_label = "negative"
-    else:
-        sentiment_label = "neutral"
+    # Simple sentiment polarity score.
+    score = polarity(text)  # Range: -1.0 (most negative) to 1.0 (most positive)
 
-    # Use the absolute polarity value as a naive confidence measure.
-    confidence_score = abs(polarity)
+    # Classify sentiment based on polarity; the absolute polarity is a naive confidence measure.
+    result = _classify(score)
 
     logger.info(
-        f"analyze_sentiment - Text length: {len(text)}, "
-        f"Polarity: {polarity}, Sentiment: {sentiment_label}, Confidence: {confidence_score}"
+        "analyze_sentiment - Text length: %d, Polarity: %s, Sentiment: %s, Confidence: %s",
+        len(text), score, result["sentiment"], result["confidence"]
     )
 
-    return {
-        "sentiment": sentiment_label,
-        "confidence": round(confidence_score, 2)  # Round to 2 decimals for readability
-    }
+    result_cache.put(text, result)
+    return result
+
+
+def score_texts(texts: List[str]) -> List[dict]:
+    """
+    Scores texts without consulting the result cache or logging.
+    Runs in scoring worker processes, where the cache of the API process is not visible.
+
+    Returns:
+        List[dict]: One result per text, in the same format as analyze_sentiment_batch.
+    """
+    results = []
+    for text in texts:
+        try:
+            results.append(_classify(polarity(text)))
+        except Exception as e:
+            results.append({"sentiment": None, "confidence": None, "error": str(e)})
+    return results
+
+
+def analyze_sentiment_batch(texts: List[str]) -> List[dict]:
+    """
+    Analyze the sentiment of many texts in one call.
+
+    Scores every text with the same scorer as analyze_sentiment, but logs once
+    per batch instead of once per text.
+    A failure on one text does not abort the batch.
+
+    Args:
+        texts (List[str]): The input texts for sentiment analysis.
+
+    Returns:
+        List[dict]: One dictionary per input text, in the same order. Successful
+              items have 'sentiment' and 'confidence' as in analyze_sentiment;
+              failed items have 'sentiment' and 'confidence' set to None and an
+              'error' message.
+    """
+    results = [result_cache.get(text) for text in texts]
+    misses = [i for i, result in enumerate(results) if result is None]
+    if misses:
+        for i, result in zip(misses, score_texts([texts[i] for i in misses])):
+            results[i] = result
+            if result["sentiment"] is not None:
+                result_cache.put(texts[i], result)
+
+    failed = sum(1 for result in results if result["sentiment"] is None)
+    logger.info("analyze_sentiment_batch - Scored %d texts, failed=%d", len(texts), failed)
 
+    return results
@@ -0,0 +1,58 @@
+"""
+Module: single_flight.py
+Description: Coalesces concurrent calls for the same key into one execution.
+
+While a call for a key is running, further calls for that key do not start their own
+work; they wait for the running call and receive its result (or its exception).
+Nothing is kept after the call finishes, so this only absorbs concurrent duplicates,
+such as client retries that arrive while the original request is still being processed.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """
+    Per-key deduplication of concurrent async calls, for use on one event loop.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def run(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Runs fn() unless a call for key is already running, in which case its
+        result is awaited instead.
+
+        Returns:
+            tuple: (result, shared), where shared is True if the result came from
+                another caller's execution.
+        """
+        future = self._calls.get(key)
+        if future is not None:
+            self.coalesced += 1
+            # shield: a cancelled waiter must not cancel the shared execution.
+            return await asyncio.shield(future), True
+
+        future = asyncio.get_running_loop().create_future()
+        self._calls[key] = future
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Retrieve the exception so it is not reported as unhandled when nobody waited.
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            del self._calls[key]
@@ -0,0 +1,51 @@
+"""
+Module: tests/conftest.py
+Description: Shared setup and fixtures of the test suite.
+
+Like the benchmarks, the tests run in a scratch directory with DB_FILE pointing at a
+scratch database, so the real sentiment_analysis.db, logs/ and metrics/ are never
+touched. pytest_configure runs before any test module imports the application modules.
+"""
+
+import os
+import tempfile
+
+import pytest
+
+
+def pytest_configure(config):
+    workdir = tempfile.mkdtemp(prefix="review-tests-")
+    os.environ["DB_FILE"] = os.path.join(workdir, "tests.db")
+    # Each started TestClient would otherwise spawn a process pool on multi-core machines.
+    os.environ["SCORING_MODE"] = "thread"
+    os.chdir(workdir)
+
+
+@pytest.fixture
+def fresh_db(tmp_path, monkeypatch):
+    """
+    Points my_db at a new, empty database file for one test and returns its
+    ConnectionManager. The database is not created; call my_db.create_database().
+    """
+    import my_db
+
+    manager = my_db.ConnectionManager(str(tmp_path / "reviews.db"))
+    monkeypatch.setattr(my_db, "db", manager)
+    monkeypatch.setattr(my_db, "_known_partitions", set())
+    yield manager
+    manager.close()
+
+
+@pytest.fixture
+def client(fresh_db):
+    """
+    Returns a started TestClient of the API on the fresh_db database, with an
+    empty result cache and a valid Authorization header.
+    """
+    from fastapi.testclient import TestClient
+    import fastapi_app
+
+    fastapi_app.result_cache.clear()
+    headers = {"Authorization": f"Bearer {fastapi_app.SECRET_KEY}"}
+    with TestClient(fastapi_app.app, headers=headers) as test_client:
+        yield test_client
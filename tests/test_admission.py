@@ -0,0 +1,95 @@
+"""
+Module: tests/test_admission.py
+Description: Rate limiting and overload shedding of admission.py.
+"""
+
+import asyncio
+
+import pytest
+
+from admission import HIGH, LOW, AdmissionController, ConcurrencyLimiter, Overloaded, RateLimited
+
+
+def _controller(keys=("user", "token"), burst=5) -> AdmissionController:
+    # Buckets barely refill, so the counts below are exact.
+    return AdmissionController(rate_limit_keys=keys, rate=0.001, burst=burst, max_keys=100,
+                               max_concurrency=0, queue_target=0.25, max_waiting=100)
+
+
+def test_batch_costs_one_token_per_review():
+    controller = _controller()
+    controller.check_rate(token="t", user_costs={"alice": 3, "bob": 1})
+
+    with pytest.raises(RateLimited) as raised:
+        controller.check_rate(token="t", user_costs={"carol": 2})
+    assert raised.value.key_type == "token"
+    controller.check_rate(token="other", user_costs={"alice": 2})
+    with pytest.raises(RateLimited) as raised:
+        controller.check_rate(user_id="alice", token="other")
+    assert raised.value.key_type == "user"
+
+
+def test_rejected_batch_takes_no_tokens():
+    controller = _controller(keys=("user",))
+    controller.check_rate(user_costs={"alice": 5})
+    with pytest.raises(RateLimited):
+        controller.check_rate(user_costs={"bob": 2, "alice": 1})
+    # bob was not charged for the rejected batch.
+    controller.check_rate(user_costs={"bob": 5})
+
+
+def test_batch_above_burst_goes_into_debt():
+    controller = _controller(keys=("user",))
+    controller.check_rate(user_costs={"alice": 50})
+    with pytest.raises(RateLimited) as raised:
+        controller.check_rate(user_id="alice")
+    # 46 tokens short at 0.001 tokens per second.
+    assert raised.value.retry_after == 46000
+
+
+def test_slow_low_priority_work_does_not_shed_high_priority():
+    async def scenario():
+        limiter = ConcurrencyLimiter(max_concurrency=1, queue_target=1.0, max_waiting=10)
+        for priority, service_time in ((HIGH, 0.01), (LOW, 10.0)):
+            await limiter.acquire(priority)
+            limiter.release(priority, service_time)
+
+        await limiter.acquire(HIGH)
+        with pytest.raises(Overloaded) as raised:
+            await limiter.acquire(LOW)
+        assert raised.value.reason == "expected_wait"
+
+        waiting = asyncio.create_task(limiter.acquire(HIGH))
+        await asyncio.sleep(0)
+        assert limiter.waiting() == 1
+        limiter.release(HIGH, 0.01)
+        await waiting
+        assert limiter.in_flight == 1 and limiter.waiting() == 0
+
+    asyncio.run(scenario())
+
+
+def test_waiter_is_shed_after_its_share_of_the_target():
+    async def scenario():
+        limiter = ConcurrencyLimiter(max_concurrency=1, queue_target=0.2, max_waiting=10)
+        await limiter.acquire(HIGH)
+        with pytest.raises(Overloaded) as raised:
+            await limiter.acquire(LOW)
+        assert raised.value.reason == "wait_timeout"
+        assert limiter.waiting() == 0
+
+    asyncio.run(scenario())
+
+
+def test_rate_limited_review_gets_429_with_retry_after(client, monkeypatch):
+    import fastapi_app
+
+    monkeypatch.setattr(fastapi_app, "admission", _controller(keys=("user",), burst=1))
+    body = {"request_id": "rl-1", "user_id": "alice", "data": {"review_text": "Good value"}}
+
+    assert client.post("/reviews", json=body).status_code == 200
+    response = client.post("/reviews", json={**body, "request_id": "rl-2"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+    # Other users have their own bucket.
+    assert client.post("/reviews", json={**body, "request_id": "rl-3", "user_id": "bob"}).status_code == 200
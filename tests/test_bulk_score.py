@@ -0,0 +1,101 @@
+"""
+Module: tests/test_bulk_score.py
+Description: The bulk scoring CLI: JSONL and CSV input, malformed records and resuming from a checkpoint.
+"""
+
+import json
+
+import pytest
+
+import bulk_score
+import my_db
+
+
+def _stored(manager) -> dict:
+    with manager.reader() as conn:
+        return {row[0]: row[1:] for row in conn.execute(
+            "SELECT request_id, user_id, review_text, sentiment FROM reviews")}
+
+
+def _write_jsonl(path, records):
+    path.write_text("".join(json.dumps(record) + "\n" for record in records), encoding="utf-8")
+
+
+def test_jsonl_records_are_scored_and_stored(fresh_db, tmp_path, capsys):
+    source = tmp_path / "reviews.jsonl"
+    source.write_text(
+        json.dumps({"request_id": "j-1", "user_id": "u1", "data": {"review_text": "This product is great"}}) + "\n"
+        + "\n"
+        + "{not json\n"
+        + json.dumps({"review_text": "Terrible battery"}) + "\n",
+        encoding="utf-8")
+
+    assert bulk_score.main([str(source), "--workers", "0"]) == 0
+
+    stored = _stored(fresh_db)
+    assert stored["j-1"] == ("u1", "This product is great", "positive")
+    # The flat record gets an id from the file name and its end offset, and the default user.
+    [derived] = [request_id for request_id in stored if request_id != "j-1"]
+    assert derived.startswith("reviews.jsonl:")
+    assert stored[derived] == ("bulk", "Terrible battery", "negative")
+    assert "2 total, 1 skipped" in capsys.readouterr().out
+
+
+def test_csv_rows_use_the_header(fresh_db, tmp_path):
+    source = tmp_path / "reviews.csv"
+    source.write_text('user_id,review_text,request_id\nu2,"Awful, broke at once",c-1\nu3,It arrived on Tuesday,c-2\n',
+                      encoding="utf-8")
+
+    assert bulk_score.main([str(source), "--workers", "1", "--chunk-size", "1"]) == 0
+
+    assert _stored(fresh_db) == {
+        "c-1": ("u2", "Awful, broke at once", "negative"),
+        "c-2": ("u3", "It arrived on Tuesday", "neutral"),
+    }
+
+
+def test_interrupted_run_resumes_from_the_checkpoint(fresh_db, tmp_path, monkeypatch):
+    source = tmp_path / "reviews.jsonl"
+    _write_jsonl(source, [{"request_id": f"r-{i}", "user_id": "u1", "review_text": f"Good value {i}"}
+                          for i in range(10)])
+    insert_feedback_batch = my_db.insert_feedback_batch
+    batches = []
+
+    def interrupted_insert(rows):
+        if len(batches) == 2:
+            raise KeyboardInterrupt
+        batches.append([row[0] for row in rows])
+        return insert_feedback_batch(rows)
+
+    monkeypatch.setattr(my_db, "insert_feedback_batch", interrupted_insert)
+    args = [str(source), "--workers", "0", "--chunk-size", "2", "--commit-size", "3"]
+    assert bulk_score.main(args) == 130
+
+    checkpoint = json.loads((tmp_path / "reviews.jsonl.checkpoint").read_text(encoding="utf-8"))
+    assert checkpoint["rows"] == 8 and len(_stored(fresh_db)) == 8
+
+    monkeypatch.setattr(my_db, "insert_feedback_batch", insert_feedback_batch)
+    assert bulk_score.main(args) == 0
+
+    assert sorted(_stored(fresh_db)) == sorted(f"r-{i}" for i in range(10))
+    checkpoint = json.loads((tmp_path / "reviews.jsonl.checkpoint").read_text(encoding="utf-8"))
+    assert (checkpoint["rows"], checkpoint["duplicates"]) == (10, 0)
+
+
+def test_restart_skips_rows_already_stored(fresh_db, tmp_path, capsys):
+    source = tmp_path / "reviews.jsonl"
+    _write_jsonl(source, [{"request_id": "d-1", "user_id": "u1", "review_text": "Good value"}])
+
+    assert bulk_score.main([str(source), "--workers", "0"]) == 0
+    assert bulk_score.main([str(source), "--workers", "0", "--restart"]) == 0
+
+    assert len(_stored(fresh_db)) == 1
+    assert "0 rows loaded" in capsys.readouterr().out.splitlines()[-1]
+
+
+def test_checkpoint_of_another_input_is_refused(tmp_path):
+    checkpoint = tmp_path / "shared.checkpoint"
+    bulk_score.save_checkpoint(str(checkpoint), {"input": "a.jsonl", "offset": 10})
+
+    with pytest.raises(ValueError, match="belongs to a.jsonl"):
+        bulk_score.load_checkpoint(str(checkpoint), "b.jsonl")
@@ -0,0 +1,117 @@
+"""
+Module: tests/test_connections.py
+Description: The ConnectionManager: WAL pragmas, the writer transaction and the reader pool.
+"""
+
+import sqlite3
+import threading
+
+import pytest
+
+import my_db
+
+
+def _manager(tmp_path, **kwargs) -> my_db.ConnectionManager:
+    return my_db.ConnectionManager(str(tmp_path / "pool.db"), **kwargs)
+
+
+def test_connections_use_wal_and_the_configured_pragmas(tmp_path):
+    manager = _manager(tmp_path, synchronous="full", cache_size=-1024)
+    with manager.reader() as conn:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 2
+        assert conn.execute("PRAGMA cache_size").fetchone()[0] == -1024
+    manager.close()
+
+
+def test_writer_commits_or_rolls_back(tmp_path):
+    manager = _manager(tmp_path)
+    with manager.writer() as conn:
+        conn.execute("CREATE TABLE t (x INTEGER)")
+    with pytest.raises(RuntimeError):
+        with manager.writer() as conn:
+            conn.execute("INSERT INTO t VALUES (1)")
+            raise RuntimeError("abort")
+    with manager.writer() as conn:
+        conn.execute("INSERT INTO t VALUES (2)")
+
+    with manager.reader() as conn:
+        assert conn.execute("SELECT x FROM t").fetchall() == [(2,)]
+    manager.close()
+
+
+def test_most_recently_released_reader_is_reused(tmp_path):
+    manager = _manager(tmp_path, read_pool_size=4)
+    with manager.reader() as first:
+        with manager.reader() as second:
+            pass
+    with manager.reader() as conn:
+        assert conn is first
+        with manager.reader() as other:
+            assert other is second
+    assert manager._readers_created == 2
+    manager.close()
+
+
+def test_exhausted_pool_waits_for_a_released_reader(tmp_path):
+    manager = _manager(tmp_path, read_pool_size=1)
+    got = []
+
+    def read():
+        with manager.reader() as conn:
+            got.append(conn)
+
+    with manager.reader() as held:
+        waiter = threading.Thread(target=read)
+        waiter.start()
+        waiter.join(0.2)
+        assert waiter.is_alive() and got == []
+    waiter.join(5)
+
+    assert got == [held]
+    assert manager._readers_created == 1
+    manager.close()
+
+
+def test_failed_connect_does_not_use_up_the_pool(tmp_path, monkeypatch):
+    manager = _manager(tmp_path, read_pool_size=1)
+    connect = manager._connect
+
+    def fail():
+        raise sqlite3.OperationalError("unable to open database file")
+
+    monkeypatch.setattr(manager, "_connect", fail)
+    with pytest.raises(sqlite3.OperationalError):
+        with manager.reader():
+            pass
+    assert manager._readers_created == 0
+
+    monkeypatch.setattr(manager, "_connect", connect)
+    with manager.reader() as conn:
+        assert conn.execute("SELECT 1").fetchone() == (1,)
+    manager.close()
+
+
+def test_close_connections_closes_idle_readers_and_keeps_busy_ones(tmp_path, monkeypatch):
+    manager = _manager(tmp_path, read_pool_size=2)
+    monkeypatch.setattr(my_db, "db", manager)
+    with manager.writer():
+        pass
+
+    with manager.reader() as busy:
+        with manager.reader() as idle:
+            pass
+        my_db.close_connections()
+        with pytest.raises(sqlite3.ProgrammingError):
+            idle.execute("SELECT 1")
+        assert manager._writer is None
+        assert manager._readers_created == 1
+        assert busy.execute("SELECT 1").fetchone() == (1,)
+
+    # The busy reader went back to the pool and is reused; the pool can grow again.
+    with manager.reader() as conn:
+        assert conn is busy
+        with manager.reader() as other:
+            assert other is not busy
+    assert manager._readers_created == 2
+    manager.close()
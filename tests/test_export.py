@@ -0,0 +1,108 @@
+"""
+Module: tests/test_export.py
+Description: GET /export: streamed NDJSON/CSV exports and the release of their database connection.
+"""
+
+import asyncio
+import sqlite3
+
+import orjson
+
+import fastapi_app
+import my_db
+
+ROWS = [
+    ("e-1", "alice", "first", "positive", 0.5, "2031-01-10 08:00:00"),
+    ("e-2", "bob", "second, with a comma", "negative", 0.25, "2031-02-20 08:00:00"),
+]
+
+
+def _store(manager, rows=ROWS):
+    with manager.writer() as conn:
+        my_db._insert_partitioned(conn, [(None,) + row for row in rows])
+
+
+def _track_connections(manager, monkeypatch) -> list:
+    opened = []
+    connect = manager._connect
+
+    def tracking_connect():
+        conn = connect()
+        opened.append(conn)
+        return conn
+
+    monkeypatch.setattr(manager, "_connect", tracking_connect)
+    return opened
+
+
+def _is_closed(conn) -> bool:
+    try:
+        conn.execute("SELECT 1")
+    except sqlite3.ProgrammingError:
+        return True
+    return False
+
+
+def test_ndjson_and_csv_exports(client, fresh_db):
+    _store(fresh_db)
+
+    response = client.get("/export", params={"format": "ndjson", "columns": "request_id,review_text"})
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    assert [orjson.loads(line) for line in response.text.splitlines()] == [
+        {"request_id": "e-1", "review_text": "first"},
+        {"request_id": "e-2", "review_text": "second, with a comma"},
+    ]
+
+    response = client.get("/export", params={"format": "csv", "columns": "request_id,review_text"})
+    assert response.text.splitlines() == ["request_id,review_text", "e-1,first", 'e-2,"second, with a comma"']
+
+
+def test_unknown_format_or_column_is_rejected(client):
+    assert client.get("/export", params={"format": "xml"}).status_code == 400
+    assert client.get("/export", params={"columns": "password"}).status_code == 400
+
+
+def test_finished_export_closes_its_connection(client, fresh_db, monkeypatch):
+    _store(fresh_db)
+    opened = _track_connections(fresh_db, monkeypatch)
+
+    assert client.get("/export").status_code == 200
+    assert len(opened) == 1 and _is_closed(opened[0])
+
+
+def test_cancelled_export_closes_its_connection(fresh_db, monkeypatch):
+    my_db.create_database()
+    # Enough rows for several chunks, so the stream is cut short mid-way.
+    _store(fresh_db, [(f"c-{i}", "alice", "text", "neutral", 0.0, "2031-01-10 08:00:00")
+                      for i in range(3000)])
+    opened = _track_connections(fresh_db, monkeypatch)
+
+    async def scenario():
+        disconnected = asyncio.Event()
+        bodies = []
+
+        async def receive():
+            await disconnected.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            if message["type"] == "http.response.body" and message.get("body"):
+                bodies.append(message["body"])
+                disconnected.set()
+
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+            "method": "GET", "scheme": "http", "path": "/export", "raw_path": b"/export",
+            "root_path": "", "query_string": b"format=ndjson",
+            "headers": [(b"authorization", f"Bearer {fastapi_app.SECRET_KEY}".encode())],
+            "client": ("testclient", 50000), "server": ("testserver", 80),
+        }
+        await fastapi_app.app(scope, receive, send)
+        # Checked before the event loop gets a chance to finalize abandoned generators.
+        return bodies, [_is_closed(conn) for conn in opened]
+
+    bodies, closed = asyncio.run(scenario())
+
+    assert 0 < len(bodies) < 3000
+    assert closed == [True]
+
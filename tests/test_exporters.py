@@ -0,0 +1,64 @@
+"""
+Module: tests/test_exporters.py
+Description: The orjson encoders produce the JSON the stdlib encoders produced before them.
+"""
+
+import json
+from datetime import datetime, timezone
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse
+
+from exporters import columns_json, ndjson_lines, rows_json
+
+COLUMNS = ("id", "request_id", "review_text", "confidence", "created_at", "error_message")
+ROWS = [
+    (1, "x-1", "Great value", 0.5, "2031-01-10 08:00:00", None),
+    (2, "x-2", "Déçu 😞, \"quoted\" and <tags>\n", 0.3333333333333333, "2031-01-10 08:00:01", None),
+    (3, "x-3", "", 0.1 + 0.2, datetime(2031, 1, 10, 8, 0, 2, 500), "failed"),
+    (4, "x-4", "aware", 0.0001, datetime(2031, 1, 10, 8, 0, 3, tzinfo=timezone.utc), None),
+    (5, "x-5", "integral", 1.0, datetime(2031, 1, 10, 8, 0, 4), None),
+]
+
+
+def _stdlib_page(columns, rows) -> bytes:
+    # A list of row objects as FastAPI rendered it before: jsonable_encoder, then JSONResponse.
+    return JSONResponse(jsonable_encoder([dict(zip(columns, row)) for row in rows])).body
+
+
+def test_pages_match_the_stdlib_encoding_byte_for_byte():
+    assert rows_json(COLUMNS, ROWS) == _stdlib_page(COLUMNS, ROWS)
+    assert rows_json(COLUMNS, []) == _stdlib_page(COLUMNS, []) == b"[]"
+
+    encoded = [jsonable_encoder(list(values)) for values in zip(*ROWS)]
+    assert columns_json(COLUMNS, ROWS) == json.dumps(
+        dict(zip(COLUMNS, encoded)), ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def test_ndjson_lines_decode_to_the_stdlib_objects():
+    lines = b"".join(ndjson_lines(list(COLUMNS), [ROWS[:2], ROWS[2:]])).decode().splitlines()
+
+    # The stdlib wrote the same objects with spaces after separators.
+    assert [json.loads(line) for line in lines] == \
+        [json.loads(json.dumps(row, ensure_ascii=False)) for row in jsonable_encoder(
+            [dict(zip(COLUMNS, row)) for row in ROWS])]
+
+
+def test_review_response_matches_the_stdlib_encoding():
+    body = {"status_code": 200, "success": True, "message": "completed", "data": {
+        "request_id": "r-1", "user_id": "u-1", "status": "COMPLETED", "error_message": None,
+        "sentiment": "positive", "confidence": 87}}
+
+    assert ORJSONResponse(body).body == JSONResponse(body).body
+
+
+def test_floats_keep_their_shortest_repr():
+    # Confidences and means lie well inside [1e-4, 1e16), where both write repr(float).
+    values = [(v,) for v in (0.0, 0.25, 0.1 + 0.2, 2 / 3, 0.0125, 0.0001, 0.9999, 123.456)]
+    assert rows_json(("v",), values) == _stdlib_page(("v",), values)
+
+    # Outside it orjson drops the exponent padding ("1e-05" -> "0.00001", "1e+16" -> "1e16"),
+    # which parses to the same float.
+    extremes = [1e-05, 2.5e-07, 1e16, 1.2345678901234568e+17]
+    assert json.loads(rows_json(("v",), [(v,) for v in extremes])) == [{"v": v} for v in extremes]
+
@@ -0,0 +1,121 @@
+"""
+Module: tests/test_history.py
+Description: Keyset-paginated history pages (POST /data_db and /data_all_db), their time
+filters and the row and column formats chosen by the Accept header.
+"""
+
+import fastapi_app
+import my_db
+from exporters import PAGE_MEDIA_TYPES
+
+COLUMNS = PAGE_MEDIA_TYPES["columns"]
+
+# Reviews across two monthly partitions; two share a created_at, so the id breaks the tie.
+ROWS = [
+    ("h-1", "alice", "first", "positive", 0.5, "2031-01-10 08:00:00"),
+    ("h-2", "bob", "second", "negative", 0.25, "2031-01-20 08:00:00"),
+    ("h-3", "alice", "third", "neutral", 0.0, "2031-01-20 08:00:00"),
+    ("h-4", "alice", "fourth", "positive", 0.75, "2031-02-02 09:30:00"),
+    ("h-5", "bob", "fifth", "positive", 1.0, "2031-02-15 12:00:00"),
+]
+
+
+def _store(manager):
+    with manager.writer() as conn:
+        my_db._insert_partitioned(conn, [(None,) + row for row in ROWS])
+
+
+def _all_pages(client, path: str, body: dict) -> list:
+    request_ids, after = [], None
+    while True:
+        response = client.post(path, json={**body, "after": after})
+        assert response.status_code == 200
+        request_ids.append([row["request_id"] for row in response.json()])
+        after = response.headers.get("X-Next-Cursor")
+        if after is None:
+            return request_ids
+
+
+def test_pages_follow_the_cursor_in_time_order(client, fresh_db):
+    _store(fresh_db)
+
+    assert _all_pages(client, "/data_all_db", {"limit": 2}) == [["h-1", "h-2"], ["h-3", "h-4"], ["h-5"]]
+    assert _all_pages(client, "/data_db", {"id": "alice", "limit": 2}) == [["h-1", "h-3"], ["h-4"]]
+
+
+def test_last_full_page_has_no_cursor(client, fresh_db):
+    _store(fresh_db)
+    response = client.post("/data_all_db", json={"limit": 5})
+
+    assert len(response.json()) == 5
+    assert "X-Next-Cursor" not in response.headers
+
+
+def test_start_and_end_select_a_half_open_range(client, fresh_db):
+    _store(fresh_db)
+
+    pages = _all_pages(client, "/data_all_db", {"limit": 2, "start": "2031-01-20T08:00:00",
+                                                "end": "2031-02-15T12:00:00"})
+    assert pages == [["h-2", "h-3"], ["h-4"]]
+    # Aware times are converted to UTC.
+    pages = _all_pages(client, "/data_db", {"id": "bob", "start": "2031-02-15T13:00:00+01:00"})
+    assert pages == [["h-5"]]
+
+
+def test_rows_carry_every_column(client, fresh_db):
+    _store(fresh_db)
+    row = client.post("/data_db", json={"id": "bob", "limit": 1}).json()[0]
+
+    assert list(row) == list(my_db.REVIEW_COLUMNS)
+    assert (row["user_id"], row["review_text"], row["sentiment"], row["confidence"], row["created_at"]) == \
+        ("bob", "second", "negative", 0.25, "2031-01-20 08:00:00")
+
+
+def test_invalid_cursor_is_rejected(client, fresh_db):
+    response = client.post("/data_all_db", json={"after": "not-a-cursor"})
+
+    assert response.status_code == 400
+    assert "Invalid cursor" in response.json()["detail"]
+
+
+def test_cursor_round_trips():
+    cursor = my_db.encode_cursor({"created_at": "2031-01-20 08:00:00", "id": 42})
+    assert my_db.decode_cursor(cursor) == ("2031-01-20 08:00:00", 42)
+
+
+def test_columns_format_is_chosen_by_the_accept_header(client, fresh_db):
+    _store(fresh_db)
+    rows = client.post("/data_db", json={"id": "alice", "limit": 2})
+    columns = client.post("/data_db", json={"id": "alice", "limit": 2}, headers={"Accept": COLUMNS})
+
+    assert columns.status_code == 200
+    assert columns.headers["content-type"] == COLUMNS
+    assert columns.headers["vary"] == rows.headers["vary"] == "Accept"
+    assert columns.headers["X-Next-Cursor"] == rows.headers["X-Next-Cursor"]
+    body = columns.json()
+    assert list(body) == list(my_db.REVIEW_COLUMNS)
+    assert [dict(zip(body, values)) for values in zip(*body.values())] == rows.json()
+    assert body["request_id"] == ["h-1", "h-3"]
+
+
+def test_empty_page_in_columns_format(client, fresh_db):
+    response = client.post("/data_all_db", json={}, headers={"Accept": COLUMNS})
+
+    assert response.json() == {column: [] for column in my_db.REVIEW_COLUMNS}
+
+
+def test_unacceptable_format_is_rejected(client, fresh_db):
+    response = client.post("/data_all_db", json={}, headers={"Accept": "text/csv"})
+
+    assert response.status_code == 406
+    assert COLUMNS in response.json()["detail"]
+    assert client.post("/data_all_db", json={}, headers={"Accept": "application/json;q=0"}).status_code == 406
+
+
+def test_negotiation_prefers_quality_then_exact_types():
+    assert fastapi_app._negotiate(None, PAGE_MEDIA_TYPES) == "rows"
+    assert fastapi_app._negotiate("*/*", PAGE_MEDIA_TYPES) == "rows"
+    assert fastapi_app._negotiate(f"application/*, {COLUMNS}", PAGE_MEDIA_TYPES) == "columns"
+    assert fastapi_app._negotiate(f"application/json;q=0.9, {COLUMNS};q=0.5", PAGE_MEDIA_TYPES) == "rows"
+    assert fastapi_app._negotiate(f"{COLUMNS}, application/json;q=bad", PAGE_MEDIA_TYPES) == "columns"
+    assert fastapi_app._negotiate("text/html", PAGE_MEDIA_TYPES) is None
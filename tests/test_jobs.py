@@ -0,0 +1,99 @@
+"""
+Module: tests/test_jobs.py
+Description: The bounded job queue behind POST /reviews/async, and polling GET /jobs/{job_id}.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+from jobs import COMPLETED, FAILED, JobQueue, QueueFullError
+
+
+def _queue(max_queue=10, workers=2) -> JobQueue:
+    return JobQueue(max_queue=max_queue, workers=workers, result_ttl=60, max_results=100)
+
+
+def test_jobs_complete_or_fail_with_their_handler():
+    async def handler(payload):
+        if payload == "bad":
+            raise ValueError("cannot score")
+        return payload.upper()
+
+    async def scenario():
+        queue = _queue()
+        await queue.start(handler)
+        good, bad = queue.submit("good"), queue.submit("bad")
+        await queue.stop()
+        return queue, good, bad
+
+    queue, good, bad = asyncio.run(scenario())
+    assert (good.status, good.result) == (COMPLETED, "GOOD")
+    assert (bad.status, bad.error) == (FAILED, "cannot score")
+    assert queue.get(good.id) is good
+    assert queue.stats()["completed"] == 1 and queue.stats()["failed"] == 1
+
+
+def test_same_key_returns_the_active_job():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def handler(payload):
+            await release.wait()
+            return payload
+
+        queue = _queue(workers=1)
+        await queue.start(handler)
+        first = queue.submit("a", key="request-1")
+        assert queue.submit("b", key="request-1") is first
+        release.set()
+        await queue.stop()
+        # Once finished, the key can be submitted again.
+        assert queue.submit("c", key="request-1") is not first
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_rejects_with_retry_hint():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def handler(payload):
+            await release.wait()
+
+        queue = _queue(max_queue=2, workers=1)
+        await queue.start(handler)
+        queue.submit(1)
+        await asyncio.sleep(0)  # The worker takes the first job.
+        queue.submit(2)
+        queue.submit(3)
+        with pytest.raises(QueueFullError) as raised:
+            queue.submit(4)
+        assert raised.value.retry_after >= 1
+        assert queue.stats()["rejected"] == 1
+        release.set()
+        await queue.stop()
+        assert queue.completed == 3
+
+    asyncio.run(scenario())
+
+
+def test_async_review_is_polled_until_completed(client):
+    response = client.post("/reviews/async", json={"request_id": "a-1", "user_id": "u1",
+                                                   "data": {"review_text": "This product is great"}})
+    assert response.status_code == 202
+    status_url = response.json()["status_url"]
+    assert response.headers["Location"] == status_url
+
+    for _ in range(100):
+        job = client.get(status_url).json()
+        if job["status"] == COMPLETED:
+            break
+        time.sleep(0.01)
+    assert (job["result"]["request_id"], job["result"]["sentiment"]) == ("a-1", "positive")
+    assert job["finished_at"] is not None
+
+
+def test_unknown_job_is_not_found(client):
+    assert client.get("/jobs/does-not-exist").status_code == 404
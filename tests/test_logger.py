@@ -0,0 +1,94 @@
+"""
+Module: tests/test_logger.py
+Description: The queued log handler: what it enqueues and the records logged around shutdown.
+"""
+
+import logging
+import queue
+import threading
+
+import pytest
+
+import logger as logger_module
+from logger import MyLogger, _DeferredQueueHandler
+
+
+class _Collector(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+
+@pytest.fixture
+def collector(monkeypatch):
+    """
+    Gives MyLogger a fresh queue and listener writing to a collecting handler.
+    """
+    handler = _Collector()
+    monkeypatch.setattr(MyLogger, "_file_handler", handler)
+    monkeypatch.setattr(MyLogger, "_queue", None)
+    monkeypatch.setattr(MyLogger, "_listener", None)
+    monkeypatch.setattr(logger_module, "LOG_MODE", "queue")
+    monkeypatch.setattr(logger_module, "LOG_INFO_PER_SECOND", 0)
+    yield handler
+    MyLogger.shutdown()
+
+
+def _logger(name: str) -> logging.Logger:
+    log = logging.getLogger(name)
+    log.handlers.clear()
+    log.filters.clear()
+    return MyLogger.get_logger(name)
+
+
+def test_queued_records_are_frozen_when_logged(monkeypatch):
+    records = queue.SimpleQueue()
+    monkeypatch.setattr(MyLogger, "_queue", records)
+    handler = _DeferredQueueHandler(records)
+    items = [1]
+    try:
+        raise ValueError("bad input")
+    except ValueError as e:
+        record = logging.LogRecord("tests", logging.ERROR, __file__, 1, "items=%s", (items,),
+                                   (type(e), e, e.__traceback__))
+    handler.handle(record)
+    items.append(2)
+
+    queued = records.get_nowait()
+    assert (queued.getMessage(), queued.args, queued.exc_info) == ("items=[1]", None, None)
+    assert "ValueError: bad input" in queued.exc_text
+    assert record.args == (items,)
+
+
+def test_records_logged_around_shutdown_are_written(collector):
+    log = _logger("tests.logger.shutdown")
+    started = threading.Event()
+
+    def log_lines():
+        for i in range(500):
+            log.info("line %d", i)
+            started.set()
+
+    writer = threading.Thread(target=log_lines)
+    writer.start()
+    started.wait()
+    MyLogger.shutdown()
+    writer.join()
+    log.info("after shutdown")
+
+    assert collector.lines == [f"line {i}" for i in range(500)] + ["after shutdown"]
+
+
+def test_a_new_listener_does_not_strand_old_handlers(collector):
+    log = _logger("tests.logger.restart")
+    log.info("first")
+    MyLogger.shutdown()
+    _logger("tests.logger.other").info("second")
+    log.info("third")
+    MyLogger.shutdown()
+
+    # "third" is written directly, possibly before the new listener writes "second".
+    assert sorted(collector.lines) == ["first", "second", "third"]
@@ -0,0 +1,81 @@
+"""
+Module: tests/test_metrics_writer.py
+Description: Metrics.csv rows, files written with an older header and their migration.
+"""
+
+import csv
+import os
+
+import pytest
+
+import metrics_writer
+from hashing import text_hash
+from metrics_writer import METRICS_FILE, METRICS_HEADER, migrate_metrics_file, write_metrics_record
+from models import MetricsData
+
+OLD_HEADER = METRICS_HEADER[:-1]
+
+
+@pytest.fixture(autouse=True)
+def metrics_dir(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(metrics_writer, "_file_headers", {})
+
+
+def _record(request_id: str) -> MetricsData:
+    return MetricsData(
+        request_id=request_id, user_id="u1", review_text="Great value", sentiment="positive",
+        average_confidence_score=80, execution_time=0.01, stage_timings={"score": 0.0015}
+    )
+
+
+def _rows() -> list:
+    with open(METRICS_FILE, newline="", encoding="utf-8") as csvfile:
+        return list(csv.reader(csvfile))
+
+
+def _write_old_file():
+    os.makedirs(metrics_writer.METRICS_DIR)
+    with open(METRICS_FILE, "w", newline="", encoding="utf-8") as csvfile:
+        csv.writer(csvfile).writerows([OLD_HEADER, ["2025-01-30T14:28:32", "r-0", "u0", "old", "neutral", "0", "0.16"]])
+
+
+def test_new_file_gets_the_header_and_timings():
+    write_metrics_record(_record("r-1"))
+    write_metrics_record(_record("r-2"))
+
+    rows = _rows()
+    assert rows[0] == METRICS_HEADER
+    assert [row[1] for row in rows[1:]] == ["r-1", "r-2"]
+    assert rows[1][-1] == "score=0.001500"
+
+
+def test_hash_mode_writes_the_text_hash(monkeypatch):
+    monkeypatch.setattr(metrics_writer, "REVIEW_TEXT_MODE", "hash")
+    write_metrics_record(_record("r-1"))
+
+    assert _rows()[1][3] == text_hash("Great value").hex()
+
+
+def test_outdated_file_keeps_its_path_and_columns():
+    _write_old_file()
+    write_metrics_record(_record("r-1"))
+
+    rows = _rows()
+    assert rows[0] == OLD_HEADER
+    assert len(rows[2]) == len(OLD_HEADER) and rows[2][1] == "r-1"
+
+
+def test_migration_rewrites_the_header_in_place():
+    _write_old_file()
+    write_metrics_record(_record("r-1"))
+
+    assert migrate_metrics_file() == 2
+    assert migrate_metrics_file() == 0
+    write_metrics_record(_record("r-2"))
+
+    rows = _rows()
+    assert rows[0] == METRICS_HEADER
+    assert all(len(row) == len(METRICS_HEADER) for row in rows)
+    assert [row[1] for row in rows[1:]] == ["r-0", "r-1", "r-2"]
+    assert (rows[1][-1], rows[3][-1]) == ("", "score=0.001500")
@@ -0,0 +1,72 @@
+"""
+Module: tests/test_microbench.py
+Description: The microbenchmark harness: summaries, timing, the synthetic corpus and regression checks.
+"""
+
+import json
+import os
+import sys
+
+from benchmarks import microbench
+from benchmarks.corpus import KINDS, generate
+
+
+def _document(**medians) -> dict:
+    return {"results": {name: {"median": median} for name, median in medians.items()}}
+
+
+def test_summarize_reports_percentiles_and_rate():
+    summary = microbench.summarize([0.004, 0.001, 0.003, 0.002])
+
+    assert summary["calls"] == 4
+    assert (summary["min"], summary["median"], summary["p95"], summary["max"]) == (0.001, 0.0025, 0.004, 0.004)
+    assert summary["mean"] == 0.0025
+    assert summary["ops_per_sec"] == 400
+
+
+def test_time_calls_skips_warmup_and_runs_setup_before_each_call():
+    events = []
+
+    summary = microbench.time_calls(events.append, range(5), setup=lambda: events.append("setup"), warmup=2)
+
+    assert summary["calls"] == 3
+    assert events == ["setup", 0, "setup", 1, "setup", 2, "setup", 3, "setup", 4]
+
+
+def test_corpus_is_deterministic():
+    for kind in KINDS:
+        texts = generate(20, kind, seed=3)
+        assert len(texts) == 20 and all(texts)
+        assert generate(20, kind, seed=3) == texts
+    assert generate(20, "short", seed=4) != generate(20, "short", seed=3)
+
+
+def test_compare_flags_slowdowns_over_the_threshold(capsys):
+    baseline = _document(fast=1.0, steady=1.0, slow=1.0, zero=0.0)
+    current = _document(fast=0.5, steady=1.05, slow=1.2, zero=0.1, added=1.0)
+
+    assert microbench.compare(baseline, current, threshold=0.10) == ["slow"]
+    output = capsys.readouterr().out
+    assert "REGRESSION" in output and "new" in output
+
+
+def test_compare_command_exits_non_zero_on_regressions(tmp_path):
+    baseline, current = tmp_path / "baseline.json", tmp_path / "current.json"
+    baseline.write_text(json.dumps(_document(api=1.0)), encoding="utf-8")
+
+    current.write_text(json.dumps(_document(api=1.5)), encoding="utf-8")
+    assert microbench.main(["compare", str(current), "--baseline", str(baseline)]) == 1
+    assert microbench.main(["compare", str(current), "--baseline", str(baseline), "--threshold", "0.6"]) == 0
+
+
+def test_run_saves_the_selected_benchmarks(fresh_db, tmp_path, monkeypatch):
+    monkeypatch.setenv("DB_FILE", os.environ["DB_FILE"])
+    monkeypatch.setattr(sys, "path", list(sys.path))
+    output = tmp_path / "latest.json"
+
+    assert microbench.main(["run", "--number", "30", "--only", "sentiment.cached", "--output", str(output)]) == 0
+
+    document = json.loads(output.read_text(encoding="utf-8"))
+    assert list(document["results"]) == ["sentiment.cached"]
+    assert document["results"]["sentiment.cached"]["calls"] == 10
+    assert document["meta"]["calls"] == 30
@@ -0,0 +1,183 @@
+"""
+Module: tests/test_monitoring.py
+Description: Latency histograms, the request metrics middleware, Server-Timing, GET /metrics
+and GET /debug/profile.
+
+The metrics are process-wide, so tests compare counts before and after a request.
+"""
+
+import asyncio
+import marshal
+
+import pytest
+
+import fastapi_app
+import monitoring
+from monitoring import Histogram
+from profiling import profiler
+
+
+def _stage_counts() -> dict:
+    # Observations per stage in review_stage_duration_seconds.
+    prefix = 'review_stage_duration_seconds_count{stage="'
+    counts = {}
+    for line in monitoring.registry.render().splitlines():
+        if line.startswith(prefix):
+            name, _, count = line[len(prefix):].partition('"} ')
+            counts[name] = int(count)
+    return counts
+
+
+def _server_timing(response) -> list:
+    return [entry.split(";")[0] for entry in response.headers["server-timing"].split(", ")]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("test_seconds", "Test.", ("endpoint",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value, endpoint="/a")
+
+    assert histogram.render()[2:] == [
+        'test_seconds_bucket{endpoint="/a",le="0.1"} 2',
+        'test_seconds_bucket{endpoint="/a",le="1.0"} 3',
+        'test_seconds_bucket{endpoint="/a",le="+Inf"} 4',
+        'test_seconds_sum{endpoint="/a"} 2.65',
+        'test_seconds_count{endpoint="/a"} 4',
+    ]
+    assert histogram.quantile(0.5, endpoint="/a") == 0.1
+    assert histogram.quantile(0.75, endpoint="/a") == 1.0
+    assert histogram.quantile(0.5, endpoint="/b") == 0.0
+
+
+def test_requests_are_counted_by_route_and_status(client):
+    ok = monitoring.REQUESTS_TOTAL.value(endpoint="/cache/stats", status="200")
+    denied = monitoring.REQUESTS_TOTAL.value(endpoint="/cache/stats", status="401")
+
+    client.get("/cache/stats")
+    client.get("/cache/stats", headers={"Authorization": "Bearer wrong"})
+
+    assert monitoring.REQUESTS_TOTAL.value(endpoint="/cache/stats", status="200") == ok + 1
+    assert monitoring.REQUESTS_TOTAL.value(endpoint="/cache/stats", status="401") == denied + 1
+    assert monitoring.REQUEST_SECONDS.quantile(1.0, endpoint="/cache/stats", sentiment="none") > 0
+
+
+def test_structured_errors_are_counted_as_errors(client, monkeypatch):
+    def failing_score(*args, **kwargs):
+        raise RuntimeError("scorer failed")
+
+    monkeypatch.setattr(fastapi_app.scoring_executor, "score", failing_score)
+    errors = monitoring.ERRORS_TOTAL.value(endpoint="/reviews")
+
+    response = client.post("/reviews", json={"request_id": "m-1", "user_id": "u1",
+                                             "data": {"review_text": "Fine"}})
+
+    assert response.status_code == 200 and response.json()["success"] is False
+    assert monitoring.ERRORS_TOTAL.value(endpoint="/reviews") == errors + 1
+
+
+def test_unhandled_exception_is_counted_as_500():
+    async def failing_app(scope, receive, send):
+        raise RuntimeError("boom")
+
+    middleware = fastapi_app.RequestMetricsMiddleware(failing_app)
+    requests = monitoring.REQUESTS_TOTAL.value(endpoint="unmatched", status="500")
+    errors = monitoring.ERRORS_TOTAL.value(endpoint="unmatched")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(middleware({"type": "http"}, None, None))
+
+    assert monitoring.REQUESTS_TOTAL.value(endpoint="unmatched", status="500") == requests + 1
+    assert monitoring.ERRORS_TOTAL.value(endpoint="unmatched") == errors + 1
+
+
+def test_server_timing_lists_the_stages_and_total(client, monkeypatch):
+    records = []
+    monkeypatch.setattr(fastapi_app, "write_metrics_record", records.append)
+    before = _stage_counts()
+
+    response = client.post("/reviews", json={"request_id": "t-1", "user_id": "u1",
+                                             "data": {"review_text": "Great value"}})
+
+    assert _server_timing(response) == ["lookup", "score", "store", "metrics", "total"]
+    # The record is written inside the metrics stage, so it holds the stages before it.
+    assert list(records[0].stage_timings) == ["lookup", "score", "store"]
+    after = _stage_counts()
+    for name in ("lookup", "score", "store", "metrics", "score_texts"):
+        assert after[name] == before.get(name, 0) + 1, name
+
+    monkeypatch.setattr(fastapi_app, "SERVER_TIMING", False)
+    assert "server-timing" not in client.get("/cache/stats").headers
+
+
+def test_metrics_endpoint_renders_the_prometheus_format(client):
+    client.get("/cache/stats")
+    response = client.get("/metrics")
+
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    lines = response.text.splitlines()
+    assert "# TYPE review_request_duration_seconds histogram" in lines
+    assert any(line.startswith('review_request_duration_seconds_bucket{endpoint="/cache/stats",'
+                               'sentiment="none",le="+Inf"} ') for line in lines)
+    assert any(line.startswith("sentiment_cache_entries ") for line in lines)
+
+
+def test_batch_server_timing_counts_each_stage_once(client):
+    before = _stage_counts()
+    response = client.post("/reviews/batch", json={"reviews": [
+        {"request_id": f"tb-{i}", "user_id": "u1", "data": {"review_text": text}}
+        for i, text in enumerate(["Great value", "Terrible battery"])
+    ]})
+
+    assert _server_timing(response) == ["lookup", "score", "store", "metrics", "total"]
+    after = _stage_counts()
+    # One scoring call and one transaction for the batch, observed but not repeated in the header.
+    for name in ("metrics", "score_texts", "insert_feedback_batch"):
+        assert after[name] == before.get(name, 0) + 1, name
+    assert "write_metrics_records" not in after
+
+
+def test_nested_stages_are_only_observed():
+    @monitoring.timed("test_inner")
+    def inner():
+        pass
+
+    before = _stage_counts()
+    with monitoring.request_timings() as timings:
+        with monitoring.stage("test_outer"):
+            inner()
+        inner()
+
+    assert list(timings) == ["test_outer", "test_inner"]
+    after = _stage_counts()
+    assert after["test_inner"] == before.get("test_inner", 0) + 2
+
+
+def test_cprofile_of_the_event_loop(client):
+    response = client.get("/debug/profile", params={"seconds": 0.05, "sort": "tottime", "limit": 5})
+    assert response.status_code == 200
+    assert "function calls" in response.text
+
+    response = client.get("/debug/profile", params={"seconds": 0.05, "format": "pstats"})
+    assert response.headers["content-type"] == "application/octet-stream"
+    assert isinstance(marshal.loads(response.content), dict)
+
+
+def test_sampled_stacks_are_collapsed(client):
+    response = client.get("/debug/profile", params={"seconds": 0.05, "mode": "sample", "interval": 0.01})
+
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any(";" in line.rsplit(" ", 1)[0] for line in lines)
+
+
+def test_invalid_or_concurrent_profiles_are_rejected(client):
+    too_long = client.get("/debug/profile", params={"seconds": profiler.max_seconds + 1})
+    assert too_long.status_code == 400
+    assert client.get("/debug/profile", params={"seconds": 0.05, "mode": "trace"}).status_code == 400
+    assert client.get("/debug/profile", params={"seconds": 0.05, "sort": "bogus"}).status_code == 400
+
+    with profiler._claim():
+        busy = client.get("/debug/profile", params={"seconds": 0.05})
+    assert busy.status_code == 409
+    assert client.get("/debug/profile", params={"seconds": 0.05}).status_code == 200
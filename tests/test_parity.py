@@ -0,0 +1,23 @@
+"""
+Module: tests/test_parity.py
+Description: The precompiled lexicon engine scores like TextBlob (see parity_check.py).
+"""
+
+import pytest
+
+pytest.importorskip("textblob")
+
+import parity_check
+from benchmarks.corpus import KINDS, generate
+
+
+def _fixed_corpus() -> list:
+    texts = list(parity_check.EDGE_CASES)
+    for seed, kind in enumerate(KINDS):
+        texts.extend(generate(200, kind, seed=seed))
+    return list(dict.fromkeys(texts))
+
+
+def test_engine_matches_textblob():
+    mismatches, _textblob_time, _engine_time = parity_check.compare(_fixed_corpus())
+    assert mismatches == []
@@ -0,0 +1,141 @@
+"""
+Module: tests/test_replays.py
+Description: request_id as an idempotency key of POST /reviews: stored, concurrent and queued replays.
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+import fastapi_app
+import my_db
+from models import ProductReviewRequest
+from write_behind import ACK_ENQUEUE, WriteBehindWriter
+
+
+def _body(request_id: str, text: str, user_id: str = "u1") -> dict:
+    return {"request_id": request_id, "user_id": user_id, "data": {"review_text": text}}
+
+
+@pytest.fixture
+def metrics_records(monkeypatch) -> list:
+    records = []
+    monkeypatch.setattr(fastapi_app, "write_metrics_record", records.append)
+    return records
+
+
+@pytest.fixture
+def score_calls(monkeypatch) -> list:
+    """
+    Records the texts scored through the scoring executor; each call yields to the
+    event loop first, so concurrent requests overlap.
+    """
+    calls = []
+    score = fastapi_app.scoring_executor.score
+
+    async def counting_score(text):
+        calls.append(text)
+        await asyncio.sleep(0.05)
+        return await score(text)
+
+    monkeypatch.setattr(fastapi_app.scoring_executor, "score", counting_score)
+    return calls
+
+
+def _stored(manager) -> list:
+    with manager.reader() as conn:
+        return conn.execute("SELECT request_id, user_id, sentiment FROM reviews").fetchall()
+
+
+def test_replay_returns_the_stored_row(client, fresh_db, metrics_records):
+    first = client.post("/reviews", json=_body("p-1", "This product is great"))
+    replay = client.post("/reviews", json=_body("p-1", "Terrible battery"))
+
+    assert "Idempotent-Replayed" not in first.headers
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.json()["data"] == first.json()["data"]
+    assert replay.json()["data"]["sentiment"] == "positive"
+    assert len(metrics_records) == 1
+    assert _stored(fresh_db) == [("p-1", "u1", "positive")]
+
+
+def test_request_id_of_another_user_is_a_conflict(client, fresh_db, metrics_records):
+    client.post("/reviews", json=_body("p-2", "This product is great"))
+    response = client.post("/reviews", json=_body("p-2", "This product is great", user_id="u2"))
+
+    assert response.status_code == 409
+    assert "another user_id" in response.json()["detail"]
+    assert len(metrics_records) == 1
+    assert _stored(fresh_db) == [("p-2", "u1", "positive")]
+
+
+def test_concurrent_duplicates_are_processed_once(fresh_db, metrics_records, score_calls):
+    my_db.create_database()
+    request = ProductReviewRequest(**_body("p-3", "This product is great"))
+    other_user = ProductReviewRequest(**_body("p-3", "This product is great", user_id="u2"))
+
+    async def scenario():
+        return await asyncio.gather(
+            fastapi_app.process_review(request),
+            fastapi_app.process_review(request),
+            fastapi_app.process_review(other_user),
+            return_exceptions=True,
+        )
+
+    first, second, conflict = asyncio.run(scenario())
+
+    assert (first[1], second[1]) == (False, True)
+    assert first[0] == second[0]
+    assert isinstance(conflict, fastapi_app.RequestIdConflict)
+    assert score_calls == ["This product is great"]
+    assert len(metrics_records) == 1
+    assert _stored(fresh_db) == [("p-3", "u1", "positive")]
+
+
+def test_replay_of_a_row_not_yet_committed_in_enqueue_mode(fresh_db, monkeypatch, metrics_records, score_calls):
+    my_db.create_database()
+    writer = WriteBehindWriter(max_queue=10, batch_size=10, flush_interval=0, ack_mode=ACK_ENQUEUE)
+    monkeypatch.setattr(fastapi_app, "feedback_writer", writer)
+    release = threading.Event()
+    insert_feedback_batch = my_db.insert_feedback_batch
+
+    def held_insert(rows):
+        release.wait(5)
+        return insert_feedback_batch(rows)
+
+    monkeypatch.setattr(my_db, "insert_feedback_batch", held_insert)
+    request = ProductReviewRequest(**_body("p-4", "This product is great"))
+
+    async def scenario():
+        await writer.start()
+        first = await fastapi_app.process_review(request)
+        await asyncio.sleep(0.01)  # The group commit has started and waits for release.
+        queued = writer.pending("p-4")
+        replay = await fastapi_app.process_review(request)
+        release.set()
+        await writer.stop()
+        return first, queued, replay
+
+    first, queued, replay = asyncio.run(scenario())
+
+    assert queued is not None
+    assert (first[1], replay[1]) == (False, True)
+    assert replay[0] == first[0]
+    assert score_calls == ["This product is great"]
+    assert len(metrics_records) == 1
+    assert writer.pending("p-4") is None
+    assert _stored(fresh_db) == [("p-4", "u1", "positive")]
+
+
+def test_batch_reports_request_ids_of_another_user(client, fresh_db):
+    client.post("/reviews", json=_body("p-5", "This product is great"))
+    body = client.post("/reviews/batch", json={"reviews": [
+        _body("p-5", "This product is great", user_id="u2"),
+        _body("p-6", "Terrible battery", user_id="u2"),
+        _body("p-6", "Terrible battery", user_id="u3"),
+    ]}).json()
+
+    assert [item["status"] for item in body["data"]] == ["ERROR", "COMPLETED", "ERROR"]
+    assert (body["processed"], body["failed"]) == (1, 2)
+    assert sorted(_stored(fresh_db)) == [("p-5", "u1", "positive"), ("p-6", "u2", "negative")]
@@ -0,0 +1,86 @@
+"""
+Module: tests/test_result_cache.py
+Description: The LRU/TTL result cache in front of analyze_sentiment.
+"""
+
+import result_cache
+import sentiment_analysis
+from result_cache import ResultCache
+from sentiment_analysis import analyze_sentiment
+
+POSITIVE = {"sentiment": "positive", "confidence": 0.8}
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(max_size=2)
+    cache.put("a", POSITIVE)
+    cache.put("b", POSITIVE)
+    cache.get("a")
+    cache.put("c", POSITIVE)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == POSITIVE and cache.get("c") == POSITIVE
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_the_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, "monotonic", lambda: now[0])
+    cache = ResultCache(max_size=10, ttl=5)
+    cache.put("a", POSITIVE)
+
+    now[0] += 4.9
+    assert cache.get("a") == POSITIVE
+    now[0] += 0.2
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_keys_ignore_whitespace_but_not_case():
+    cache = ResultCache(max_size=10)
+    cache.put("Great  product ", POSITIVE)
+
+    assert cache.get(" Great product") == POSITIVE
+    assert cache.get("great product") is None
+
+
+def test_changing_the_scorer_version_drops_old_results():
+    cache = ResultCache(max_size=10, version="v1")
+    cache.put("a", POSITIVE)
+    old_key = cache.key("a")
+    cache.set_version("v2")
+
+    assert cache.get("a") is None
+    assert cache.key("a") != old_key
+
+
+def test_cached_results_are_copies():
+    cache = ResultCache(max_size=10)
+    cache.put("a", POSITIVE)
+    cache.get("a")["sentiment"] = "negative"
+
+    assert cache.get("a") == POSITIVE
+
+
+def test_zero_size_disables_the_cache():
+    cache = ResultCache(max_size=0)
+    cache.put("a", POSITIVE)
+
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_analyze_sentiment_scores_a_text_once(monkeypatch):
+    calls = []
+    polarity = sentiment_analysis.polarity
+
+    def counting_polarity(text):
+        calls.append(text)
+        return polarity(text)
+
+    monkeypatch.setattr(sentiment_analysis, "polarity", counting_polarity)
+    sentiment_analysis.result_cache.clear()
+
+    first = analyze_sentiment("What a lovely  day")
+    assert analyze_sentiment("What a lovely day") == first
+    assert calls == ["What a lovely  day"]
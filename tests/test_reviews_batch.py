@@ -0,0 +1,68 @@
+"""
+Module: tests/test_reviews_batch.py
+Description: POST /reviews/batch: batched scoring and storage, per-review errors and replays.
+"""
+
+import sentiment_analysis
+
+
+def _review(request_id: str, text: str, user_id: str = "u1") -> dict:
+    return {"request_id": request_id, "user_id": user_id, "data": {"review_text": text}}
+
+
+def _stored(manager) -> dict:
+    with manager.reader() as conn:
+        return {row[0]: row[1:] for row in conn.execute(
+            "SELECT request_id, user_id, sentiment, confidence FROM reviews")}
+
+
+def test_batch_scores_and_stores_every_review_in_order(client, fresh_db):
+    reviews = [_review("b-1", "This product is great"), _review("b-2", "Terrible battery", "u2"),
+               _review("b-3", "It arrived on Tuesday")]
+    body = client.post("/reviews/batch", json={"reviews": reviews}).json()
+
+    assert (body["status_code"], body["success"], body["processed"], body["failed"]) == (200, True, 3, 0)
+    assert [item["request_id"] for item in body["data"]] == ["b-1", "b-2", "b-3"]
+    assert [item["sentiment"] for item in body["data"]] == ["positive", "negative", "neutral"]
+    assert body["data"][0]["confidence"] == 80
+    assert _stored(fresh_db) == {
+        "b-1": ("u1", "positive", 0.8),
+        "b-2": ("u2", "negative", 1.0),
+        "b-3": ("u1", "neutral", 0.0),
+    }
+
+
+def test_failed_review_does_not_fail_the_batch(client, fresh_db, monkeypatch):
+    polarity = sentiment_analysis.polarity
+
+    def failing_polarity(text):
+        if text == "cannot score":
+            raise RuntimeError("scorer failed")
+        return polarity(text)
+
+    monkeypatch.setattr(sentiment_analysis, "polarity", failing_polarity)
+    body = client.post("/reviews/batch", json={"reviews": [
+        _review("ok-1", "Good value"), _review("bad-1", "cannot score")]}).json()
+
+    assert (body["success"], body["message"], body["processed"], body["failed"]) == \
+        (False, "completed with errors", 1, 1)
+    assert body["data"][1]["status"] == "ERROR"
+    assert body["data"][1]["error_message"] == "scorer failed"
+    assert list(_stored(fresh_db)) == ["ok-1"]
+
+
+def test_stored_and_repeated_request_ids_are_not_scored_again(client, fresh_db):
+    client.post("/reviews/batch", json={"reviews": [_review("r-1", "Good value")]})
+    body = client.post("/reviews/batch", json={"reviews": [
+        _review("r-1", "Awful, broke at once"),
+        _review("r-2", "Awful, broke at once"),
+        _review("r-2", "Good value"),
+    ]}).json()
+
+    assert [(item["request_id"], item["sentiment"]) for item in body["data"]] == [
+        ("r-1", "positive"), ("r-2", "negative"), ("r-2", "negative")]
+    assert _stored(fresh_db) == {"r-1": ("u1", "positive", 0.7), "r-2": ("u1", "negative", 1.0)}
+
+
+def test_empty_batch_is_rejected(client):
+    assert client.post("/reviews/batch", json={"reviews": []}).status_code == 422
@@ -0,0 +1,83 @@
+"""
+Module: tests/test_rollups.py
+Description: GET /rollups: minute, hour and day buckets and their time range and limit.
+"""
+
+import my_db
+
+ROWS = [
+    ("u-1", "alice", "first", "positive", 0.5, "2031-01-10 08:00:10"),
+    ("u-2", "bob", "second", "negative", 0.25, "2031-01-10 08:00:50"),
+    ("u-3", "alice", "third", "neutral", 0.0, "2031-01-10 08:59:59"),
+    ("u-4", "alice", "fourth", "positive", 0.75, "2031-01-10 23:10:00"),
+    ("u-5", "bob", "fifth", "positive", 1.0, "2031-02-01 00:00:00"),
+]
+
+
+def _store(manager):
+    with manager.writer() as conn:
+        my_db._insert_partitioned(conn, [(None,) + row for row in ROWS])
+
+
+def _buckets(client, **params) -> list:
+    response = client.get("/rollups", params=params)
+    assert response.status_code == 200
+    return [(b["bucket"], b["total"], b["positive"], b["negative"], b["neutral"], b["average_confidence"])
+            for b in response.json()["buckets"]]
+
+
+def test_reviews_are_counted_in_each_granularity(client, fresh_db):
+    _store(fresh_db)
+
+    assert _buckets(client, granularity="minute", start="2031-01-01T00:00:00") == [
+        ("2031-01-10 08:00:00", 2, 1, 1, 0, 0.375),
+        ("2031-01-10 08:59:00", 1, 0, 0, 1, 0.0),
+        ("2031-01-10 23:10:00", 1, 1, 0, 0, 0.75),
+        ("2031-02-01 00:00:00", 1, 1, 0, 0, 1.0),
+    ]
+    assert _buckets(client, granularity="hour", start="2031-01-01T00:00:00") == [
+        ("2031-01-10 08:00:00", 3, 1, 1, 1, 0.25),
+        ("2031-01-10 23:00:00", 1, 1, 0, 0, 0.75),
+        ("2031-02-01 00:00:00", 1, 1, 0, 0, 1.0),
+    ]
+    assert _buckets(client, granularity="day", start="2031-01-01T00:00:00") == [
+        ("2031-01-10 00:00:00", 4, 2, 1, 1, 0.375),
+        ("2031-02-01 00:00:00", 1, 1, 0, 0, 1.0),
+    ]
+
+
+def test_start_includes_its_bucket_and_end_is_exclusive(client, fresh_db):
+    _store(fresh_db)
+
+    assert [b[0] for b in _buckets(client, granularity="hour", start="2031-01-10T08:30:00",
+                                   end="2031-02-01T00:00:00")] == ["2031-01-10 08:00:00", "2031-01-10 23:00:00"]
+    # Aware times are converted to UTC.
+    assert [b[0] for b in _buckets(client, granularity="hour", start="2031-01-10T09:30:00+01:00")] == \
+        ["2031-01-10 08:00:00", "2031-01-10 23:00:00", "2031-02-01 00:00:00"]
+
+
+def test_limit_without_start_returns_the_latest_buckets(client, fresh_db):
+    _store(fresh_db)
+
+    assert [b[0] for b in _buckets(client, granularity="hour", limit=2)] == \
+        ["2031-01-10 23:00:00", "2031-02-01 00:00:00"]
+    assert [b[0] for b in _buckets(client, granularity="hour", start="2031-01-01T00:00:00", limit=2)] == \
+        ["2031-01-10 08:00:00", "2031-01-10 23:00:00"]
+
+
+def test_triggers_match_a_rebuild(fresh_db):
+    my_db.create_database()
+    _store(fresh_db)
+    with fresh_db.reader() as conn:
+        maintained = conn.execute("SELECT * FROM review_rollups ORDER BY granularity, bucket").fetchall()
+
+    assert my_db.rebuild_rollups() == len(maintained) == 9
+    with fresh_db.reader() as conn:
+        assert conn.execute("SELECT * FROM review_rollups ORDER BY granularity, bucket").fetchall() == maintained
+
+
+def test_unknown_granularity_is_rejected(client):
+    response = client.get("/rollups", params={"granularity": "week"})
+
+    assert response.status_code == 400
+    assert "Unknown granularity" in response.json()["detail"]
@@ -0,0 +1,135 @@
+"""
+Module: tests/test_scoring_executor.py
+Description: The scoring executor: inline, thread and process pools, micro-batching and coalescing.
+"""
+
+import asyncio
+
+import pytest
+
+import scoring_executor
+from scoring_executor import ScoringExecutor
+from sentiment_analysis import result_cache, score_texts
+
+TEXTS = ["This product is great", "Terrible battery", "It arrived on Tuesday"]
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    result_cache.clear()
+
+
+@pytest.fixture
+def calls(monkeypatch) -> list:
+    """
+    Records the texts of every call to score_texts made by a thread or inline executor.
+    """
+    recorded = []
+
+    def recording_score_texts(texts):
+        recorded.append(list(texts))
+        return score_texts(texts)
+
+    monkeypatch.setattr(scoring_executor, "score_texts", recording_score_texts)
+    return recorded
+
+
+def _executor(mode: str, batch_window: float = 0.0, max_batch: int = 64, workers: int = 2) -> ScoringExecutor:
+    return ScoringExecutor(mode=mode, workers=workers, max_in_flight=8, batch_window=batch_window, max_batch=max_batch)
+
+
+async def _run(executor: ScoringExecutor, work):
+    await executor.start()
+    try:
+        return await work()
+    finally:
+        await executor.stop()
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        _executor("gpu")
+
+
+@pytest.mark.parametrize("mode", ["inline", "thread", "process"])
+def test_every_mode_scores_like_score_texts(mode):
+    executor = _executor(mode, workers=1)
+
+    async def work():
+        single = await executor.score(TEXTS[0])
+        return [single] + await executor.score_batch(TEXTS[1:])
+
+    assert asyncio.run(_run(executor, work)) == score_texts(TEXTS)
+    assert executor.in_flight == 0
+
+
+def test_concurrent_requests_are_micro_batched(calls):
+    executor = _executor("thread", batch_window=0.05)
+
+    async def work():
+        return await asyncio.gather(*(executor.score(text) for text in TEXTS))
+
+    assert asyncio.run(_run(executor, work)) == score_texts(TEXTS)
+    # Besides the warm-up calls, the three requests went to a worker in one call.
+    assert [texts for texts in calls if texts != ["warm up"]] == [TEXTS]
+
+
+def test_micro_batches_are_capped_at_max_batch(calls):
+    executor = _executor("thread", batch_window=0.05, max_batch=2)
+
+    async def work():
+        return await asyncio.gather(*(executor.score(text) for text in TEXTS))
+
+    asyncio.run(_run(executor, work))
+    assert sorted(len(texts) for texts in calls if texts != ["warm up"]) == [1, 2]
+
+
+def test_stop_scores_pending_requests(calls):
+    executor = _executor("thread", batch_window=10)
+
+    async def work():
+        pending = asyncio.ensure_future(executor.score(TEXTS[0]))
+        await asyncio.sleep(0.01)
+        # Without stop, the 10 second window would still be open.
+        await executor.stop()
+        return await pending
+
+    assert asyncio.run(_run(executor, work)) == score_texts(TEXTS[:1])[0]
+
+
+def test_a_failed_worker_call_fails_every_request_of_the_group(monkeypatch):
+    executor = _executor("thread", batch_window=0.05)
+
+    async def work():
+        def failing_score_texts(texts):
+            raise RuntimeError("worker died")
+
+        monkeypatch.setattr(scoring_executor, "score_texts", failing_score_texts)
+        return await asyncio.gather(*(executor.score(text) for text in TEXTS), return_exceptions=True)
+
+    results = asyncio.run(_run(executor, work))
+    assert [str(result) for result in results] == ["worker died"] * 3
+
+
+def test_concurrent_misses_for_the_same_text_are_scored_once(calls):
+    executor = _executor("thread")
+    coalesced = executor.coalesced
+
+    async def work():
+        return await asyncio.gather(*(executor.score(text) for text in ["Great value", "great  value ", "Great value"]))
+
+    results = asyncio.run(_run(executor, work))
+    assert results[0] == results[2] == score_texts(["Great value"])[0]
+    assert [texts for texts in calls if texts != ["warm up"]] == [["Great value"], ["great  value "]]
+    assert executor.coalesced == coalesced + 1
+
+
+def test_cached_results_do_not_reach_the_pool(calls):
+    executor = _executor("thread")
+
+    async def work():
+        await executor.score(TEXTS[0])
+        return await executor.score_batch(TEXTS)
+
+    assert asyncio.run(_run(executor, work)) == score_texts(TEXTS)
+    assert [texts for texts in calls if texts != ["warm up"]] == [TEXTS[:1], TEXTS[1:]]
@@ -0,0 +1,81 @@
+"""
+Module: tests/test_search.py
+Description: GET /search: BM25 ordering, snippets, filters and next_offset paging.
+"""
+
+import my_db
+
+ROWS = [
+    ("f-1", "alice", "Battery battery battery, what a battery", "negative", 0.75, "2031-01-10 08:00:00"),
+    ("f-2", "bob", "The battery is fine but the screen scratches and the case feels cheap and thin",
+     "neutral", 0.0, "2031-01-11 08:00:00"),
+    ("f-3", "alice", "Lovely screen and a battery that lasts", "positive", 0.5, "2031-01-12 08:00:00"),
+    ("f-4", "bob", "Batteries included, great value", "positive", 0.8, "2031-02-02 08:00:00"),
+    ("f-5", "carol", "Nothing to say about it", "neutral", 0.0, "2031-02-03 08:00:00"),
+] + [
+    # Reviews without the searched words, so those words are rare enough to get a BM25 weight.
+    (f"x-{i}", "dave", f"Arrived on day {i}", "neutral", 0.0, "2031-01-20 08:00:00") for i in range(10)
+]
+
+
+def _store(manager):
+    with manager.writer() as conn:
+        my_db._insert_partitioned(conn, [(None,) + row for row in ROWS])
+
+
+def _search(client, **params) -> dict:
+    response = client.get("/search", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def _ids(body: dict) -> list:
+    return [hit["request_id"] for hit in body["results"]]
+
+
+def test_best_match_comes_first_with_a_snippet(client, fresh_db):
+    _store(fresh_db)
+    body = _search(client, q="battery", start="2031-01-01T00:00:00", end="2031-02-01T00:00:00")
+
+    assert _ids(body) == ["f-1", "f-3", "f-2"]
+    scores = [hit["score"] for hit in body["results"]]
+    assert scores == sorted(scores) and scores[0] < 0
+    assert body["results"][0]["snippet"].startswith("[Battery] [battery] [battery]")
+    assert body["next_offset"] is None
+
+
+def test_every_word_is_required_and_star_matches_a_prefix(client, fresh_db):
+    _store(fresh_db)
+
+    assert sorted(_ids(_search(client, q="battery screen"))) == ["f-2", "f-3"]
+    assert sorted(_ids(_search(client, q="batt*"))) == ["f-1", "f-2", "f-3", "f-4"]
+    # Operators are matched as words, not interpreted.
+    assert _ids(_search(client, q="battery OR screen")) == []
+    assert _ids(_search(client, q='"battery')) != []
+
+
+def test_filters_narrow_the_matches(client, fresh_db):
+    _store(fresh_db)
+
+    assert sorted(_ids(_search(client, q="batt*", sentiment="positive"))) == ["f-3", "f-4"]
+    assert sorted(_ids(_search(client, q="batt*", user_id="bob"))) == ["f-2", "f-4"]
+    assert _ids(_search(client, q="batt*", start="2031-02-01T00:00:00")) == ["f-4"]
+
+
+def test_pages_follow_next_offset(client, fresh_db):
+    _store(fresh_db)
+    everything = _ids(_search(client, q="batt*", limit=10))
+
+    pages, offset = [], 0
+    while offset is not None:
+        body = _search(client, q="batt*", limit=3, offset=offset)
+        pages.append(_ids(body))
+        offset = body["next_offset"]
+
+    assert [len(page) for page in pages] == [3, 1]
+    assert [request_id for page in pages for request_id in page] == everything
+
+
+def test_invalid_queries_are_rejected(client):
+    assert client.get("/search", params={"q": " * "}).status_code == 400
+    assert client.get("/search", params={"q": "battery", "sentiment": "angry"}).status_code == 400
@@ -0,0 +1,278 @@
+"""
+Module: tests/test_storage.py
+Description: Monthly partitions: migration from the legacy table, partition creation,
+request_id lookups and retention.
+"""
+
+import asyncio
+import sqlite3
+import threading
+import time
+
+import pytest
+
+import db_admin
+import my_db
+
+
+def _create_legacy_database(manager, rows):
+    # The reviews table as databases created before the partitioned layout have it.
+    conn = sqlite3.connect(manager.db_file)
+    conn.execute("""
+        CREATE TABLE reviews (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            request_id TEXT NOT NULL,
+            user_id TEXT NOT NULL,
+            review_text TEXT NOT NULL,
+            sentiment TEXT NOT NULL,
+            confidence REAL NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    with conn:
+        conn.executemany("""
+            INSERT INTO reviews (request_id, user_id, review_text, sentiment, confidence, created_at)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, rows)
+    conn.close()
+    # Adds the aggregate tables, search index and triggers, as on the API's first start.
+    my_db.create_database()
+
+
+def test_migration_keeps_reviews_written_while_it_runs(fresh_db):
+    legacy = [
+        (f"legacy-{i}", f"user-{i % 7}", f"legacy review {i % 50} about the battery",
+         ("positive", "negative", "neutral")[i % 3], 0.5, f"2024-{i % 3 + 1:02d}-15 12:00:00")
+        for i in range(3000)
+    ]
+    _create_legacy_database(fresh_db, legacy)
+
+    written, errors = [], []
+    stop = threading.Event()
+
+    def write_reviews():
+        n = 0
+        while not stop.is_set():
+            batch = [(f"live-{n}-{i}", f"user-{i}", f"live review {n} battery", "positive", 0.9) for i in range(5)]
+            try:
+                my_db.insert_feedback_batch(batch)
+                written.extend(row[0] for row in batch)
+            except Exception as e:
+                errors.append(e)
+            n += 1
+            time.sleep(0.002)
+
+    written_at_progress = []
+    writer = threading.Thread(target=write_reviews)
+    writer.start()
+    try:
+        my_db.compact_storage(chunk_size=250, pause=0.005,
+                              on_progress=lambda copied, total: written_at_progress.append(len(written)))
+        time.sleep(0.05)  # Keep writing after the switch to partitions.
+    finally:
+        stop.set()
+        writer.join()
+
+    assert errors == []
+    assert written_at_progress[-1] > written_at_progress[0]
+    with fresh_db.reader() as conn:
+        assert my_db._is_partitioned(conn)
+        stored = [row[0] for row in conn.execute("SELECT request_id FROM reviews")]
+        summarized = conn.execute("SELECT SUM(total) FROM user_summary").fetchone()[0]
+        months = my_db._partition_months(conn.cursor())
+    assert sorted(stored) == sorted([row[0] for row in legacy] + written)
+    assert summarized == len(stored)
+    assert {"202401", "202402", "202403"} <= set(months)
+    with fresh_db.writer() as conn:
+        for month in months:
+            conn.execute(f"INSERT INTO reviews_fts_{month}(reviews_fts_{month}, rank) VALUES ('integrity-check', 1)")
+
+
+def _aggregates(manager) -> tuple:
+    with manager.reader() as conn:
+        return (conn.execute("SELECT * FROM user_summary ORDER BY user_id").fetchall(),
+                conn.execute("SELECT * FROM review_rollups ORDER BY granularity, bucket").fetchall())
+
+
+def _legacy_rows(count: int) -> list:
+    return [
+        (f"legacy-{i}", f"user-{i % 7}", f"legacy review {i % 50} about the battery",
+         ("positive", "negative", "neutral")[i % 3], 0.5, f"2024-{i % 3 + 1:02d}-15 12:{i % 60:02d}:00")
+        for i in range(count)
+    ]
+
+
+def test_migration_after_dedupe_keeps_counts_and_aggregates(fresh_db, monkeypatch):
+    legacy = _legacy_rows(1000)
+    # Retried requests stored twice before request_id was unique.
+    duplicates = [(request_id, user_id, "retried", "negative", 1.0, created_at)
+                  for request_id, user_id, _text, _sentiment, _confidence, created_at in legacy[:40]]
+    _create_legacy_database(fresh_db, legacy + duplicates)
+
+    with pytest.raises(ValueError, match="dedupe-request-ids"):
+        my_db.compact_storage()
+
+    assert my_db.dedupe_request_ids() == 40
+    aggregates = _aggregates(fresh_db)
+    progress, pauses = [], []
+    monkeypatch.setattr(my_db.time, "sleep", pauses.append)
+    assert my_db.compact_storage(chunk_size=300, pause=0.01,
+                                 on_progress=lambda copied, total: progress.append((copied, total))) == 1000
+
+    assert progress == [(300, 1000), (600, 1000), (900, 1000), (1000, 1000)]
+    assert pauses == [0.01] * 3
+    with fresh_db.reader() as conn:
+        assert my_db._is_partitioned(conn)
+        assert conn.execute("SELECT COUNT(*), COUNT(DISTINCT request_id) FROM reviews").fetchone() == (1000, 1000)
+        assert conn.execute("SELECT review_text FROM reviews WHERE request_id = 'legacy-0'").fetchone() == \
+            ("legacy review 0 about the battery",)
+        leftovers = conn.execute(
+            "SELECT name FROM sqlite_master WHERE name IN ('reviews_legacy', 'reviews_fts') "
+            "OR name LIKE 'trg_reviews_%'").fetchall()
+    assert leftovers == []
+    # The aggregates carry over, and match a recomputation from the partitions.
+    assert _aggregates(fresh_db) == aggregates
+    my_db.rebuild_user_summary()
+    my_db.rebuild_rollups()
+    assert _aggregates(fresh_db) == aggregates
+
+    # The partitions' triggers keep the aggregates and the search index current.
+    with fresh_db.writer() as conn:
+        my_db._insert_partitioned(conn, [(None, "after", "user-0", "brand new zeppelin", "positive", 0.5,
+                                          "2024-01-15 12:00:00")])
+    summary, rollups = _aggregates(fresh_db)
+    assert summary != aggregates[0] and rollups != aggregates[1]
+    rows, _next_offset = asyncio.run(my_db.search_reviews("zeppelin", limit=10))
+    assert [row["request_id"] for row in rows] == ["after"]
+    with fresh_db.writer() as conn:
+        for month in ("202401", "202402", "202403"):
+            conn.execute(f"INSERT INTO reviews_fts_{month}(reviews_fts_{month}, rank) VALUES ('integrity-check', 1)")
+
+
+def test_interrupted_migration_resumes(fresh_db):
+    _create_legacy_database(fresh_db, _legacy_rows(500))
+
+    def interrupt(copied, total):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        my_db.compact_storage(chunk_size=200, on_progress=interrupt)
+    with fresh_db.reader() as conn:
+        assert not my_db._is_partitioned(conn)
+
+    assert my_db.compact_storage(chunk_size=200) == 300
+    with fresh_db.reader() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM reviews").fetchone()[0] == 500
+
+
+def test_partition_insert_after_rollback(fresh_db):
+    my_db.create_database()
+    with pytest.raises(RuntimeError):
+        with fresh_db.writer() as conn:
+            my_db._insert_partitioned(conn, [(None, "rolled-back", "u", "text", "positive", 0.5, "2031-01-05 00:00:00")])
+            raise RuntimeError("abort")
+    assert "203101" not in my_db._known_partitions
+
+    with fresh_db.writer() as conn:
+        inserted = my_db._insert_partitioned(conn, [(None, "kept", "u", "text", "positive", 0.5, "2031-01-06 00:00:00")])
+    assert inserted == 1
+    assert "203101" in my_db._known_partitions
+    found = asyncio.run(my_db.fetch_reviews_by_request_id(["rolled-back", "kept"]))
+    assert list(found) == ["kept"]
+
+
+def test_insert_skips_stored_and_repeated_request_ids(fresh_db):
+    my_db.create_database()
+    with fresh_db.writer() as conn:
+        my_db._insert_partitioned(conn, [(None, "a", "u1", "first", "positive", 0.5, "2031-01-01 00:00:00")])
+
+    with fresh_db.writer() as conn:
+        inserted = my_db._insert_partitioned(conn, [
+            (None, "a", "u1", "replayed", "negative", 1.0, "2031-02-01 00:00:00"),
+            (None, "b", "u2", "second", "negative", 0.25, "2031-02-01 00:00:00"),
+            (None, "b", "u3", "repeated", "neutral", 0.0, "2031-01-01 00:00:00"),
+            (None, "c", "u1", "third", "positive", 0.75, "2031-01-02 00:00:00"),
+        ])
+
+    assert inserted == 2
+    with fresh_db.reader() as conn:
+        assert conn.execute("SELECT id, request_id, user_id, review_text FROM reviews ORDER BY id").fetchall() == [
+            (1, "a", "u1", "first"), (2, "b", "u2", "second"), (3, "c", "u1", "third")]
+        assert conn.execute("SELECT request_id, month FROM review_keys ORDER BY id").fetchall() == [
+            ("a", "203101"), ("b", "203102"), ("c", "203101")]
+
+
+def test_request_id_lookup_across_partitions(fresh_db):
+    my_db.create_database()
+    rows = [
+        (None, "old", "u1", "first text", "negative", 0.25, "2020-03-01 00:00:00"),
+        (None, "recent", "u2", "second text", "positive", 0.75, None),
+    ]
+    with fresh_db.writer() as conn:
+        my_db._insert_partitioned(conn, rows)
+
+    found = asyncio.run(my_db.fetch_reviews_by_request_id(["old", "recent", "missing"]))
+    assert found == {
+        "old": {"request_id": "old", "user_id": "u1", "sentiment": "negative", "confidence": 0.25},
+        "recent": {"request_id": "recent", "user_id": "u2", "sentiment": "positive", "confidence": 0.75},
+    }
+
+    assert my_db.apply_retention(months=1) == ["202003"]
+    assert list(asyncio.run(my_db.fetch_reviews_by_request_id(["old", "recent"]))) == ["recent"]
+
+
+def test_insert_recreates_a_partition_dropped_by_another_process(fresh_db):
+    my_db.create_database()
+    with fresh_db.writer() as conn:
+        my_db._insert_partitioned(conn, [(None, "first", "u", "text", "positive", 0.5, "2020-03-01 00:00:00")])
+    assert my_db.apply_retention(months=1) == ["202003"]
+    # As if db_admin had dropped the month: this process still believes it exists.
+    my_db._known_partitions.add("202003")
+
+    with fresh_db.writer() as conn:
+        inserted = my_db._insert_partitioned(conn, [(None, "second", "u", "text", "positive", 0.5,
+                                                      "2020-03-02 00:00:00")])
+
+    assert inserted == 1
+    assert "202003" in my_db._known_partitions
+    assert list(asyncio.run(my_db.fetch_reviews_by_request_id(["first", "second"]))) == ["second"]
+
+
+def test_history_stream_reads_one_snapshot_while_retention_runs(fresh_db):
+    my_db.create_database()
+    rows = [(None, f"old-{i}", "u", f"text {i}", "positive", 0.5, f"2020-0{3 + i // 3}-0{i + 1} 00:00:00")
+            for i in range(5)]
+    with fresh_db.writer() as conn:
+        my_db._insert_partitioned(conn, rows + [(None, "recent", "u", "text", "positive", 0.5, None)])
+
+    chunks = my_db.iter_review_chunks(columns=["request_id"], chunk_size=2)
+    streamed = [row[0] for row in next(chunks)]
+    assert my_db.apply_retention(months=1) == ["202003", "202004"]
+    streamed += [row[0] for chunk in chunks for row in chunk]
+
+    assert streamed == [f"old-{i}" for i in range(5)] + ["recent"]
+    assert [row[0] for chunk in my_db.iter_review_chunks(columns=["request_id"]) for row in chunk] == ["recent"]
+
+
+def test_retention_command_can_vacuum(fresh_db, capsys):
+    my_db.create_database()
+
+    def store_old_reviews(month):
+        rows = [(None, f"{month}-{i}", "u", f"an old review number {i} " * 20, "neutral", 0.0, f"{month}-01 00:00:00")
+                for i in range(300)]
+        with fresh_db.writer() as conn:
+            my_db._insert_partitioned(conn, rows)
+
+    def free_pages():
+        with fresh_db.reader() as conn:
+            return conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+    store_old_reviews("2020-03")
+    assert db_admin.main(["apply-retention", "--months", "1", "--pause", "0"]) == 0
+    assert "run with --vacuum" in capsys.readouterr().out
+    assert free_pages() > 0
+
+    store_old_reviews("2020-04")
+    assert db_admin.main(["apply-retention", "--months", "1", "--pause", "0", "--vacuum"]) == 0
+    assert "Vacuumed" in capsys.readouterr().out
+    assert free_pages() == 0
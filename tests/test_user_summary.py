@@ -0,0 +1,78 @@
+"""
+Module: tests/test_user_summary.py
+Description: GET /users/{user_id}/summary and the triggers that maintain user_summary.
+"""
+
+import pytest
+
+import my_db
+
+ROWS = [
+    ("s-1", "alice", "first", "positive", 0.5, "2031-01-10 08:00:00"),
+    ("s-2", "bob", "second", "negative", 0.25, "2031-01-20 08:00:00"),
+    ("s-3", "alice", "third", "neutral", 0.0, "2031-01-20 08:00:00"),
+    ("s-4", "alice", "fourth", "positive", 0.75, "2031-02-02 09:30:00"),
+]
+
+
+def _store(manager, rows=ROWS):
+    with manager.writer() as conn:
+        my_db._insert_partitioned(conn, [(None,) + row for row in rows])
+
+
+def _summary_table(manager) -> list:
+    with manager.reader() as conn:
+        return [tuple(row) for row in conn.execute("SELECT * FROM user_summary ORDER BY user_id")]
+
+
+def test_summary_of_a_user(client, fresh_db):
+    _store(fresh_db)
+
+    assert client.get("/users/alice/summary").json() == {
+        "user_id": "alice",
+        "total": 3,
+        "positive": 2,
+        "negative": 0,
+        "neutral": 1,
+        "average_confidence": 0.4167,
+        "confidence_stddev": 0.3118,
+        "first_seen": "2031-01-10 08:00:00",
+        "last_seen": "2031-02-02 09:30:00",
+    }
+
+
+def test_unknown_user_is_not_found(client):
+    assert client.get("/users/nobody/summary").status_code == 404
+
+
+def test_reviews_posted_to_the_api_update_the_summary(client):
+    for i, text in enumerate(["This product is great", "Terrible battery"]):
+        client.post("/reviews", json={"request_id": f"api-{i}", "user_id": "carol", "data": {"review_text": text}})
+    # A replay stores nothing, so it is not counted again.
+    client.post("/reviews", json={"request_id": "api-0", "user_id": "carol",
+                                  "data": {"review_text": "This product is great"}})
+
+    summary = client.get("/users/carol/summary").json()
+    assert (summary["total"], summary["positive"], summary["negative"]) == (2, 1, 1)
+
+
+def test_triggers_match_a_rebuild_across_partitions(fresh_db):
+    my_db.create_database()
+    _store(fresh_db)
+    maintained = _summary_table(fresh_db)
+
+    assert my_db.rebuild_user_summary() == 2
+    assert _summary_table(fresh_db) == maintained
+
+
+def test_rolled_back_reviews_leave_the_summary_unchanged(fresh_db):
+    my_db.create_database()
+    _store(fresh_db)
+    before = _summary_table(fresh_db)
+
+    with pytest.raises(RuntimeError):
+        with fresh_db.writer() as conn:
+            my_db._insert_partitioned(conn, [(None, "s-5", "alice", "fifth", "negative", 1.0, "2031-03-01 00:00:00")])
+            raise RuntimeError("abort")
+
+    assert _summary_table(fresh_db) == before
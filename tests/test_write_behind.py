@@ -0,0 +1,78 @@
+"""
+Module: tests/test_write_behind.py
+Description: Group commits and acknowledgements of the write-behind queue.
+"""
+
+import asyncio
+import time
+
+import pytest
+
+import my_db
+from write_behind import ACK_COMMIT, WriteBehindWriter
+
+
+def _row(n: int):
+    return (f"req-{n}", f"user-{n % 3}", f"review number {n}", "positive", 0.5)
+
+
+def _stored_request_ids(manager) -> list:
+    with manager.reader() as conn:
+        return sorted(row[0] for row in conn.execute("SELECT request_id FROM reviews"))
+
+
+def test_commit_ack_with_idle_queue_does_not_wait_for_the_interval(fresh_db):
+    my_db.create_database()
+
+    async def scenario():
+        writer = WriteBehindWriter(max_queue=100, batch_size=64, flush_interval=5.0, ack_mode=ACK_COMMIT)
+        await writer.start()
+        try:
+            start = time.perf_counter()
+            await writer.submit(_row(1))
+            return time.perf_counter() - start
+        finally:
+            await writer.stop()
+
+    elapsed = asyncio.run(scenario())
+    assert elapsed < 1.0
+    assert _stored_request_ids(fresh_db) == ["req-1"]
+
+
+def test_concurrent_rows_share_group_commits(fresh_db):
+    my_db.create_database()
+
+    async def scenario():
+        writer = WriteBehindWriter(max_queue=100, batch_size=16, flush_interval=0.05, ack_mode=ACK_COMMIT)
+        await writer.start()
+        try:
+            await asyncio.gather(*(writer.submit(_row(n)) for n in range(40)))
+        finally:
+            await writer.stop()
+        return writer
+
+    writer = asyncio.run(scenario())
+    assert writer.rows_written == 40
+    assert writer.flushes < 40
+    assert len(_stored_request_ids(fresh_db)) == 40
+
+
+def test_commit_ack_reports_a_failed_commit(fresh_db, monkeypatch):
+    my_db.create_database()
+
+    def fail(rows):
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(my_db, "insert_feedback_batch", fail)
+
+    async def scenario():
+        writer = WriteBehindWriter(max_queue=100, batch_size=64, flush_interval=0.01, ack_mode=ACK_COMMIT)
+        await writer.start()
+        try:
+            with pytest.raises(RuntimeError, match="disk full"):
+                await writer.submit(_row(1))
+        finally:
+            await writer.stop()
+        return writer
+
+    assert asyncio.run(scenario()).failed_rows == 1
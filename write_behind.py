@@ -0,0 +1,206 @@
+"""
+Module: write_behind.py
+Description: Asynchronous write-behind queue that group-commits review rows to SQLite.
+
+Request handlers hand their row to the writer instead of committing it themselves.
+A background task collects queued rows and writes them with one executemany per
+group commit, off the event loop. It takes every row already queued (up to
+FEEDBACK_FLUSH_BATCH) and commits as soon as the queue is empty, so a lone row is
+written at once and rows arriving during a commit form the next group. Only while
+rows keep arriving does it wait for more, at most FEEDBACK_FLUSH_INTERVAL seconds
+after the first row of the group.
+
+The queue is bounded (FEEDBACK_QUEUE_SIZE): when it is full, submit() waits, which
+pushes back on the callers. FEEDBACK_ACK_MODE chooses when submit() returns:
+  - "commit": after the row's group commit succeeded (errors reach the caller).
+  - "enqueue": as soon as the row is queued (errors are only logged).
+Until its group commit has finished, a submitted row can be looked up by request_id
+with pending(), so an idempotency check does not miss a row that is acknowledged but
+not yet in the database.
+On shutdown, stop() flushes every queued row before returning.
+"""
+
+import asyncio
+import os
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+import my_db
+from logger import MyLogger
+
+load_dotenv()
+
+# Get a logger for this module
+logger = MyLogger.get_logger(__name__)
+
+ACK_COMMIT = "commit"
+ACK_ENQUEUE = "enqueue"
+
+FeedbackRow = Tuple[str, str, str, str, float]
+
+
+class WriteBehindWriter:
+    """
+    Buffers feedback rows and flushes them to the reviews table in groups.
+
+    Args:
+        max_queue (int): Maximum number of rows waiting to be written.
+        batch_size (int): Flush as soon as this many rows are collected.
+        flush_interval (float): While rows keep arriving, wait at most this many seconds
+            after the first row of a group for more; 0 never waits.
+        ack_mode (str): ACK_COMMIT or ACK_ENQUEUE.
+    """
+
+    def __init__(self, max_queue: int, batch_size: int, flush_interval: float, ack_mode: str):
+        if ack_mode not in (ACK_COMMIT, ACK_ENQUEUE):
+            raise ValueError(f"Unknown ack mode: {ack_mode}")
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.ack_mode = ack_mode
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        # request_id -> row, for rows submitted but not yet committed (or failed).
+        self._pending: Dict[str, FeedbackRow] = {}
+        self.rows_written = 0
+        self.flushes = 0
+        self.failed_rows = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        """
+        Starts the background flush task on the running event loop.
+        """
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            "WriteBehindWriter started: max_queue=%s, batch_size=%s, flush_interval=%ss, ack_mode=%s",
+            self.max_queue, self.batch_size, self.flush_interval, self.ack_mode
+        )
+
+    async def stop(self):
+        """
+        Flushes every queued row, then stops the background task.
+        """
+        if not self.running:
+            return
+        await self._queue.put(None)  # Sentinel: everything queued before it gets flushed.
+        await self._task
+        self._task = None
+        logger.info("WriteBehindWriter stopped after writing %d rows", self.rows_written)
+
+    async def submit(self, row: FeedbackRow):
+        """
+        Queues one (request_id, user_id, review_text, sentiment, confidence) row.
+        Waits while the queue is full. In "commit" mode, also waits for the row's
+        group commit and raises its error if it failed.
+        If the writer is not running, the row is written directly.
+        """
+        if not self.running:
+            await asyncio.to_thread(my_db.insert_feedback_batch, [row])
+            return
+
+        future = asyncio.get_running_loop().create_future() if self.ack_mode == ACK_COMMIT else None
+        self._pending[row[0]] = row
+        try:
+            await self._queue.put((row, future))
+        except BaseException:
+            self._pending.pop(row[0], None)
+            raise
+        if future is not None:
+            await future
+
+    def pending(self, request_id: str) -> Optional[FeedbackRow]:
+        """
+        Returns the submitted row with this request_id if its group commit has not
+        finished yet, otherwise None.
+        """
+        return self._pending.get(request_id)
+
+    def qsize(self) -> int:
+        """
+        Returns the number of rows waiting to be written.
+        """
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def stats(self) -> dict:
+        """
+        Returns queue depth and write counters.
+        """
+        return {
+            "running": self.running,
+            "ack_mode": self.ack_mode,
+            "queued": self.qsize(),
+            "max_queue": self.max_queue,
+            "rows_written": self.rows_written,
+            "failed_rows": self.failed_rows,
+            "flushes": self.flushes
+        }
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is None:
+                break
+            group = [item]
+            deadline = loop.time() + self.flush_interval
+
+            while len(group) < self.batch_size:
+                try:
+                    item = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    # An idle queue (nothing arrived since the first row) is committed at once.
+                    timeout = deadline - loop.time()
+                    if len(group) == 1 or timeout <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if item is None:
+                    stopping = True
+                    break
+                group.append(item)
+
+            await self._flush(group)
+
+    async def _flush(self, group):
+        rows = [row for row, _future in group]
+        try:
+            await asyncio.to_thread(my_db.insert_feedback_batch, rows)
+        except Exception as e:
+            self._release(rows)
+            self.failed_rows += len(rows)
+            logger.error("WriteBehindWriter - Group commit of %d rows failed: %s", len(rows), e)
+            for _row, future in group:
+                if future is not None and not future.done():
+                    future.set_exception(e)
+            return
+
+        self._release(rows)
+        self.rows_written += len(rows)
+        self.flushes += 1
+        for _row, future in group:
+            if future is not None and not future.done():
+                future.set_result(None)
+
+    def _release(self, rows):
+        for row in rows:
+            self._pending.pop(row[0], None)
+
+
+# Shared writer used by the API.
+feedback_writer = WriteBehindWriter(
+    max_queue=int(os.getenv("FEEDBACK_QUEUE_SIZE", "10000")),
+    batch_size=int(os.getenv("FEEDBACK_FLUSH_BATCH", "64")),
+    flush_interval=float(os.getenv("FEEDBACK_FLUSH_INTERVAL", "0.002")),
+    ack_mode=os.getenv("FEEDBACK_ACK_MODE", ACK_COMMIT).lower()
+)